@@ -0,0 +1 @@
+"""Benchmarks offline del pipeline de refresco (ver benchmarks/pipeline.py)."""
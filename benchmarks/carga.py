@@ -0,0 +1,246 @@
+"""Prueba de carga offline del tablero: N sesiones simuladas sobre la fuente replay.
+
+Levanta un servidor local que imita la API de Telegram y apunta el servicio a la fuente
+simulada (`MONITOR_BOLSA_FUENTE=replay`, ver `bolsa.replay`) con un universo sintético,
+todo en una sola máquina y sin red. Luego dibuja `monitor_bolsa.py` en N sesiones de
+`streamlit.testing` dentro del mismo proceso: como las sesiones de un servidor real,
+comparten el servicio de `st.cache_resource`. En cada ronda se vuelve a dibujar cada
+sesión (lo que hace el fragmento con `run_every`, aunque aquí se ejecuta la página
+completa: es una cota superior) y se registra:
+
+* latencia de dibujo por sesión (p50, p95 y máximo),
+* memoria de Python con tracemalloc (actual y pico por ronda) y el RSS máximo del proceso,
+* alertas entregadas al Telegram local (mensajes, alertas y alertas por segundo),
+* filas de la ventana de historia diaria que lee el servicio del almacén. El replay avanza
+  una rueda por sesión simulada, así que la ventana debe quedar acotada; si crece, la
+  prueba termina con error.
+
+Uso:
+    python -m benchmarks.carga --sesiones 20 --rondas 30 --tickers 200
+    python -m benchmarks.carga --sesiones 50 --velocidad 780 --intervalo 2 --salida carga.json
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+RUTA_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "monitor_bolsa.py")
+MIB = 1024 * 1024
+
+
+class StubTelegram:
+    """Servidor HTTP local que acepta `sendMessage` como la API de Telegram y cuenta los mensajes."""
+
+    def __init__(self):
+        self.mensajes = []  # (instante, texto)
+        self._lock = threading.Lock()
+        stub = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_POST(self):
+                cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with stub._lock:
+                    stub.mensajes.append((time.monotonic(), cuerpo.get("text", "")))
+                respuesta = json.dumps({"ok": True, "result": {}}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(respuesta)))
+                self.end_headers()
+                self.wfile.write(respuesta)
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+        self._hilo = threading.Thread(target=self.servidor.serve_forever, name="stub-telegram", daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.servidor.server_address[1]}"
+
+    def iniciar(self):
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self.servidor.shutdown()
+
+
+def escribir_universo(ruta, n_tickers, n_sectores):
+    """Universo CSV sintético: dos motores macro y `n_tickers` acciones repartidas en sectores."""
+    with open(ruta, "w", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f)
+        escritor.writerow(["categoria", "nombre", "symbol"])
+        escritor.writerows([("MACRO 🌎", "USD/CLP", "CLP=X"), ("MACRO 🌎", "Cobre", "HG=F")])
+        escritor.writerows(
+            (f"SECTOR {i % n_sectores + 1}", f"Activo {i:04d}", f"SIM{i:04d}.SN") for i in range(n_tickers)
+        )
+
+
+def configurar_entorno(args, carpeta, stub):
+    """Variables MONITOR_BOLSA_* del servicio: deben quedar definidas antes de importar `bolsa`."""
+    ruta_universo = os.path.join(carpeta, "universo.csv")
+    escribir_universo(ruta_universo, args.tickers, args.sectores)
+    os.environ.update({
+        "MONITOR_BOLSA_FUENTE": "replay",
+        "MONITOR_BOLSA_DATOS": carpeta,
+        "MONITOR_BOLSA_UNIVERSO": ruta_universo,
+        "MONITOR_BOLSA_INTERVALO": str(args.intervalo),
+        "MONITOR_BOLSA_REPLAY_VELOCIDAD": str(args.velocidad),
+        "MONITOR_BOLSA_REPLAY_SEMILLA": str(args.semilla),
+        "MONITOR_BOLSA_REPLAY_ARCHIVO": args.replay_archivo or "",
+        "MONITOR_BOLSA_TELEGRAM_URL": stub.url,
+        "MONITOR_BOLSA_METRICAS": "1",
+        "TELEGRAM_TOKEN": "carga",
+        "TELEGRAM_CHAT_ID": "carga",
+    })
+
+
+def resumir_latencias(latencias):
+    return {
+        "p50_ms": float(np.percentile(latencias, 50) * 1000),
+        "p95_ms": float(np.percentile(latencias, 95) * 1000),
+        "max_ms": float(np.max(latencias) * 1000),
+    }
+
+
+def correr(args, stub):
+    from streamlit.testing.v1 import AppTest
+    from bolsa.almacen import AlmacenBarras
+    from bolsa.mercado import DIAS_VENTANA
+    from bolsa.metricas import METRICAS
+    from bolsa.servicio import RUTA_ALMACEN, RUTA_UNIVERSO
+    from bolsa.universo import cargar_universo
+
+    almacen = AlmacenBarras(RUTA_ALMACEN)
+    codigos = [symbol for cat in cargar_universo(RUTA_UNIVERSO).values() for symbol in cat.values()]
+    # El replay genera una barra por día hábil: es la mayor cantidad de días hábiles que
+    # caben en los DIAS_VENTANA + 1 días corridos de la ventana (ambos extremos incluidos)
+    semanas, resto = divmod(DIAS_VENTANA + 1, 7)
+    max_filas = 5 * semanas + min(resto, 5)
+
+    def dibujar(sesion):
+        t0 = time.perf_counter()
+        sesion.run()
+        return time.perf_counter() - t0
+
+    tracemalloc.start()
+    inicio = time.monotonic()
+    sesiones = [AppTest.from_file(RUTA_APP, default_timeout=args.timeout) for _ in range(args.sesiones)]
+    rondas = []
+    with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+        for ronda in range(1, args.rondas + 1):
+            comienzo = time.monotonic()
+            latencias = list(pool.map(dibujar, sesiones))
+            actual, pico = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            excepciones = [str(e.value) for s in sesiones for e in s.exception]
+            rondas.append({
+                "ronda": ronda,
+                **resumir_latencias(latencias),
+                "memoria_mib": actual / MIB,
+                "memoria_pico_mib": pico / MIB,
+                "excepciones": len(excepciones),
+                "alertas_enviadas": METRICAS.contadores().get("alertas_enviadas", 0),
+                # La misma ventana diaria que lee `construir_snapshot` en cada refresco
+                "filas_historial": len(almacen.leer_ventana(codigos, DIAS_VENTANA)),
+            })
+            print(
+                f"· ronda {ronda}/{args.rondas}: p50 {rondas[-1]['p50_ms']:.0f} ms, "
+                f"p95 {rondas[-1]['p95_ms']:.0f} ms, memoria {actual / MIB:.1f} MiB, "
+                f"{len(stub.mensajes)} mensajes a Telegram, {rondas[-1]['filas_historial']} filas de historia",
+                file=sys.stderr,
+            )
+            if excepciones:
+                print(f"  excepciones: {excepciones[:3]}", file=sys.stderr)
+            time.sleep(max(0.0, args.pausa - (time.monotonic() - comienzo)))
+
+    # Detiene el servicio de `st.cache_resource` antes de borrar su carpeta de datos: los
+    # sondeos terminan su refresco en curso y el despachador vacía las alertas de la última ronda
+    from bolsa.servicio import detener_servicios
+    if not detener_servicios(timeout_alertas=args.espera_alertas, timeout_sondeos=args.timeout):
+        print("· quedaron alertas sin despachar al cerrar", file=sys.stderr)
+    duracion = time.monotonic() - inicio
+    tracemalloc.stop()
+
+    contadores = METRICAS.contadores()
+    resumen = {
+        "duracion_s": duracion,
+        "dibujos": args.sesiones * args.rondas,
+        "p50_ms": float(np.median([r["p50_ms"] for r in rondas])),
+        "p95_ms": float(np.max([r["p95_ms"] for r in rondas])),
+        "max_ms": float(np.max([r["max_ms"] for r in rondas])),
+        "excepciones": sum(r["excepciones"] for r in rondas),
+        "memoria_inicial_mib": rondas[0]["memoria_mib"],
+        "memoria_final_mib": rondas[-1]["memoria_mib"],
+        "crecimiento_memoria_mib": rondas[-1]["memoria_mib"] - rondas[0]["memoria_mib"],
+        "rss_max_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "telegram_mensajes": len(stub.mensajes),
+        "alertas_enviadas": contadores.get("alertas_enviadas", 0),
+        "alertas_duplicadas": contadores.get("alertas_duplicadas", 0),
+        "alertas_descartadas": contadores.get("alertas_descartadas", 0),
+        "alertas_por_segundo": contadores.get("alertas_enviadas", 0) / duracion,
+        "refrescos": contadores.get("refrescos", 0),
+        "filas_historial_max": max(r["filas_historial"] for r in rondas),
+        "filas_historial_limite": max_filas,
+        "etapas": METRICAS.percentiles(),
+    }
+    return rondas, resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga offline del tablero sobre la fuente replay.")
+    parser.add_argument("--sesiones", type=int, default=10, help="Sesiones simuladas")
+    parser.add_argument("--rondas", type=int, default=10, help="Veces que se dibuja cada sesión")
+    parser.add_argument("--pausa", type=float, default=1.0, help="Segundos mínimos entre rondas")
+    parser.add_argument("--concurrencia", type=int, default=4, help="Sesiones dibujadas en paralelo")
+    parser.add_argument("--tickers", type=int, default=100, help="Acciones del universo sintético")
+    parser.add_argument("--sectores", type=int, default=6)
+    parser.add_argument("--velocidad", type=float, default=390, help="Segundos simulados por segundo real")
+    parser.add_argument("--intervalo", type=int, default=5, help="Segundos entre refrescos del snapshot")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--replay-archivo", help="CSV de barras de 1 minuto grabadas (por defecto, sintéticas)")
+    parser.add_argument("--timeout", type=float, default=120, help="Límite por dibujo de una sesión")
+    parser.add_argument("--espera-alertas", type=float, default=10.0,
+                        help="Máximo de segundos para vaciar la cola de alertas al terminar")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto, stdout)")
+    args = parser.parse_args(argv)
+
+    stub = StubTelegram().iniciar()
+    try:
+        with tempfile.TemporaryDirectory() as carpeta:
+            configurar_entorno(args, carpeta, stub)
+            rondas, resumen = correr(args, stub)
+    finally:
+        stub.detener()
+
+    from benchmarks.pipeline import metadatos
+    informe = json.dumps(
+        {"metadatos": metadatos(), "parametros": vars(args), "resumen": resumen, "rondas": rondas},
+        indent=2, ensure_ascii=False,
+    )
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(informe)
+    else:
+        print(informe)
+
+    if resumen["filas_historial_max"] > resumen["filas_historial_limite"]:
+        sys.exit(
+            f"La ventana de historia creció a {resumen['filas_historial_max']} filas "
+            f"(límite {resumen['filas_historial_limite']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
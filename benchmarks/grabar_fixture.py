@@ -0,0 +1,30 @@
+"""Graba la respuesta de yf.download para el universo actual como fixture de los benchmarks.
+
+Uso (requiere conexión a Yahoo Finance):
+    python -m benchmarks.grabar_fixture --universo universo.csv --periodo 60d
+"""
+import argparse
+import os
+
+from bolsa.universo import cargar_universo
+
+RUTA_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "yf_download_60d.csv")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--universo", default="universo.csv")
+    parser.add_argument("--periodo", default="60d")
+    parser.add_argument("--salida", default=RUTA_FIXTURE)
+    args = parser.parse_args(argv)
+
+    import yfinance as yf
+
+    codigos = [symbol for cat in cargar_universo(args.universo).values() for symbol in cat.values()]
+    df = yf.download(codigos, period=args.periodo, interval="1d", progress=False)
+    df.to_csv(args.salida)
+    print(f"{df.shape[0]} barras x {len(codigos)} tickers -> {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""Benchmark offline del pipeline de refresco, etapa por etapa.
+
+Reproduce con un stub (sin red) el fixture de yf.download de benchmarks/fixtures, un frame
+sintético con el formato de la descarga real (benchmarks/grabar_fixture.py lo reemplaza por
+una descarga grabada), y mide por separado: descarga/parseo, almacén local, corte por ticker,
+indicadores, figuras, sparklines, analítica (índices sectoriales y correlaciones) y armado del
+snapshot, además del payload por tarjeta de cada vista frente al presupuesto. El universo se
+escala de forma sintética remuestreando los retornos del fixture.
+
+Uso:
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline --tickers 14 100 1000 --barras 60 2000 --salida bench.json
+
+La salida es JSON (una fila por escenario y etapa) para seguir regresiones entre commits.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from bolsa.almacen import AlmacenBarras
+from bolsa.analitica import AnaliticaIncremental
+from bolsa.descarga import descargar_por_bloques
+from bolsa.indicadores import (
+    calcular_indicadores_universo, mascara_barras_completas, resumen_ultimas_barras, ultimas_velas,
+)
+from bolsa.mercado import construir_snapshot
+from bolsa.sparkline import puntos_sparkline, svg_sparkline
+
+RUTA_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "yf_download_60d.csv")
+PALETA = {
+    "BACKGROUND": "#0d1117", "CARD_BG": "#161b22", "BORDER": "#30363d",
+    "TEXT_NEUTRAL": "#e0e0e0", "POSITIVE": "#00b894", "NEGATIVE": "#d63031",
+    "ACCENT": "#58a6ff",
+}
+PRESUPUESTO_TARJETA_BYTES = 4096  # mismo valor por defecto que MONITOR_BOLSA_PRESUPUESTO_TARJETA
+
+
+def cargar_fixture(ruta=RUTA_FIXTURE):
+    df = pd.read_csv(ruta, header=[0, 1], index_col=0, parse_dates=True)
+    df.columns.names = ["Price", "Ticker"]
+    return df
+
+
+def universo_sintetico(fixture, n_tickers, n_barras, semilla=0):
+    """Frame con el formato de yf.download: `n_tickers` x `n_barras`, con retornos del fixture.
+
+    Los retornos diarios, rangos intradía y volúmenes se muestrean (con reemplazo) de los
+    tickers reales del fixture, y los huecos por feriados se replican por sufijo de bolsa.
+    Las fechas terminan hoy (no en la del fixture) para que caigan en la ventana de 60
+    días que lee `actualizar_historial`.
+    """
+    rng = np.random.default_rng(semilla)
+    close = fixture["Close"]
+    retornos = np.log(close).diff().stack().dropna().to_numpy()
+    rango_alto = (fixture["High"] / close - 1).stack().dropna().to_numpy()
+    rango_bajo = (1 - fixture["Low"] / close).stack().dropna().to_numpy()
+    volumenes = fixture["Volume"].stack().dropna().to_numpy()
+
+    indice = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=n_barras, name="Date")
+    reales = list(close.columns)
+    tickers = [reales[i] if i < len(reales) else f"SINT{i:04d}.SN" for i in range(n_tickers)]
+    niveles = rng.choice(close.iloc[-1].dropna().to_numpy(), size=n_tickers)
+
+    forma = (n_barras, n_tickers)
+    c = niveles * np.exp(np.cumsum(rng.choice(retornos, size=forma), axis=0))
+    o = np.roll(c, 1, axis=0)
+    o[0] = c[0]
+    h = np.maximum(o, c) * (1 + rng.choice(rango_alto, size=forma))
+    l = np.minimum(o, c) * (1 - rng.choice(rango_bajo, size=forma))
+    v = rng.choice(volumenes, size=forma)
+
+    # Feriados locales: los .SN no tienen barra en ~2% de los días
+    feriados = rng.random(n_barras) < 0.02
+    locales = np.array([t.endswith(".SN") for t in tickers])
+    for arr in (c, o, h, l, v):
+        arr[np.ix_(feriados, locales)] = np.nan
+
+    campos = {"Close": c, "High": h, "Low": l, "Open": o, "Volume": v}
+    df = pd.concat({campo: pd.DataFrame(arr, index=indice, columns=tickers) for campo, arr in campos.items()}, axis=1)
+    df.columns.names = ["Price", "Ticker"]
+    return df
+
+
+class StubYahoo:
+    """Reemplazo de yf.download que sirve un frame grabado, recortado a los tickers y fechas pedidos."""
+
+    def __init__(self, df, latencia=0.0):
+        self.df = df
+        self.latencia = latencia
+        self.llamadas = 0
+
+    def __call__(self, codigos, period=None, start=None, interval="1d", **kwargs):
+        self.llamadas += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+        columnas = [c for c in self.df.columns if c[1] in set(codigos)]
+        df = self.df[columnas]
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        # yf.download entrega copias nuevas; el parseo se simula con la copia profunda
+        return df.copy(deep=True)
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - t0)
+    return tiempos, resultado
+
+
+def resumir(escenario, etapa, tiempos, **extra):
+    return {
+        **escenario,
+        "etapa": etapa,
+        "repeticiones": len(tiempos),
+        "min_ms": min(tiempos) * 1000,
+        "mediana_ms": statistics.median(tiempos) * 1000,
+        "media_ms": statistics.fmean(tiempos) * 1000,
+        **extra,
+    }
+
+
+def verificar_snapshot(snapshot):
+    """Un snapshot vacío (p. ej. barras fuera de la ventana de lectura) haría que la etapa
+    midiera un atajo y no el pipeline: se aborta en lugar de informar tiempos engañosos."""
+    if snapshot.metricas.empty:
+        raise RuntimeError(
+            "El snapshot del benchmark quedó vacío; revisa que las barras sintéticas caigan en la ventana del almacén"
+        )
+    return snapshot
+
+
+def correr_escenario(fixture, n_tickers, n_barras, repeticiones, max_figuras, latencia):
+    df = universo_sintetico(fixture, n_tickers, n_barras)
+    codigos = list(df["Close"].columns)
+    tickers_plano = {symbol: symbol for symbol in codigos}
+    stub = StubYahoo(df, latencia=latencia)
+    escenario = {"tickers": n_tickers, "barras": n_barras}
+    filas = []
+
+    # 1. Descarga y parseo (stub + bloques paralelos)
+    tiempos, resultado = medir(lambda: descargar_por_bloques(codigos, descargar=stub, period="max"), repeticiones)
+    filas.append(resumir(escenario, "descarga", tiempos, bloques_por_llamada=stub.llamadas // repeticiones))
+
+    # 2. Almacén local: escritura completa y lectura de la ventana
+    with tempfile.TemporaryDirectory() as carpeta:
+        almacen = AlmacenBarras(os.path.join(carpeta, "barras.sqlite"))
+        tiempos, _ = medir(lambda: almacen.guardar(resultado.datos), repeticiones)
+        filas.append(resumir(escenario, "almacen_escritura", tiempos))
+        tiempos, _ = medir(lambda: almacen.leer(codigos), repeticiones)
+        filas.append(resumir(escenario, "almacen_lectura", tiempos))
+
+    # 3. Indicadores para todo el universo
+    tiempos, indicadores = medir(lambda: calcular_indicadores_universo(df), repeticiones)
+    filas.append(resumir(escenario, "indicadores", tiempos))
+
+    # 4. Corte por ticker (últimas 20 velas completas de cada uno)
+    validas = mascara_barras_completas(indicadores)
+    tiempos, _ = medir(lambda: [ultimas_velas(indicadores, s, n=20, validas=validas) for s in codigos], repeticiones)
+    filas.append(resumir(escenario, "corte_por_ticker", tiempos))
+
+    # 5. Resumen hoy/ayer
+    tiempos, _ = medir(lambda: resumen_ultimas_barras(indicadores, 2.5), repeticiones)
+    filas.append(resumir(escenario, "resumen", tiempos))
+
+    # 6. Figuras Plotly (muestra de tickers; se informa también el costo por figura)
+    from bolsa.graficos import construir_figura
+    muestra = codigos[:max_figuras]
+    velas = [ultimas_velas(indicadores, s, n=20, validas=validas) for s in muestra]
+    tiempos, figuras = medir(lambda: [construir_figura(v, PALETA) for v in velas], repeticiones)
+    bytes_figura = statistics.fmean(len(f.to_json()) for f in figuras) if figuras else 0
+    filas.append(resumir(
+        escenario, "figuras", tiempos, figuras=len(muestra),
+        por_figura_ms=min(tiempos) * 1000 / max(len(muestra), 1), bytes_por_figura=bytes_figura,
+    ))
+
+    # 6b. Sparklines de la vista compacta (todo el universo) y payload por tarjeta de cada vista
+    velas_todas = [ultimas_velas(indicadores, s, n=20, validas=validas) for s in codigos]
+    tiempos, puntos = medir(lambda: [puntos_sparkline(v['close'].to_numpy()) for v in velas_todas], repeticiones)
+    bytes_sparkline = statistics.fmean(len(svg_sparkline(p, PALETA["POSITIVE"]).encode()) for p in puntos)
+    filas.append(resumir(
+        escenario, "sparklines", tiempos, por_tarjeta_ms=min(tiempos) * 1000 / max(len(codigos), 1),
+        bytes_por_sparkline=bytes_sparkline, presupuesto_bytes=PRESUPUESTO_TARJETA_BYTES,
+        compacta_en_presupuesto=bytes_sparkline <= PRESUPUESTO_TARJETA_BYTES,
+        completa_en_presupuesto=bytes_figura <= PRESUPUESTO_TARJETA_BYTES,
+    ))
+
+    # 6c. Analítica: revisar la última barra (incremental) frente a reconstruir toda la ventana
+    categorias = {f"sector_{i}": {s: s for s in codigos[i::10]} for i in range(min(10, len(codigos)))}
+    close, volume = indicadores['close'], indicadores['volume']
+    tiempos, _ = medir(lambda: AnaliticaIncremental(categorias).actualizar(close, volume), repeticiones)
+    filas.append(resumir(escenario, "analitica_completa", tiempos))
+
+    analitica = AnaliticaIncremental(categorias)
+    analitica.actualizar(close, volume)
+    revisiones = iter(np.linspace(1.001, 1.01, repeticiones))
+
+    def revisar_ultima():
+        revisada = close.copy()
+        revisada.iloc[-1] *= next(revisiones)
+        t0 = time.perf_counter()
+        analitica.actualizar(revisada, volume)
+        return time.perf_counter() - t0
+
+    tiempos = [revisar_ultima() for _ in range(repeticiones)]
+    filas.append(resumir(escenario, "analitica_incremental", tiempos, simbolos=len(analitica.simbolos)))
+
+    # 7. Snapshot completo (almacén vacío = arranque en frío, luego refresco incremental)
+    def snapshot_en_frio():
+        with tempfile.TemporaryDirectory() as carpeta:
+            almacen = AlmacenBarras(os.path.join(carpeta, "barras.sqlite"))
+            return verificar_snapshot(construir_snapshot(almacen, tickers_plano, 2.5, descargador=descargador))
+
+    def descargador(codigos, **parametros):
+        return descargar_por_bloques(codigos, descargar=stub, **parametros)
+
+    tiempos, _ = medir(snapshot_en_frio, repeticiones)
+    filas.append(resumir(escenario, "snapshot_frio", tiempos))
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        almacen = AlmacenBarras(os.path.join(carpeta, "barras.sqlite"))
+        construir_snapshot(almacen, tickers_plano, 2.5, descargador=descargador)
+        tiempos, snapshot = medir(
+            lambda: verificar_snapshot(construir_snapshot(almacen, tickers_plano, 2.5, descargador=descargador)),
+            repeticiones,
+        )
+    filas.append(resumir(escenario, "snapshot_incremental", tiempos, tarjetas=len(snapshot.metricas)))
+    return filas
+
+
+def metadatos():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline del pipeline de obtener_datos.")
+    parser.add_argument("--tickers", type=int, nargs="+", default=[14, 100, 1000])
+    parser.add_argument("--barras", type=int, nargs="+", default=[60, 2000])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--max-figuras", type=int, default=20, help="Tickers con figura por escenario")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="Latencia simulada por llamada a Yahoo")
+    parser.add_argument("--fixture", default=RUTA_FIXTURE)
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto, stdout)")
+    args = parser.parse_args(argv)
+
+    fixture = cargar_fixture(args.fixture)
+    resultados = []
+    for n_tickers in args.tickers:
+        for n_barras in args.barras:
+            print(f"· {n_tickers} tickers x {n_barras} barras", file=sys.stderr)
+            resultados.extend(correr_escenario(
+                fixture, n_tickers, n_barras, args.repeticiones, args.max_figuras, args.latencia_ms / 1000,
+            ))
+
+    informe = json.dumps({"metadatos": metadatos(), "resultados": resultados}, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(informe)
+    else:
+        print(informe)
+
+
+if __name__ == "__main__":
+    main()
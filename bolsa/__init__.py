@@ -0,0 +1 @@
+"""Núcleo de datos del Monitor Bolsa (sin dependencias de Streamlit)."""
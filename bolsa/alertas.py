@@ -0,0 +1,245 @@
+"""Despacho de alertas a Telegram: cola acotada, hilo emisor, agrupación y deduplicación persistente."""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import requests
+
+from bolsa.metricas import METRICAS
+from bolsa.reglas import coincidencias_por_regla, mensaje_alerta
+from bolsa.snapshot import una_fila_por_symbol
+
+log = logging.getLogger(__name__)
+
+# Límite de caracteres de un mensaje de Telegram
+MAX_LARGO_MENSAJE = 4096
+
+# Resultados de un envío: aceptado, rechazado por Telegram (4xx, no se reintenta) o
+# fallido tras agotar los reintentos (red, 5xx, 429)
+ENVIADO, RECHAZADO, FALLIDO = "enviado", "rechazado", "fallido"
+
+
+class RegistroAlertas:
+    """Claves de alertas ya enviadas, en SQLite, compartidas por todos los procesos.
+
+    `reclamar` es atómico (INSERT OR IGNORE): de varias sesiones o procesos que detectan
+    la misma alerta, sólo uno la envía.
+    """
+
+    def __init__(self, ruta, retencion_dias=7):
+        self.ruta = ruta
+        self.retencion = retencion_dias * 86400
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        with self._conectar() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("CREATE TABLE IF NOT EXISTS alertas (clave TEXT PRIMARY KEY, ts REAL NOT NULL)")
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=30)
+
+    def reclamar(self, clave):
+        ahora = time.time()
+        with self._conectar() as con:
+            con.execute("DELETE FROM alertas WHERE ts < ?", (ahora - self.retencion,))
+            cursor = con.execute("INSERT OR IGNORE INTO alertas (clave, ts) VALUES (?, ?)", (clave, ahora))
+            return cursor.rowcount == 1
+
+    def liberar(self, clave):
+        """Olvida una clave (p. ej. si el envío falló definitivamente) para reintentar más tarde."""
+        with self._conectar() as con:
+            con.execute("DELETE FROM alertas WHERE clave = ?", (clave,))
+
+
+class DespachadorTelegram:
+    """Envía alertas desde un hilo propio para no bloquear el dibujo de la página.
+
+    Las alertas encoladas dentro de `ventana_agrupacion` segundos se unen en un solo
+    mensaje. Los envíos respetan `intervalo_minimo` entre mensajes y se reintentan con
+    espera exponencial (o el `retry_after` que indique Telegram ante un 429).
+    """
+
+    def __init__(self, token, chat_id, registro=None, url_base="https://api.telegram.org",
+                 max_cola=1000, ventana_agrupacion=1.0, intervalo_minimo=1.0,
+                 max_reintentos=4, espera_base=1.0, timeout=5):
+        self.token = token
+        self.chat_id = chat_id
+        self.registro = registro
+        self.url = f"{url_base.rstrip('/')}/bot{token}/sendMessage"
+        self.ventana_agrupacion = ventana_agrupacion
+        self.intervalo_minimo = intervalo_minimo
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.timeout = timeout
+
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._sesion = requests.Session()  # reutiliza conexiones HTTP (keep-alive)
+        self._ultimo_envio = 0.0
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.enviados = 0
+        self.fallidos = 0
+        self.descartados = 0
+
+    @property
+    def activo(self):
+        return bool(self.token and self.chat_id)
+
+    def iniciar(self):
+        with self._lock:
+            if self.activo and (self._hilo is None or not self._hilo.is_alive()):
+                self._hilo = threading.Thread(target=self._bucle, name="despachador-telegram", daemon=True)
+                self._hilo.start()
+        return self
+
+    def encolar(self, mensaje, clave=None):
+        """Agrega una alerta sin bloquear. Devuelve False si se descartó (duplicada o cola llena)."""
+        if not self.activo:
+            return False
+        if clave is not None and self.registro is not None and not self.registro.reclamar(clave):
+            METRICAS.contar("alertas_duplicadas")
+            return False
+        try:
+            self._cola.put_nowait((mensaje, clave))
+        except queue.Full:
+            self.descartados += 1
+            METRICAS.contar("alertas_descartadas")
+            log.warning("Cola de alertas llena; se descarta: %s", mensaje)
+            if clave is not None and self.registro is not None:
+                self.registro.liberar(clave)
+            return False
+        return True
+
+    def esperar_vacia(self, timeout=None):
+        """Bloquea hasta que todas las alertas encoladas se hayan procesado (útil en pruebas y al cerrar)."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while self._cola.unfinished_tasks:
+            if limite is not None and time.monotonic() > limite:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _bucle(self):
+        while True:
+            lote = [self._cola.get()]
+            fin_ventana = time.monotonic() + self.ventana_agrupacion
+            while True:
+                restante = fin_ventana - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            try:
+                for texto, grupo in _agrupar(lote):
+                    resultado = self._enviar(texto)
+                    if resultado == RECHAZADO and len(grupo) > 1:
+                        # Un mensaje que Telegram no acepta (p. ej. Markdown mal formado) no
+                        # debe arrastrar a los demás del grupo: se reenvían uno por uno
+                        for mensaje, clave in grupo:
+                            self._registrar(self._enviar(mensaje[:MAX_LARGO_MENSAJE]), [clave])
+                    else:
+                        self._registrar(resultado, [clave for _, clave in grupo])
+            except Exception:
+                log.exception("Error inesperado despachando alertas")
+            finally:
+                for _ in lote:
+                    self._cola.task_done()
+
+    def _registrar(self, resultado, claves):
+        if resultado == ENVIADO:
+            self.enviados += len(claves)
+            METRICAS.contar("alertas_enviadas", len(claves))
+            METRICAS.contar("telegram_mensajes")
+            return
+        self.fallidos += len(claves)
+        METRICAS.contar("alertas_fallidas", len(claves))
+        if resultado == FALLIDO and self.registro is not None:
+            # Sólo se liberan los fallos transitorios (red, 5xx, 429 agotado). Una alerta
+            # rechazada con 4xx queda reclamada: reintentarla fallaría igual en cada refresco.
+            for clave in claves:
+                if clave is not None:
+                    self.registro.liberar(clave)
+
+    def _enviar(self, texto):
+        """Envía un mensaje con reintentos; devuelve ENVIADO, RECHAZADO (4xx) o FALLIDO."""
+        with METRICAS.medir("telegram_envio"):
+            return self._enviar_con_reintentos(texto)
+
+    def _enviar_con_reintentos(self, texto):
+        payload = {"chat_id": self.chat_id, "text": texto, "parse_mode": "Markdown"}
+        for intento in range(self.max_reintentos + 1):
+            espera = self._ultimo_envio + self.intervalo_minimo - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            self._ultimo_envio = time.monotonic()
+
+            try:
+                respuesta = self._sesion.post(self.url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                log.warning("Fallo de red enviando alerta (intento %d): %s", intento + 1, e)
+                respuesta = None
+
+            if respuesta is not None:
+                if respuesta.ok:
+                    return ENVIADO
+                if respuesta.status_code == 429:
+                    time.sleep(_retry_after(respuesta, self.espera_base * 2 ** intento))
+                    continue
+                if respuesta.status_code < 500:
+                    # Errores 4xx (token, chat o formato) no se arreglan reintentando
+                    log.error("Telegram rechazó la alerta (%s): %s", respuesta.status_code, respuesta.text[:200])
+                    return RECHAZADO
+                log.warning("Telegram respondió %s (intento %d)", respuesta.status_code, intento + 1)
+
+            if intento < self.max_reintentos:
+                time.sleep(self.espera_base * 2 ** intento)
+        return FALLIDO
+
+
+def _agrupar(lote):
+    """Une los mensajes del lote en textos que respeten el largo máximo de Telegram.
+
+    Devuelve [(texto, [(mensaje, clave), ...])], con los mensajes que forman cada texto.
+    """
+    grupos, texto, grupo = [], "", []
+    for mensaje, clave in lote:
+        candidato = f"{texto}\n{mensaje}" if texto else mensaje
+        if texto and len(candidato) > MAX_LARGO_MENSAJE:
+            grupos.append((texto, grupo))
+            candidato, grupo = mensaje, []
+        texto = candidato[:MAX_LARGO_MENSAJE]
+        grupo.append((mensaje, clave))
+    if texto:
+        grupos.append((texto, grupo))
+    return grupos
+
+
+def _retry_after(respuesta, por_defecto):
+    try:
+        return float(respuesta.json()["parameters"]["retry_after"])
+    except Exception:
+        return por_defecto
+
+
+def despachar_senales(despachador, metricas, senales, motor, ahora=None, prefijo=""):
+    """Encola una alerta por cada coincidencia de las reglas de alerta, a lo más una por regla, ticker y hora.
+
+    `metricas` y `senales` vienen del snapshot (ver `bolsa.snapshot` y `bolsa.reglas.evaluar_snapshot`).
+    """
+    if metricas is None or senales is None:
+        return
+    hora = time.strftime("%Y-%m-%d_%H", time.localtime(ahora))
+    metricas = una_fila_por_symbol(metricas)
+    for regla, symbols in coincidencias_por_regla(senales, motor.alertas()):
+        for symbol in symbols:
+            despachador.encolar(
+                mensaje_alerta(regla, metricas.loc[symbol]),
+                clave=f"{prefijo}{regla.nombre}_{symbol}_{hora}",
+            )
@@ -0,0 +1,163 @@
+"""Almacén local de barras OHLCV con descarga incremental desde Yahoo Finance."""
+import os
+import sqlite3
+from datetime import timedelta
+
+import pandas as pd
+
+from bolsa.descarga import descargar_por_bloques
+from bolsa.metricas import METRICAS
+
+# Columnas OHLCV tal como las entrega yf.download
+CAMPOS_OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class AlmacenBarras:
+    """Barras diarias persistidas en SQLite, agrupadas físicamente por ticker.
+
+    La tabla usa la clave (symbol, ts) sin rowid, por lo que las barras de cada
+    ticker quedan contiguas en disco y leer/actualizar un ticker no toca a los demás.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        with self._conectar() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS barras (
+                    symbol TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (symbol, ts)
+                ) WITHOUT ROWID
+            """)
+
+    def _conectar(self):
+        # Una conexión por operación: el almacén se usa desde varios hilos de Streamlit
+        return sqlite3.connect(self.ruta, timeout=30)
+
+    def ultimas_fechas(self, symbols):
+        """Devuelve {symbol: Timestamp} con la última barra guardada de cada ticker."""
+        if not symbols:
+            return {}
+        marcas = ",".join("?" * len(symbols))
+        with self._conectar() as con:
+            filas = con.execute(
+                f"SELECT symbol, MAX(ts) FROM barras WHERE symbol IN ({marcas}) GROUP BY symbol",
+                list(symbols),
+            ).fetchall()
+        return {symbol: pd.Timestamp(ts, unit="s") for symbol, ts in filas}
+
+    def guardar(self, df_descarga):
+        """Inserta o reemplaza las barras de un DataFrame con el formato de yf.download."""
+        largo = a_formato_largo(df_descarga)
+        if largo.empty:
+            return 0
+        columnas = ["symbol", "ts"] + CAMPOS_OHLCV
+        filas = list(zip(*(largo[col].tolist() for col in columnas)))
+        with self._conectar() as con:
+            con.executemany(
+                "INSERT OR REPLACE INTO barras (symbol, ts, open, high, low, close, volume) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                filas,
+            )
+        return len(filas)
+
+    def leer(self, symbols, desde=None):
+        """Lee las barras guardadas y las devuelve con el mismo formato ancho de yf.download."""
+        marcas = ",".join("?" * len(symbols))
+        consulta = f"SELECT symbol, ts, open, high, low, close, volume FROM barras WHERE symbol IN ({marcas})"
+        parametros = list(symbols)
+        if desde is not None:
+            consulta += " AND ts >= ?"
+            parametros.append(_a_epoch(pd.Timestamp(desde)))
+        with self._conectar() as con:
+            largo = pd.read_sql_query(consulta, con, params=parametros)
+
+        if largo.empty:
+            return pd.DataFrame()
+
+        largo["Date"] = pd.to_datetime(largo["ts"], unit="s")
+        largo = largo.rename(columns={
+            "open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume",
+        })
+        ancho = largo.pivot(index="Date", columns="symbol", values=CAMPOS_OHLCV).sort_index()
+        ancho.columns.names = ["Price", "Ticker"]
+        return ancho
+
+    def leer_ventana(self, symbols, dias):
+        """Barras de los últimos `dias` días corridos, contados desde la barra más reciente guardada.
+
+        La ventana se ancla a los datos y no al reloj del sistema: con la fuente replay las
+        fechas simuladas se adelantan al calendario real y la ventana debe seguir acotada.
+        """
+        ultimas = self.ultimas_fechas(symbols)
+        if not ultimas:
+            return pd.DataFrame()
+        return self.leer(symbols, desde=max(ultimas.values()) - timedelta(days=dias))
+
+
+def actualizar_historial(almacen, codigos, periodo_inicial="60d", dias_ventana=60, descargador=None):
+    """Trae de Yahoo sólo las barras nuevas de cada ticker, las fusiona y devuelve la ventana pedida.
+
+    Los tickers sin historia local se descargan con `periodo_inicial`. El resto se pide
+    desde su última barra guardada (incluida, porque la vela del día en curso se revisa
+    durante la sesión), agrupando en una sola llamada los que comparten fecha de inicio.
+    `descargador` sigue la firma de `descargar_por_bloques`. Devuelve (ventana, estados):
+    un ticker que falla conserva su historia local y su falla queda en `estados`.
+    """
+    if descargador is None:
+        descargador = descargar_por_bloques
+
+    estados = {}
+    ultimas = almacen.ultimas_fechas(codigos)
+    nuevos = [c for c in codigos if c not in ultimas]
+    if nuevos:
+        resultado = descargador(nuevos, period=periodo_inicial, interval="1d")
+        with METRICAS.medir("almacen_guardar"):
+            almacen.guardar(resultado.datos)
+        estados.update(resultado.estados)
+
+    grupos = {}
+    for symbol, fecha in ultimas.items():
+        grupos.setdefault(fecha.normalize(), []).append(symbol)
+    for inicio, symbols in grupos.items():
+        resultado = descargador(symbols, start=inicio.strftime("%Y-%m-%d"), interval="1d")
+        with METRICAS.medir("almacen_guardar"):
+            almacen.guardar(resultado.datos)
+        estados.update(resultado.estados)
+
+    with METRICAS.medir("almacen_leer"):
+        ventana = almacen.leer_ventana(codigos, dias_ventana)
+    return ventana, estados
+
+
+def _a_epoch(fechas):
+    """Convierte fechas (naive o con zona) a segundos UTC."""
+    if isinstance(fechas, pd.Timestamp):
+        if fechas.tzinfo is not None:
+            fechas = fechas.tz_convert("UTC").tz_localize(None)
+        return int(fechas.value // 10**9)
+    indice = pd.DatetimeIndex(fechas)
+    if indice.tz is not None:
+        indice = indice.tz_convert("UTC").tz_localize(None)
+    return indice.as_unit("ns").asi8 // 10**9
+
+
+def a_formato_largo(df_descarga):
+    """Pasa el DataFrame ancho de yf.download a una fila por (ticker, fecha)."""
+    if df_descarga is None or df_descarga.empty:
+        return pd.DataFrame(columns=["symbol", "ts"] + CAMPOS_OHLCV)
+
+    if not isinstance(df_descarga.columns, pd.MultiIndex):
+        raise ValueError("Se esperaba un DataFrame con columnas (campo, ticker) como el de yf.download")
+
+    largo = df_descarga.stack(level=1, future_stack=True)
+    largo = largo.reindex(columns=CAMPOS_OHLCV).dropna(subset=["Close"])
+    largo.index.names = ["Date", "symbol"]
+    largo = largo.reset_index()
+    largo["ts"] = _a_epoch(largo["Date"])
+    return largo[["symbol", "ts"] + CAMPOS_OHLCV]
@@ -0,0 +1,252 @@
+"""Analítica entre activos: índices sectoriales ponderados y matriz de correlación móvil.
+
+Ambas se mantienen de forma incremental: cada barra nueva suma su aporte (y la que sale
+de la ventana resta el suyo) en O(n²) para n símbolos, en lugar de recalcular la ventana
+completa en O(ventana x n²) en cada refresco. Como en `bolsa.incremental`, la última
+barra puede revisarse (la vela del día en curso) deshaciendo sólo su aporte.
+
+Cada retorno se toma contra el último cierre válido del símbolo, no contra la fila
+anterior del calendario común: tras un feriado local (`CLP=X` y `HG=F` sí cotizan) la
+primera rueda trae el movimiento de todo el hueco, que así no se pierde del índice.
+
+La correlación es la de pares completos de `DataFrame.corr()` sobre esos retornos
+logarítmicos: cada par usa sólo las barras en que ambos símbolos tienen dato.
+"""
+from collections import deque, namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Resultado publicado en el snapshot (todo de sólo lectura):
+# `indices` (fecha x sector, base 100), `var_sectores` (% de la última barra por sector),
+# `correlacion` y `covarianza` (símbolo x símbolo, retornos logarítmicos diarios).
+AnaliticaMercado = namedtuple("AnaliticaMercado", ["indices", "var_sectores", "correlacion", "covarianza"])
+
+VENTANA_CORRELACION = 30
+MIN_OBSERVACIONES = 10
+
+
+class CorrelacionMovil:
+    """Covarianza/correlación por pares sobre las últimas `ventana` filas de retornos.
+
+    Guarda cuatro matrices de sumas (conteos, sumas, sumas de cuadrados y productos
+    cruzados, cada una restringida a las filas donde ambos símbolos tienen dato). Cada
+    `ventana` filas se rehacen desde las filas guardadas para no acumular error de redondeo.
+    """
+
+    def __init__(self, n, ventana=VENTANA_CORRELACION, min_observaciones=MIN_OBSERVACIONES):
+        self.n = n
+        self.ventana = ventana
+        self.min_observaciones = min_observaciones
+        self._filas = deque()
+        self._desde_recalculo = 0
+        self._recalcular()
+
+    def __len__(self):
+        return len(self._filas)
+
+    def agregar(self, retornos):
+        validos = ~np.isnan(retornos)
+        fila = (np.where(validos, retornos, 0.0), validos.astype(float))
+        self._filas.append(fila)
+        self._sumar(*fila, signo=1)
+        if len(self._filas) > self.ventana:
+            self._sumar(*self._filas.popleft(), signo=-1)
+        self._desde_recalculo += 1
+        if self._desde_recalculo >= self.ventana:
+            self._recalcular()
+
+    def reemplazar_ultima(self, retornos):
+        self._sumar(*self._filas.pop(), signo=-1)
+        self.agregar(retornos)
+
+    def _sumar(self, x, m, signo):
+        self._conteos += signo * np.outer(m, m)
+        self._sumas += signo * np.outer(x, m)
+        self._cuadrados += signo * np.outer(x * x, m)
+        self._cruzados += signo * np.outer(x, x)
+
+    def _recalcular(self):
+        if self._filas:
+            x = np.array([f[0] for f in self._filas])
+            m = np.array([f[1] for f in self._filas])
+        else:
+            x = m = np.zeros((0, self.n))
+        self._conteos, self._sumas = m.T @ m, x.T @ m
+        self._cuadrados, self._cruzados = (x * x).T @ m, x.T @ x
+        self._desde_recalculo = 0
+
+    def matrices(self):
+        """(covarianza, correlacion) de la ventana; NaN en los pares con menos de `min_observaciones`."""
+        n = np.where(self._conteos >= max(self.min_observaciones, 2), self._conteos, np.nan)
+        sx = self._sumas
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (self._cruzados - sx * sx.T / n) / (n - 1)
+            var_x = np.clip((self._cuadrados - sx * sx / n) / (n - 1), 0, None)
+            corr = np.clip(cov / np.sqrt(var_x * var_x.T), -1.0, 1.0)
+        return cov, corr
+
+
+class IndicesSectoriales:
+    """Índices encadenados (base 100) por sector, ponderados por volumen transado en dinero.
+
+    El peso de cada símbolo es una media exponencial de `cierre x volumen` hasta la barra
+    anterior. En sectores sin volumen (monedas, algunos futuros) se promedia con igual peso.
+    """
+
+    def __init__(self, pertenencia, span_pesos=20, historia=VENTANA_CORRELACION, base=100.0):
+        self.pertenencia = pertenencia  # matriz (sectores x símbolos) de 0/1
+        self.alpha = 2 / (span_pesos + 1)
+        n_sectores, n = pertenencia.shape
+        self._pesos = np.full(n, np.nan)
+        self._nivel = np.full(n_sectores, base)
+        self._retorno = np.zeros(n_sectores)
+        self._ultimos = np.full(n, np.nan)  # último retorno conocido de cada símbolo
+        self._historia = deque(maxlen=historia)
+        self._previo = None
+
+    def agregar(self, fecha, retornos, monto_transado):
+        self._previo = (self._pesos, self._nivel, self._retorno, self._ultimos)
+        self._retorno = self._retorno_sectores(retornos)
+        self._ultimos = np.where(np.isnan(retornos), self._ultimos, retornos)
+        self._nivel = self._nivel * (1 + self._retorno)
+        self._historia.append((fecha, self._nivel))
+
+        con_monto = np.isfinite(monto_transado)
+        self._pesos = np.where(
+            con_monto & np.isnan(self._pesos), monto_transado,
+            np.where(con_monto, self._pesos + self.alpha * (monto_transado - self._pesos), self._pesos),
+        )
+
+    def reemplazar_ultima(self, fecha, retornos, monto_transado):
+        self._pesos, self._nivel, self._retorno, self._ultimos = self._previo
+        self._historia.pop()
+        self.agregar(fecha, retornos, monto_transado)
+
+    def _retorno_sectores(self, retornos, sin_miembros=0.0):
+        validos = ~np.isnan(retornos)
+        r = np.where(validos, retornos, 0.0)
+        pesos = np.where(validos & (self._pesos > 0), self._pesos, 0.0)
+        ponderado, total = self.pertenencia @ (pesos * r), self.pertenencia @ pesos
+        igual, miembros = self.pertenencia @ r, self.pertenencia @ validos
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total > 0, ponderado / total, np.where(miembros > 0, igual / miembros, sin_miembros))
+
+    def niveles(self):
+        fechas = [f for f, _ in self._historia]
+        return fechas, np.array([n for _, n in self._historia]).reshape(len(fechas), len(self._nivel))
+
+    def variacion(self):
+        """% por sector con el último retorno de cada miembro.
+
+        No es el de la última fila del calendario común: en un feriado local (o en la
+        mañana, cuando sólo los activos extranjeros tienen la barra de hoy) esa fila no
+        tiene a las acciones locales. NaN en los sectores sin ningún retorno.
+        """
+        return self._retorno_sectores(self._ultimos, sin_miembros=np.nan) * 100
+
+
+class AnaliticaIncremental:
+    """Estado de la analítica del universo, alimentado con los cierres y volúmenes de cada refresco.
+
+    `actualizar` recibe los frames anchos (fecha x ticker) de la ventana del almacén y sólo
+    procesa las barras posteriores a la última vista (revisando esa última si cambió). Si
+    la ventana ya no la contiene (p. ej. tras un reinicio) se reconstruye desde la ventana.
+    """
+
+    def __init__(self, categorias, ventana=VENTANA_CORRELACION, min_observaciones=MIN_OBSERVACIONES):
+        self.sectores = list(categorias)
+        self.simbolos = list(dict.fromkeys(s for cat in categorias.values() for s in cat.values()))
+        self._indice_simbolos = pd.Index(self.simbolos, name='symbol')
+        posicion = {s: i for i, s in enumerate(self.simbolos)}
+        self.pertenencia = np.zeros((len(self.sectores), len(self.simbolos)))
+        for i, cat in enumerate(categorias.values()):
+            self.pertenencia[i, [posicion[s] for s in cat.values()]] = 1
+        self.ventana = ventana
+        self.min_observaciones = min_observaciones
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.correlacion = CorrelacionMovil(len(self.simbolos), self.ventana, self.min_observaciones)
+        self.indices = IndicesSectoriales(self.pertenencia, historia=self.ventana)
+        self._fecha = None
+        self._ultima = None  # (cierres, volúmenes) de la última barra procesada
+        self._validos = None  # último cierre válido de cada símbolo, incluida la última barra
+        self._validos_previos = None  # ídem, hasta la barra anterior a la última
+        self._resultado = None
+
+    def actualizar(self, close, volume):
+        """Procesa las barras nuevas de `close`/`volume` y devuelve el AnaliticaMercado actualizado."""
+        continua = self._fecha is not None and self._fecha in close.index
+        if continua:
+            desde = close.index.get_loc(self._fecha)
+        else:
+            self._reiniciar()
+            desde = max(len(close) - self.ventana - 1, 0)
+
+        if not volume.index.equals(close.index):
+            volume = volume.reindex(index=close.index)
+        fechas = close.index[desde:]
+        cierres, volumenes = self._alinear(close, desde), self._alinear(volume, desde)
+
+        if continua:
+            if not _mismas_barras((cierres[0], volumenes[0]), self._ultima):
+                self._procesar(fechas[0], cierres[0], volumenes[0], revision=True)
+            fechas, cierres, volumenes = fechas[1:], cierres[1:], volumenes[1:]
+        for fecha, cierre, volumen in zip(fechas, cierres, volumenes):
+            self._procesar(fecha, cierre, volumen)
+
+        if self._resultado is None:
+            self._resultado = self.resultado()
+        return self._resultado
+
+    def _alinear(self, frame, desde):
+        """Filas `desde:` del frame como array (fecha x símbolo) en el orden del universo, sin reindexar en pandas."""
+        posiciones = frame.columns.get_indexer(self._indice_simbolos)
+        valores = frame.to_numpy(dtype=float)[desde:, posiciones]
+        valores[:, posiciones < 0] = np.nan
+        return valores
+
+    def _procesar(self, fecha, cierres, volumenes, revision=False):
+        anteriores = self._validos_previos if revision else self._validos
+        if anteriores is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                log_ret = np.log(cierres / anteriores)
+            log_ret[~np.isfinite(log_ret)] = np.nan
+            monto = cierres * volumenes
+            if revision:
+                self.correlacion.reemplazar_ultima(log_ret)
+                self.indices.reemplazar_ultima(fecha, np.expm1(log_ret), monto)
+            else:
+                self.correlacion.agregar(log_ret)
+                self.indices.agregar(fecha, np.expm1(log_ret), monto)
+        if not revision:
+            self._validos_previos = anteriores
+        validos = np.isfinite(cierres)
+        self._validos = np.where(validos, cierres, np.nan if anteriores is None else anteriores)
+        self._fecha, self._ultima = fecha, (cierres, volumenes)
+        self._resultado = None
+
+    def resultado(self):
+        """AnaliticaMercado con copias de sólo lectura del estado actual."""
+        fechas, niveles = self.indices.niveles()
+        simbolos = self._indice_simbolos
+        covarianza, correlacion = self.correlacion.matrices()
+        return AnaliticaMercado(
+            indices=pd.DataFrame(
+                _solo_lectura(niveles), index=pd.Index(fechas, name='Date'), columns=self.sectores, copy=False
+            ),
+            var_sectores=pd.Series(_solo_lectura(self.indices.variacion()), index=self.sectores, name='var', copy=False),
+            correlacion=pd.DataFrame(_solo_lectura(correlacion), index=simbolos, columns=simbolos, copy=False),
+            covarianza=pd.DataFrame(_solo_lectura(covarianza), index=simbolos, columns=simbolos, copy=False),
+        )
+
+
+def _mismas_barras(a, b):
+    return b is not None and all(np.array_equal(x, y, equal_nan=True) for x, y in zip(a, b))
+
+
+def _solo_lectura(arr):
+    arr = np.array(arr, dtype=float, copy=True)
+    arr.setflags(write=False)
+    return arr
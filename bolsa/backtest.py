@@ -0,0 +1,284 @@
+"""Backtest de las señales del tablero sobre la historia diaria guardada en el almacén local.
+
+Repite las mismas definiciones que usa el tablero (`calcular_rsi`, `calcular_macd`,
+`calcular_bollinger_bands` y la variación diaria contra `UMBRAL_ALERTA`) sobre años de
+barras y mide, por señal, parámetros y horizonte: cantidad de eventos, retorno a futuro,
+tasa de acierto y drawdown (peor retroceso dentro del horizonte).
+
+Cada ticker se evalúa vectorizado sobre su historia completa; los tickers se reparten en
+bloques entre procesos y cada bloque devuelve sumas que se agregan al final. En un
+barrido, cada familia de señales sólo recorre sus propios parámetros: 10 umbrales x 10
+ventanas RSI son 20 señales por ticker, no 100.
+
+Uso:
+    python -m bolsa.backtest --anios 10 --descargar
+    python -m bolsa.backtest --umbrales 1.5:4.0:0.25 --rsi-ventanas 7:21:2 --salida barrido.csv
+"""
+import argparse
+import itertools
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from bolsa.indicadores import calcular_bollinger_bands, calcular_macd, calcular_rsi
+from bolsa.metricas import METRICAS
+
+HORIZONTES = (1, 5, 10, 20)
+
+# Índices de las sumas que devuelve cada bloque: se agregan sumando, salvo el mínimo
+N, SUMA, SUMA_CUAD, ACIERTOS, SUMA_DD, MIN_DD = range(6)
+
+
+def cuadricula(umbrales=(2.5,), rsi_ventanas=(14,), rsi_niveles=((70, 30),), macd=((12, 26, 9),),
+               bollinger=((20, 2),)):
+    """Parámetros de cada familia de señales; el barrido es el producto dentro de cada familia."""
+    return {
+        "umbrales": [float(u) for u in umbrales],
+        "rsi": [(int(v), float(alto), float(bajo)) for v, (alto, bajo) in itertools.product(rsi_ventanas, rsi_niveles)],
+        "macd": [tuple(int(p) for p in m) for m in macd],
+        "bollinger": [(int(v), float(s)) for v, s in bollinger],
+    }
+
+
+# --- SEÑALES DE UN TICKER ---
+def senales_ticker(close, parametros):
+    """[(senal, {parámetros}, eventos)] para un ticker; `eventos` vale +1 (compra), -1 (venta) o 0.
+
+    Las señales de estado (RSI fuera de rango, precio fuera de las bandas) cuentan sólo la
+    barra en que empiezan a cumplirse, no cada barra en que se mantienen.
+    """
+    df = pd.DataFrame({'close': np.asarray(close, dtype=float)})
+    resultado = []
+
+    # Variación diaria contra el umbral de alerta: dirección del movimiento (continuación)
+    var = (df['close'].pct_change() * 100).to_numpy()
+    for umbral in parametros["umbrales"]:
+        eventos = np.where(np.abs(var) >= umbral, np.sign(var), 0.0)
+        resultado.append(("alta_volatilidad", {"umbral": umbral}, eventos))
+
+    for ventana, alto, bajo in parametros["rsi"]:
+        rsi = calcular_rsi(df, window=ventana)['RSI'].to_numpy()
+        resultado.append(("rsi_sobreventa", {"rsi_ventana": ventana, "rsi_nivel": bajo},
+                          _entradas(rsi < bajo).astype(float)))
+        resultado.append(("rsi_sobrecompra", {"rsi_ventana": ventana, "rsi_nivel": alto},
+                          -_entradas(rsi > alto).astype(float)))
+
+    # Cruce del histograma MACD, como las insignias del tablero
+    for rapida, lenta, senal in parametros["macd"]:
+        hist = calcular_macd(df, fast_period=rapida, slow_period=lenta, signal_period=senal)['MACD_Hist'].to_numpy()
+        ayer = np.concatenate(([np.nan], hist[:-1]))
+        eventos = np.select([(ayer < 0) & (hist > 0), (ayer > 0) & (hist < 0)], [1.0, -1.0], 0.0)
+        resultado.append(("macd_cruce", {"macd": f"{rapida}/{lenta}/{senal}"}, eventos))
+
+    # Cierre fuera de las bandas de Bollinger (reversión a la media)
+    for ventana, num_std in parametros["bollinger"]:
+        bandas = calcular_bollinger_bands(df, window=ventana, num_std=num_std)
+        c = bandas['close'].to_numpy()
+        eventos = _entradas(c < bandas['Lower'].to_numpy()) * 1.0 - _entradas(c > bandas['Upper'].to_numpy()) * 1.0
+        resultado.append(("bollinger_fuera", {"bb_ventana": ventana, "bb_std": num_std}, eventos))
+
+    # Referencia: comprar todas las barras, para comparar la tasa de acierto
+    resultado.append(("referencia", {}, np.ones(len(df))))
+    return resultado
+
+
+def _entradas(condicion):
+    """True sólo en la barra donde `condicion` pasa de False a True."""
+    previa = np.concatenate(([False], condicion[:-1]))
+    return condicion & ~previa
+
+
+# --- RESULTADOS A FUTURO ---
+def _caminos_futuros(close, horizontes):
+    """{h: (retorno a h barras, peor mínimo, peor máximo)} alineados con cada barra de origen."""
+    caminos = {}
+    n = len(close)
+    for h in horizontes:
+        retorno = np.full(n, np.nan)
+        minimo = np.full(n, np.nan)
+        maximo = np.full(n, np.nan)
+        if n > h:
+            ventanas = sliding_window_view(close[1:], h)[: n - h]
+            retorno[: n - h] = close[h:] / close[: n - h] - 1
+            minimo[: n - h] = ventanas.min(axis=1) / close[: n - h] - 1
+            maximo[: n - h] = ventanas.max(axis=1) / close[: n - h] - 1
+        caminos[h] = (retorno, minimo, maximo)
+    return caminos
+
+
+def evaluar_ticker(close, parametros, horizontes=HORIZONTES):
+    """{(senal, parámetros, h): sumas} para un ticker (ver N, SUMA, ... para el orden de las sumas)."""
+    close = np.asarray(close, dtype=float)
+    close = close[~np.isnan(close)]
+    sumas = {}
+    if len(close) < 2:
+        return sumas
+    caminos = _caminos_futuros(close, horizontes)
+    for senal, params, eventos in senales_ticker(close, parametros):
+        clave_params = tuple(sorted(params.items()))
+        activos = eventos != 0
+        if not activos.any():
+            continue
+        for h in horizontes:
+            retorno, minimo, maximo = caminos[h]
+            validos = activos & ~np.isnan(retorno)
+            if not validos.any():
+                continue
+            d = eventos[validos]
+            r = d * retorno[validos]
+            # Peor retroceso en la dirección de la señal dentro del horizonte (0 si nunca fue en contra)
+            dd = np.minimum(0.0, np.where(d > 0, minimo[validos], -maximo[validos]))
+            sumas[(senal, clave_params, h)] = np.array([
+                len(r), r.sum(), (r * r).sum(), (r > 0).sum(), dd.sum(), dd.min(),
+            ])
+    return sumas
+
+
+def _evaluar_bloque(closes, parametros, horizontes):
+    """Tarea de un proceso: evalúa un bloque de tickers y agrega sus sumas."""
+    total = {}
+    for close in closes:
+        _acumular(total, evaluar_ticker(close, parametros, horizontes))
+    return total
+
+
+def _acumular(total, parcial):
+    for clave, sumas in parcial.items():
+        previo = total.get(clave)
+        if previo is None:
+            total[clave] = sumas.copy()
+        else:
+            previo[:MIN_DD] += sumas[:MIN_DD]
+            previo[MIN_DD] = min(previo[MIN_DD], sumas[MIN_DD])
+
+
+def _resumir(total):
+    filas = []
+    for (senal, params, h), s in total.items():
+        n = s[N]
+        media = s[SUMA] / n
+        varianza = max(s[SUMA_CUAD] / n - media * media, 0.0) * n / (n - 1) if n > 1 else np.nan
+        filas.append({
+            "senal": senal, **dict(params), "horizonte": h, "eventos": int(n),
+            "retorno_medio_pct": media * 100,
+            "desvio_pct": np.sqrt(varianza) * 100,
+            "tasa_acierto_pct": s[ACIERTOS] / n * 100,
+            "drawdown_medio_pct": s[SUMA_DD] / n * 100,
+            "drawdown_max_pct": s[MIN_DD] * 100,
+        })
+    if not filas:
+        return pd.DataFrame()
+    columnas_params = [c for c in ("umbral", "rsi_ventana", "rsi_nivel", "macd", "bb_ventana", "bb_std")
+                       if any(c in f for f in filas)]
+    resultado = pd.DataFrame(filas)
+    orden = ["senal", *columnas_params, "horizonte"]
+    return resultado[orden + [c for c in resultado.columns if c not in orden]].sort_values(orden, ignore_index=True)
+
+
+# --- BACKTEST DEL UNIVERSO ---
+def backtest(df_hist, parametros=None, horizontes=HORIZONTES, procesos=None, tickers_por_bloque=16):
+    """Backtest de todas las señales y parámetros sobre un frame ancho con el formato de yf.download.
+
+    `procesos=1` evalúa en el proceso actual; `None` usa todos los núcleos. Devuelve un
+    DataFrame con una fila por señal, combinación de parámetros y horizonte.
+    """
+    parametros = parametros or cuadricula()
+    close = df_hist["Close"]
+    closes = [close[symbol].to_numpy(dtype=float) for symbol in close.columns]
+    bloques = [closes[i:i + tickers_por_bloque] for i in range(0, len(closes), tickers_por_bloque)]
+
+    total = {}
+    with METRICAS.medir("backtest"):
+        if procesos == 1 or len(bloques) <= 1:
+            for bloque in bloques:
+                _acumular(total, _evaluar_bloque(bloque, parametros, horizontes))
+        else:
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                futuros = [pool.submit(_evaluar_bloque, bloque, parametros, horizontes) for bloque in bloques]
+                for futuro in futuros:
+                    _acumular(total, futuro.result())
+    return _resumir(total)
+
+
+def cargar_historia(almacen, codigos, anios=10, descargar=False, descargador=None):
+    """Historia diaria de los últimos `anios` desde el almacén local.
+
+    Con `descargar=True`, antes completa el almacén pidiendo `anios` de historia a Yahoo
+    (una sola vez; los refrescos del tablero siguen siendo incrementales).
+    """
+    desde = datetime.now() - timedelta(days=int(anios * 365.25))
+    if descargar:
+        if descargador is None:
+            from bolsa.descarga import descargar_por_bloques as descargador
+        # Con `start` en vez de `period`: Yahoo no acepta períodos fraccionarios como "10.0y"
+        resultado = descargador(codigos, start=desde.strftime("%Y-%m-%d"), interval="1d")
+        almacen.guardar(resultado.datos)
+    return almacen.leer(codigos, desde=desde)
+
+
+# --- LÍNEA DE COMANDOS ---
+def _rango(texto, tipo=float):
+    """'1.5:4.0:0.25' -> [1.5, 1.75, ..., 4.0] (extremos incluidos); '2.5' -> [2.5]."""
+    partes = [tipo(p) for p in texto.split(":")]
+    if len(partes) == 1:
+        return partes
+    inicio, fin, paso = partes if len(partes) == 3 else (*partes, 1)
+    return [tipo(round(v, 10)) for v in np.arange(inicio, fin + paso / 2, paso)]
+
+
+def main(argv=None):
+    from bolsa import servicio
+    from bolsa.almacen import AlmacenBarras
+    from bolsa.universo import cargar_universo
+
+    parser = argparse.ArgumentParser(prog="python -m bolsa.backtest", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--universo", default=servicio.RUTA_UNIVERSO)
+    parser.add_argument("--almacen", default=servicio.RUTA_ALMACEN)
+    parser.add_argument("--anios", type=float, default=10)
+    parser.add_argument("--descargar", action="store_true", help="Completa el almacén con `--anios` de historia")
+    parser.add_argument("--umbrales", default=str(servicio.UMBRAL_ALERTA), help="Umbral o rango inicio:fin:paso")
+    parser.add_argument("--rsi-ventanas", default="14", help="Ventana o rango inicio:fin:paso")
+    parser.add_argument("--rsi-niveles", default="70/30", nargs="+", help="Pares sobrecompra/sobreventa")
+    parser.add_argument("--macd", default=["12/26/9"], nargs="+", help="Triples rápida/lenta/señal")
+    parser.add_argument("--bollinger", default=["20/2"], nargs="+", help="Pares ventana/desvíos")
+    parser.add_argument("--horizontes", type=int, nargs="+", default=list(HORIZONTES))
+    parser.add_argument("--procesos", type=int, default=None)
+    parser.add_argument("--salida", help="Archivo CSV de resultados (por defecto, stdout)")
+    args = parser.parse_args(argv)
+
+    niveles = [args.rsi_niveles] if isinstance(args.rsi_niveles, str) else args.rsi_niveles
+    parametros = cuadricula(
+        umbrales=_rango(args.umbrales),
+        rsi_ventanas=_rango(args.rsi_ventanas, int),
+        rsi_niveles=[tuple(float(x) for x in n.split("/")) for n in niveles],
+        macd=[tuple(int(x) for x in m.split("/")) for m in args.macd],
+        bollinger=[tuple(float(x) for x in b.split("/")) for b in args.bollinger],
+    )
+
+    categorias = cargar_universo(args.universo)
+    codigos = list(dict.fromkeys(symbol for cat in categorias.values() for symbol in cat.values()))
+    almacen = AlmacenBarras(args.almacen)
+    df_hist = cargar_historia(almacen, codigos, anios=args.anios, descargar=args.descargar)
+    if df_hist.empty:
+        print("El almacén no tiene historia para el universo; use --descargar.", file=sys.stderr)
+        return 1
+
+    inicio = datetime.now()
+    resultado = backtest(df_hist, parametros, horizontes=args.horizontes, procesos=args.procesos)
+    print(f"· {df_hist['Close'].shape[1]} tickers x {len(df_hist)} barras en "
+          f"{(datetime.now() - inicio).total_seconds():.1f}s", file=sys.stderr)
+
+    if args.salida:
+        resultado.to_csv(args.salida, index=False)
+    else:
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(resultado.round(3).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
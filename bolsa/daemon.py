@@ -0,0 +1,110 @@
+"""Demonio de alertas sin interfaz: refresca el mercado, evalúa las reglas y avisa por Telegram.
+
+Uso:
+    python -m bolsa.daemon --interval 60
+    python -m bolsa.daemon --interval 60 --intradia 5m
+    python -m bolsa.daemon --una-vez          # un solo refresco (cron)
+
+Las credenciales se leen de TELEGRAM_TOKEN y TELEGRAM_CHAT_ID; el resto de la
+configuración, de las mismas variables MONITOR_BOLSA_* que usa la interfaz. No importa
+Streamlit ni Plotly y el snapshot no guarda velas, para correr en una VM pequeña.
+"""
+import argparse
+import logging
+import signal
+import sys
+import threading
+
+from bolsa import servicio
+from bolsa.descarga import ESTADO_OK
+from bolsa.intradia import INTERVALOS_INTRADIA
+from bolsa.metricas import METRICAS
+
+log = logging.getLogger("bolsa.daemon")
+
+
+def _registrar_fin(detener):
+    def al_recibir(signum, _frame):
+        log.info("Señal %s recibida; deteniendo", signal.Signals(signum).name)
+        detener.set()
+    signal.signal(signal.SIGINT, al_recibir)
+    signal.signal(signal.SIGTERM, al_recibir)
+
+
+def _informar(nombre, publicacion):
+    if publicacion.error is not None:
+        log.warning("Refresco %s fallido: %s", nombre, publicacion.error)
+        return
+    datos = publicacion.datos
+    metricas = datos.metricas.values() if isinstance(datos.metricas, dict) else [datos.metricas]
+    problemas = sum(1 for e in datos.estados.values() if e.estado != ESTADO_OK)
+    log.info("Refresco %s #%d: %d tickers, %d con problemas",
+             nombre, publicacion.version, sum(len(m) for m in metricas), problemas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m bolsa.daemon", description="Refresco y alertas del Monitor Bolsa, sin interfaz."
+    )
+    parser.add_argument("--interval", type=int, default=servicio.INTERVALO_REFRESCO,
+                        help="Segundos entre refrescos diarios (por defecto MONITOR_BOLSA_INTERVALO o 60)")
+    parser.add_argument("--intradia", choices=list(INTERVALOS_INTRADIA),
+                        help="Además, vigila velas intradía de este intervalo y alerta sobre ellas")
+    parser.add_argument("--intervalo-intradia", type=int, default=servicio.INTERVALO_REFRESCO_INTRADIA,
+                        help="Segundos entre refrescos intradía")
+    parser.add_argument("--universo", default=servicio.RUTA_UNIVERSO)
+    parser.add_argument("--reglas", default=servicio.RUTA_REGLAS)
+    parser.add_argument("--almacen", default=servicio.RUTA_ALMACEN)
+    parser.add_argument("--una-vez", action="store_true", help="Un solo refresco, despacha las alertas y sale")
+    parser.add_argument("--metricas", action="store_true",
+                        help="Mide etapas y escribe el archivo Prometheus en cada refresco")
+    parser.add_argument("--log", default="INFO", help="Nivel de logging")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.metricas:
+        METRICAS.habilitado = True
+
+    token, chat_id = servicio.credenciales_telegram()
+    if not (token and chat_id):
+        log.warning("TELEGRAM_TOKEN/TELEGRAM_CHAT_ID no definidos: se evalúan las reglas pero no se envían alertas")
+
+    svc = servicio.crear_servicio(
+        token, chat_id, ruta_universo=args.universo, ruta_reglas=args.reglas, ruta_almacen=args.almacen,
+        intervalo=args.interval, intervalo_intradia=args.intervalo_intradia,
+        intervalo_alertas_intradia=args.intradia or servicio.INTERVALO_ALERTAS_INTRADIA, con_velas=False,
+        con_analitica=False,
+        carpeta_snapshots=None,  # sin velas: no debe pisar el snapshot que lee la interfaz
+    )
+    log.info("Universo: %d tickers, %d reglas", len(svc.tickers_plano), len(svc.motor_reglas.reglas))
+
+    if args.una_vez:
+        snapshot = svc.snapshot_diario()
+        svc.al_publicar_diario(snapshot)
+        enviadas = svc.despachador.esperar_vacia(timeout=60)
+        log.info("Listo: %d tickers, %d alertas enviadas", len(snapshot.metricas), svc.despachador.enviados)
+        return 0 if enviadas else 1
+
+    detener = threading.Event()
+    _registrar_fin(detener)
+
+    sondeos = {"diario": svc.sondeo_diario()}
+    if args.intradia:
+        sondeos[args.intradia] = svc.sondeo_intradia(intervalos=(args.intradia,))
+
+    # El hilo principal sólo informa cada refresco publicado; el trabajo ocurre en los sondeos
+    versiones = dict.fromkeys(sondeos, 0)
+    while not detener.wait(1.0):
+        for nombre, sondeo in sondeos.items():
+            publicacion = sondeo.ultimo()
+            if publicacion.version != versiones[nombre]:
+                versiones[nombre] = publicacion.version
+                _informar(nombre, publicacion)
+
+    if not svc.detener(timeout_alertas=10):
+        log.warning("Quedaron alertas sin enviar al salir")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""Descarga de Yahoo Finance en bloques paralelos, con reintentos y estado por ticker."""
+import functools
+import logging
+import math
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FuturoTimeout, wait
+
+import pandas as pd
+
+from bolsa.metricas import METRICAS
+
+log = logging.getLogger(__name__)
+
+ESTADO_OK = "ok"
+ESTADO_SIN_DATOS = "sin_datos"
+ESTADO_ERROR = "error"
+ESTADO_TIMEOUT = "timeout"
+
+EstadoTicker = namedtuple("EstadoTicker", ["estado", "detalle", "intentos"])
+ResultadoDescarga = namedtuple("ResultadoDescarga", ["datos", "estados"])
+
+
+def descargar_por_bloques(codigos, descargar=None, tamano_bloque=50, max_hilos=4,
+                          reintentos=2, timeout=60, **parametros):
+    """Descarga `codigos` en bloques concurrentes y devuelve un ResultadoDescarga.
+
+    Cada bloque es una llamada a `descargar(bloque, **parametros)` (por defecto yf.download).
+    Los bloques que fallan o superan `timeout` segundos se reintentan por separado,
+    partidos a la mitad, para aislar al ticker problemático. Nunca lanza excepciones por
+    fallas de descarga: `estados` informa para cada ticker ok, sin_datos, error o timeout.
+    """
+    if descargar is None:
+        import yfinance as yf
+        descargar = functools.partial(yf.download, progress=False, threads=False)
+
+    codigos = list(dict.fromkeys(codigos))  # un símbolo repetido en el universo se pide una vez
+    estados = {}
+    frames = []
+    pendientes = [codigos[i:i + tamano_bloque] for i in range(0, len(codigos), tamano_bloque)]
+
+    # Sin `with`: un bloque colgado no debe impedir que devolvamos lo que sí llegó
+    pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="descarga")
+    try:
+        for intento in range(1, reintentos + 2):
+            if not pendientes:
+                break
+            fallidos = []
+            for bloque, df, error in _correr_bloques(pool, descargar, pendientes, parametros, timeout, max_hilos):
+                if isinstance(error, FuturoTimeout):
+                    METRICAS.contar("yahoo_timeouts")
+                    _marcar(estados, bloque, ESTADO_TIMEOUT, str(error), intento)
+                    fallidos.append(bloque)
+                    continue
+                if error is not None:
+                    METRICAS.contar("yahoo_errores")
+                    _marcar(estados, bloque, ESTADO_ERROR, str(error), intento)
+                    fallidos.append(bloque)
+                    continue
+
+                for symbol in bloque:
+                    if _tiene_datos(df, symbol):
+                        estados[symbol] = EstadoTicker(ESTADO_OK, "", intento)
+                    else:
+                        estados[symbol] = EstadoTicker(ESTADO_SIN_DATOS, "Yahoo no devolvió barras", intento)
+                if df is not None and not df.empty:
+                    frames.append(df)
+
+            pendientes = [mitad for bloque in fallidos for mitad in _partir(bloque)]
+            if pendientes and intento <= reintentos:
+                log.warning("Reintentando %d bloques (%d tickers) tras el intento %d",
+                            len(pendientes), sum(map(len, pendientes)), intento)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    datos = pd.concat(frames, axis=1).sort_index().sort_index(axis=1) if frames else pd.DataFrame()
+    return ResultadoDescarga(datos, estados)
+
+
+def _correr_bloques(pool, descargar, bloques, parametros, timeout, max_hilos):
+    """Genera (bloque, df, error) a medida que terminan los bloques de una ronda.
+
+    El plazo de `timeout` segundos corre para cada bloque desde que un hilo lo empieza,
+    no desde que se encoló: con más bloques que hilos, los que esperan turno no se
+    consumen el plazo. Un bloque que no llega a empezar dentro de lo que tomarían todas
+    las tandas (p. ej. porque hay hilos colgados de una ronda anterior) también vence.
+    """
+    inicio_ronda = time.monotonic()
+    limite_cola = inicio_ronda + timeout * math.ceil(len(bloques) / max_hilos)
+    activos = {}
+    for bloque in bloques:
+        arranque = []
+        activos[pool.submit(_descargar_bloque, descargar, bloque, parametros, arranque)] = (bloque, arranque)
+
+    while activos:
+        limites = [a[0] + timeout if a else limite_cola for _, a in activos.values()]
+        listos, _ = wait(activos, timeout=max(0.0, min(limites) - time.monotonic()), return_when=FIRST_COMPLETED)
+        for futuro in listos:
+            bloque, _ = activos.pop(futuro)
+            try:
+                yield bloque, futuro.result(), None
+            except Exception as e:
+                yield bloque, None, e
+
+        ahora = time.monotonic()
+        for futuro, (bloque, arranque) in list(activos.items()):
+            if arranque and ahora >= arranque[0] + timeout:
+                error = FuturoTimeout(f"sin respuesta en {timeout}s")
+            elif not arranque and ahora >= limite_cola:
+                error = FuturoTimeout(f"no empezó en {ahora - inicio_ronda:.0f}s (hilos ocupados)")
+            else:
+                continue
+            futuro.cancel()
+            del activos[futuro]
+            yield bloque, None, error
+
+
+def _descargar_bloque(descargar, bloque, parametros, arranque=None):
+    if arranque is not None:
+        arranque.append(time.monotonic())
+    METRICAS.contar("yahoo_llamadas")
+    with METRICAS.medir("yahoo_bloque"):
+        df = descargar(bloque, **parametros)
+    if METRICAS.habilitado and df is not None:
+        # Yahoo no expone los bytes del cable; medimos el tamaño de lo parseado
+        METRICAS.contar("descarga_bytes", int(df.memory_usage(deep=True).sum()))
+    return df
+
+
+def resumen_estados(estados):
+    """{symbol: EstadoTicker} sólo de los tickers que no quedaron ok."""
+    return {symbol: e for symbol, e in estados.items() if e.estado != ESTADO_OK}
+
+
+def _tiene_datos(df, symbol):
+    if df is None or df.empty or not isinstance(df.columns, pd.MultiIndex):
+        return False
+    if ("Close", symbol) not in df.columns:
+        return False
+    return bool(df[("Close", symbol)].notna().any())
+
+
+def _marcar(estados, bloque, estado, detalle, intento):
+    for symbol in bloque:
+        estados[symbol] = EstadoTicker(estado, detalle, intento)
+
+
+def _partir(bloque):
+    if len(bloque) <= 1:
+        return [bloque]
+    mitad = len(bloque) // 2
+    return [bloque[:mitad], bloque[mitad:]]
@@ -0,0 +1,127 @@
+"""Construcción perezosa de las figuras Plotly de cada tarjeta (con caché LRU) y del mapa de correlaciones."""
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+from plotly.subplots import make_subplots
+import plotly.graph_objects as go
+
+from bolsa.metricas import METRICAS
+
+# Figura de la caché y el tamaño de su JSON (lo que se envía al navegador), medido una sola
+# vez al construirla y sólo con las métricas habilitadas (si no, `bytes_json` es None)
+FiguraCacheada = namedtuple("FiguraCacheada", ["figura", "bytes_json"])
+
+
+def construir_figura(data_velas, paleta):
+    """Figura de 4 subplots (velas + BB, RSI, MACD, volumen) con los colores de `paleta`."""
+    fig = make_subplots(
+        rows=4, cols=1, shared_xaxes=True, vertical_spacing=0.02,
+        row_heights=[0.45, 0.15, 0.20, 0.20] 
+    )
+    
+    # --- Subplot 1: GRÁFICO DE VELAS y BB ---
+    fig.add_trace(go.Candlestick(
+        x=data_velas.index, open=data_velas['open'], high=data_velas['high'],
+        low=data_velas['low'], close=data_velas['close'],
+        increasing_line_color=paleta["POSITIVE"], decreasing_line_color=paleta["NEGATIVE"],
+        name='Velas'
+    ), row=1, col=1)
+
+    # Bandas de Bollinger (SMA, Upper, Lower)
+    fig.add_trace(go.Scatter(x=data_velas.index, y=data_velas['Upper'], line=dict(color='rgba(255, 165, 0, 0.8)', width=1), name='Banda Superior'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=data_velas.index, y=data_velas['SMA'], line=dict(color=paleta["ACCENT"], width=1.5), name='SMA 20'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=data_velas.index, y=data_velas['Lower'], line=dict(color='rgba(255, 165, 0, 0.8)', width=1), name='Banda Inferior'), row=1, col=1)
+    
+    # --- Subplot 2: RSI ---
+    fig.add_trace(go.Scatter(x=data_velas.index, y=data_velas['RSI'], line=dict(color=paleta["POSITIVE"], width=1.5), name='RSI'), row=2, col=1)
+    fig.add_hline(y=70, line_dash="dash", line_color="red", row=2, col=1, opacity=0.5)
+    fig.add_hline(y=30, line_dash="dash", line_color="green", row=2, col=1, opacity=0.5)
+
+    # --- Subplot 3: MACD ---
+    fig.add_trace(go.Bar(
+        x=data_velas.index, y=data_velas['MACD_Hist'], 
+        marker_color=np.where(data_velas['MACD_Hist'].to_numpy() > 0, paleta["POSITIVE"], paleta["NEGATIVE"]),
+        name='MACD Hist'
+    ), row=3, col=1)
+    fig.add_trace(go.Scatter(x=data_velas.index, y=data_velas['MACD'], line=dict(color=paleta["ACCENT"], width=1.5), name='MACD'), row=3, col=1)
+    fig.add_trace(go.Scatter(x=data_velas.index, y=data_velas['Signal_Line'], line=dict(color='orange', width=1), name='Señal'), row=3, col=1)
+    
+    # --- Subplot 4: Volumen (Barra) ---
+    fig.add_trace(go.Bar(
+        x=data_velas.index, 
+        y=data_velas['volume'],
+        marker_color='rgba(150, 150, 150, 0.6)', 
+        name='Volumen'
+    ), row=4, col=1)
+
+
+    # --- Configuración de la Figura ---
+    fig.update_layout(
+        height=600, margin=dict(l=10, r=10, t=20, b=20),
+        paper_bgcolor=paleta["CARD_BG"], plot_bgcolor=paleta["CARD_BG"],
+        showlegend=False, xaxis_rangeslider_visible=False,
+        font=dict(color=paleta["TEXT_NEUTRAL"])
+    )
+
+    # Configuración de Ejes
+    fig.update_yaxes(title_text="Precio / BB", row=1, col=1, showgrid=False)
+    fig.update_yaxes(title_text="RSI", range=[0, 100], row=2, col=1, showgrid=True, gridcolor=paleta["BORDER"])
+    fig.update_yaxes(title_text="MACD", row=3, col=1, showgrid=True, gridcolor=paleta["BORDER"])
+    fig.update_yaxes(title_text="Vol", row=4, col=1, showgrid=False)
+    fig.update_xaxes(row=4, col=1, showgrid=False)
+    return fig
+
+
+def figura_correlacion(correlacion, etiquetas, paleta):
+    """Mapa de calor de la matriz de correlación (símbolo x símbolo) con `etiquetas` en los ejes."""
+    fig = go.Figure(go.Heatmap(
+        z=correlacion.to_numpy(), x=etiquetas, y=etiquetas, zmin=-1, zmax=1, zmid=0,
+        colorscale=[[0, paleta["NEGATIVE"]], [0.5, paleta["CARD_BG"]], [1, paleta["POSITIVE"]]],
+        hovertemplate="%{y} / %{x}: %{z:.2f}<extra></extra>", name='Correlación',
+    ))
+    fig.update_layout(
+        height=max(400, 18 * len(etiquetas)), margin=dict(l=10, r=10, t=20, b=20),
+        paper_bgcolor=paleta["CARD_BG"], plot_bgcolor=paleta["CARD_BG"],
+        font=dict(color=paleta["TEXT_NEUTRAL"]), yaxis=dict(autorange="reversed"),
+    )
+    return fig
+
+
+class CacheFiguras:
+    """Memoiza figuras por (symbol, última barra, tema) y descarta las menos usadas.
+
+    La clave incluye también el cierre y volumen de la última barra: la vela del día en
+    curso conserva su fecha mientras se revisa, y no queremos servir una figura vieja.
+    """
+
+    def __init__(self, max_entradas=256):
+        self.max_entradas = max_entradas
+        self._figuras = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, symbol, velas, tema, paleta):
+        """`FiguraCacheada` de `velas` (un `VelasTicker` del snapshot) con el tema dado."""
+        clave = (symbol, velas.fechas[-1], velas.ultima('close'), velas.ultima('volume'), tema)
+        with self._lock:
+            entrada = self._figuras.get(clave)
+            if entrada is not None:
+                self._figuras.move_to_end(clave)
+                self.aciertos += 1
+                METRICAS.contar("figuras_cache_aciertos")
+                return entrada
+
+        # Se construye fuera del lock para no bloquear a otras sesiones
+        METRICAS.contar("figuras_cache_fallos")
+        with METRICAS.medir("figura_construccion"):
+            fig = construir_figura(velas.a_dataframe(), paleta)
+        entrada = FiguraCacheada(fig, len(fig.to_json()) if METRICAS.habilitado else None)
+        with self._lock:
+            self.fallos += 1
+            self._figuras[clave] = entrada
+            self._figuras.move_to_end(clave)
+            while len(self._figuras) > self.max_entradas:
+                self._figuras.popitem(last=False)
+        return entrada
@@ -0,0 +1,187 @@
+"""Calculadoras incrementales O(1) de BB, RSI y MACD para barras nuevas o revisadas.
+
+Cada calculadora guarda su estado corriente y admite deshacer la última barra, de modo
+que la vela en curso puede revisarse varias veces al día sin recalcular la historia.
+Los resultados coinciden con `calcular_bollinger_bands`, `calcular_rsi` y `calcular_macd`
+aplicados a la serie de cierres del ticker sin huecos (como las velas intradía de
+`bolsa.intradia`). El refresco diario no las usa: sus indicadores se calculan sobre el
+frame ancho del almacén, con las filas NaN de los feriados de cada ticker.
+"""
+import math
+from collections import deque
+
+NAN = float('nan')
+
+
+class EMAIncremental:
+    """Media exponencial con `adjust=False` (la del MACD): parte del primer valor observado."""
+
+    def __init__(self, span):
+        self.alpha = 2 / (span + 1)
+        self.valor = None
+        self._previo = None
+
+    def actualizar(self, x):
+        self._previo = self.valor
+        self.valor = x if self.valor is None else self.valor + self.alpha * (x - self.valor)
+        return self.valor
+
+    def deshacer(self):
+        self.valor = self._previo
+
+
+class EWMAjustadaIncremental:
+    """Media exponencial con `adjust=True` y `min_periods`, como `Series.ewm(com=...).mean()`."""
+
+    def __init__(self, com, min_periods=0):
+        self.decaimiento = 1 - 1 / (1 + com)
+        self.min_periods = min_periods
+        self.numerador = 0.0
+        self.denominador = 0.0
+        self.observaciones = 0
+        self._previo = None
+
+    def actualizar(self, x):
+        self._previo = (self.numerador, self.denominador, self.observaciones)
+        self.numerador = self.numerador * self.decaimiento + x
+        self.denominador = self.denominador * self.decaimiento + 1
+        self.observaciones += 1
+        return self.valor
+
+    def deshacer(self):
+        self.numerador, self.denominador, self.observaciones = self._previo
+
+    @property
+    def valor(self):
+        if self.observaciones < max(self.min_periods, 1):
+            return NAN
+        return self.numerador / self.denominador
+
+
+class VentanaMovil:
+    """Media y desviación estándar (ddof=1) sobre las últimas `window` observaciones.
+
+    Mantiene sumas corrientes centradas en un valor de referencia para limitar la
+    cancelación numérica, y las recalcula desde la ventana cada cierto número de pasos.
+    """
+
+    RECALCULO_CADA = 1000
+
+    def __init__(self, window):
+        self.window = window
+        self.valores = deque()
+        self._referencia = None
+        self._suma = 0.0
+        self._suma_cuadrados = 0.0
+        self._pasos = 0
+        self._expulsado = None
+
+    def actualizar(self, x):
+        if self._referencia is None:
+            self._referencia = x
+        self.valores.append(x)
+        self._sumar(x, 1)
+        self._expulsado = None
+        if len(self.valores) > self.window:
+            self._expulsado = self.valores.popleft()
+            self._sumar(self._expulsado, -1)
+
+        self._pasos += 1
+        if self._pasos % self.RECALCULO_CADA == 0:
+            self._recalcular()
+
+    def deshacer(self):
+        self._sumar(self.valores.pop(), -1)
+        if self._expulsado is not None:
+            self.valores.appendleft(self._expulsado)
+            self._sumar(self._expulsado, 1)
+            self._expulsado = None
+
+    def _sumar(self, x, signo):
+        d = x - self._referencia
+        self._suma += signo * d
+        self._suma_cuadrados += signo * d * d
+
+    def _recalcular(self):
+        self._referencia = self.valores[-1]
+        self._suma = self._suma_cuadrados = 0.0
+        for x in self.valores:
+            self._sumar(x, 1)
+
+    @property
+    def media(self):
+        if len(self.valores) < self.window:
+            return NAN
+        return self._referencia + self._suma / self.window
+
+    @property
+    def std(self):
+        n = len(self.valores)
+        if n < self.window or n < 2:
+            return NAN
+        varianza = (self._suma_cuadrados - self._suma * self._suma / n) / (n - 1)
+        return math.sqrt(max(varianza, 0.0))
+
+
+class CalculadoraIndicadores:
+    """Estado incremental de BB, RSI y MACD para un ticker."""
+
+    def __init__(self, bb_window=20, num_std=2, rsi_window=14,
+                 fast_period=12, slow_period=26, signal_period=9):
+        self.num_std = num_std
+        self.ventana = VentanaMovil(bb_window)
+        self.avg_gain = EWMAjustadaIncremental(com=rsi_window - 1, min_periods=rsi_window)
+        self.avg_loss = EWMAjustadaIncremental(com=rsi_window - 1, min_periods=rsi_window)
+        self.ema_fast = EMAIncremental(fast_period)
+        self.ema_slow = EMAIncremental(slow_period)
+        self.signal = EMAIncremental(signal_period)
+        self.ultima_fecha = None
+        self.close_previo = None
+        self._close_ultimo = None
+        self.resultado = None
+
+    def actualizar(self, fecha, close):
+        """Incorpora una barra nueva, o revisa la última si `fecha` coincide con ella."""
+        if self.ultima_fecha is not None:
+            if fecha == self.ultima_fecha:
+                self._deshacer()
+            elif fecha < self.ultima_fecha:
+                raise ValueError(f"Barra fuera de orden: {fecha} es anterior a {self.ultima_fecha}")
+            else:
+                self.close_previo = self._close_ultimo
+
+        # Igual que calcular_rsi: la primera diferencia es NaN y cuenta como ganancia/pérdida 0
+        delta = 0.0 if self.close_previo is None else close - self.close_previo
+        self.ventana.actualizar(close)
+        avg_gain = self.avg_gain.actualizar(delta if delta > 0 else 0.0)
+        avg_loss = self.avg_loss.actualizar(-delta if delta < 0 else 0.0)
+        ema_fast = self.ema_fast.actualizar(close)
+        ema_slow = self.ema_slow.actualizar(close)
+        macd = ema_fast - ema_slow
+        signal = self.signal.actualizar(macd)
+
+        self.ultima_fecha = fecha
+        self._close_ultimo = close
+
+        sma, std = self.ventana.media, self.ventana.std
+        self.resultado = {
+            'close': close,
+            'SMA': sma, 'STD': std,
+            'Upper': sma + std * self.num_std, 'Lower': sma - std * self.num_std,
+            'RSI': _rsi(avg_gain, avg_loss),
+            'EMA_Fast': ema_fast, 'EMA_Slow': ema_slow,
+            'MACD': macd, 'Signal_Line': signal, 'MACD_Hist': macd - signal,
+        }
+        return self.resultado
+
+    def _deshacer(self):
+        for componente in (self.ventana, self.avg_gain, self.avg_loss, self.ema_fast, self.ema_slow, self.signal):
+            componente.deshacer()
+
+
+def _rsi(avg_gain, avg_loss):
+    if math.isnan(avg_gain) or math.isnan(avg_loss):
+        return NAN
+    if avg_loss == 0:
+        return 100.0 if avg_gain > 0 else NAN
+    return 100 - (100 / (1 + avg_gain / avg_loss))
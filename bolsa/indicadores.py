@@ -0,0 +1,149 @@
+"""Indicadores técnicos: funciones por ticker y motor vectorizado para todo el universo."""
+import numpy as np
+import pandas as pd
+
+# Renombre de los campos de yf.download a los nombres usados en los indicadores
+RENOMBRE_CAMPOS = {'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close', 'Volume': 'volume', 'Adj Close': 'adjusted close'}
+
+# Columnas que deben existir (no NaN) para que una barra se considere completa
+COLUMNAS_INDICADORES = ['open', 'high', 'low', 'close', 'volume', 'SMA', 'STD', 'Upper', 'Lower',
+                        'RSI', 'EMA_Fast', 'EMA_Slow', 'MACD', 'Signal_Line', 'MACD_Hist']
+
+
+# --- FUNCIONES DE ANÁLISIS TÉCNICO POR TICKER ---
+def calcular_bollinger_bands(df, window=20, num_std=2):
+    df['SMA'] = df['close'].rolling(window=window).mean()
+    df['STD'] = df['close'].rolling(window=window).std()
+    df['Upper'] = df['SMA'] + (df['STD'] * num_std)
+    df['Lower'] = df['SMA'] - (df['STD'] * num_std)
+    return df
+
+def calcular_rsi(df, window=14):
+    delta = df['close'].diff()
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    avg_gain = gain.ewm(com=window - 1, min_periods=window).mean()
+    avg_loss = loss.ewm(com=window - 1, min_periods=window).mean()
+    rs = avg_gain / avg_loss
+    df['RSI'] = 100 - (100 / (1 + rs))
+    return df
+
+def calcular_macd(df, fast_period=12, slow_period=26, signal_period=9):
+    df['EMA_Fast'] = df['close'].ewm(span=fast_period, adjust=False).mean()
+    df['EMA_Slow'] = df['close'].ewm(span=slow_period, adjust=False).mean()
+    df['MACD'] = df['EMA_Fast'] - df['EMA_Slow']
+    df['Signal_Line'] = df['MACD'].ewm(span=signal_period, adjust=False).mean()
+    df['MACD_Hist'] = df['MACD'] - df['Signal_Line']
+    return df
+
+
+# --- MOTOR VECTORIZADO (TODOS LOS TICKERS EN UNA PASADA) ---
+def calcular_indicadores_universo(df_hist, bb_window=20, num_std=2, rsi_window=14,
+                                  fast_period=12, slow_period=26, signal_period=9):
+    """Calcula BB, RSI y MACD para todos los tickers a la vez sobre los frames anchos de yf.download.
+
+    Cada operación rolling/ewm se aplica columna a columna sobre el frame (fecha x ticker),
+    por lo que el resultado de cada ticker es idéntico al de las funciones `calcular_*`.
+    Devuelve un DataFrame con columnas (indicador, ticker).
+    """
+    campos = {RENOMBRE_CAMPOS.get(campo, campo): df_hist[campo]
+              for campo in df_hist.columns.get_level_values(0).unique()}
+    close = campos['close']
+
+    # Bandas de Bollinger
+    sma = close.rolling(window=bb_window).mean()
+    std = close.rolling(window=bb_window).std()
+
+    # RSI
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    avg_gain = gain.ewm(com=rsi_window - 1, min_periods=rsi_window).mean()
+    avg_loss = loss.ewm(com=rsi_window - 1, min_periods=rsi_window).mean()
+    rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+
+    # MACD
+    ema_fast = close.ewm(span=fast_period, adjust=False).mean()
+    ema_slow = close.ewm(span=slow_period, adjust=False).mean()
+    macd = ema_fast - ema_slow
+    signal = macd.ewm(span=signal_period, adjust=False).mean()
+
+    campos.update({
+        'SMA': sma, 'STD': std,
+        'Upper': sma + std * num_std, 'Lower': sma - std * num_std,
+        'RSI': rsi,
+        'EMA_Fast': ema_fast, 'EMA_Slow': ema_slow,
+        'MACD': macd, 'Signal_Line': signal, 'MACD_Hist': macd - signal,
+    })
+    indicadores = pd.concat(campos, axis=1)
+    indicadores.columns.names = ['Indicador', 'Ticker']
+    return indicadores
+
+
+def mascara_barras_completas(indicadores):
+    """Matriz booleana (fecha x ticker): True si la barra tiene todos los indicadores calculados."""
+    presentes = [c for c in COLUMNAS_INDICADORES if c in indicadores.columns.get_level_values(0)]
+    validas = None
+    for col in presentes:
+        notna = indicadores[col].notna()
+        validas = notna if validas is None else validas & notna
+    return validas
+
+
+def resumen_ultimas_barras(indicadores, umbral_alerta):
+    """Métricas de la última barra completa (y la anterior) de cada ticker, sin iterar por ticker.
+
+    Equivale a tomar `df.dropna().iloc[-1]` e `iloc[-2]` en cada ticker. Los tickers con
+    menos de dos barras completas quedan fuera del resultado.
+    """
+    validas = mascara_barras_completas(indicadores)
+    tickers = validas.columns
+    matriz = validas.to_numpy()
+    filas = np.arange(len(validas))[:, None]
+
+    pos_hoy = np.where(matriz, filas, -1).max(axis=0)
+    pos_ayer = np.where(matriz & (filas < pos_hoy), filas, -1).max(axis=0)
+    con_datos = pos_ayer >= 0
+    columnas = np.flatnonzero(con_datos)
+    pos_hoy, pos_ayer = pos_hoy[con_datos], pos_ayer[con_datos]
+
+    def tomar(indicador, posiciones):
+        return indicadores[indicador].reindex(columns=tickers).to_numpy()[posiciones, columnas]
+
+    # Volumen promedio de las últimas 20 barras completas (las mismas que muestra el gráfico)
+    volumen = np.nan_to_num(indicadores['volume'].reindex(columns=tickers).to_numpy()[:, columnas])
+    completas = matriz[:, columnas]
+    orden = np.cumsum(completas, axis=0)
+    total = orden[-1] if len(orden) else np.zeros(len(columnas))
+    en_ventana = completas & (orden > total - 20)
+    vol_prom_20 = (volumen * en_ventana).sum(axis=0) / np.maximum(en_ventana.sum(axis=0), 1)
+
+    precio = tomar('close', pos_hoy)
+    close_ayer = tomar('close', pos_ayer)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var_pct = np.where(close_ayer != 0, (precio - close_ayer) / close_ayer * 100, 0.0)
+
+    return pd.DataFrame({
+        'Precio': precio,
+        'Var': var_pct,
+        'Alerta': np.abs(var_pct) >= umbral_alerta,
+        'Volumen': tomar('volume', pos_hoy),
+        'Positivo': var_pct > 0,
+        'RSI_Hoy': tomar('RSI', pos_hoy),
+        'MACD_Hist_Hoy': tomar('MACD_Hist', pos_hoy),
+        'MACD_Hist_Ayer': tomar('MACD_Hist', pos_ayer),
+        'Vol_Prom_20': vol_prom_20,
+        'SMA': tomar('SMA', pos_hoy),
+        'Upper': tomar('Upper', pos_hoy),
+        'Lower': tomar('Lower', pos_hoy),
+        'MACD': tomar('MACD', pos_hoy),
+        'Signal_Line': tomar('Signal_Line', pos_hoy),
+    }, index=tickers[con_datos])
+
+
+def ultimas_velas(indicadores, symbol, n=20, validas=None):
+    """Últimas `n` barras completas de un ticker, con las columnas de las funciones `calcular_*`."""
+    if validas is None:
+        validas = mascara_barras_completas(indicadores)
+    df = indicadores.xs(symbol, axis=1, level=1)
+    return df[validas[symbol].to_numpy()].tail(n)
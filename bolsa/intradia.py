@@ -0,0 +1,227 @@
+"""Modo intradía: barras de 1 minuto en buffers circulares preasignados, remuestreadas al vuelo.
+
+Cada ticker mantiene una serie por intervalo (1m, 5m, 15m, 60m). Una barra de 1 minuto
+actualiza todas sus series en tiempo constante: agrega la vela al tramo del intervalo
+correspondiente y avanza las calculadoras incrementales de BB, RSI y MACD. La memoria
+queda fija por la capacidad de los buffers, sin importar cuánto dure la sesión.
+"""
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from bolsa.almacen import a_formato_largo
+from bolsa.descarga import descargar_por_bloques
+from bolsa.incremental import CalculadoraIndicadores
+from bolsa.metricas import METRICAS
+from bolsa.snapshot import SnapshotMercado, VelasTicker, tabla_metricas
+from bolsa.sparkline import puntos_sparkline
+
+# Intervalo base que se descarga de Yahoo y los intervalos derivados (en segundos)
+INTERVALO_BASE = "1m"
+INTERVALOS_INTRADIA = {"1m": 60, "5m": 300, "15m": 900, "60m": 3600}
+
+# Los tickers conocidos se piden agrupados por el tramo de su última barra: a lo más unos
+# 30 grupos por rueda aunque los activos poco líquidos tengan cada uno su propio minuto
+TRAMO_INICIO_SEGUNDOS = 900
+
+CAMPOS_OHLCV = ['open', 'high', 'low', 'close', 'volume']
+CAMPOS_INDICADORES = ['SMA', 'STD', 'Upper', 'Lower', 'RSI',
+                      'EMA_Fast', 'EMA_Slow', 'MACD', 'Signal_Line', 'MACD_Hist']
+
+ZONA_HORARIA = "America/Santiago"
+
+
+class BufferCircular:
+    """Últimas `capacidad` filas (ts, columnas) en arreglos NumPy de tamaño fijo."""
+
+    def __init__(self, capacidad, columnas):
+        self.capacidad = capacidad
+        self.columnas = list(columnas)
+        self.ts = np.zeros(capacidad, dtype=np.int64)
+        self.datos = np.full((capacidad, len(self.columnas)), np.nan)
+        self.n = 0
+        self._siguiente = 0
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def ultimo_ts(self):
+        return int(self.ts[(self._siguiente - 1) % self.capacidad]) if self.n else None
+
+    def ultima(self):
+        """Vista de la última fila escrita."""
+        return self.datos[(self._siguiente - 1) % self.capacidad]
+
+    def agregar(self, ts, fila):
+        """Escribe una fila nueva; si el buffer está lleno, pisa la más antigua."""
+        pos = self._siguiente
+        self.ts[pos] = ts
+        self.datos[pos] = fila
+        self._siguiente = (pos + 1) % self.capacidad
+        self.n = min(self.n + 1, self.capacidad)
+
+    def ultimas(self, k):
+        """Copia de las últimas `k` filas en orden cronológico: (ts, datos)."""
+        k = min(k, self.n)
+        posiciones = (self._siguiente - k + np.arange(k)) % self.capacidad
+        return self.ts[posiciones], self.datos[posiciones]
+
+
+class SerieIntradia:
+    """Velas OHLCV + indicadores de un ticker en un intervalo, alimentadas con barras de 1 minuto."""
+
+    def __init__(self, segundos, capacidad):
+        self.segundos = segundos
+        self.buffer = BufferCircular(capacidad, CAMPOS_OHLCV + CAMPOS_INDICADORES)
+        self.calculadora = CalculadoraIndicadores()
+        self._fila = np.empty(len(self.buffer.columnas))
+
+    def agregar(self, ts, o, h, l, c, v, v_revisado=0.0):
+        """Incorpora una barra base. `v_revisado` es el volumen que tenía la barra si se está revisando."""
+        tramo = ts - ts % self.segundos
+        fila = self._fila
+        if self.buffer.n and tramo == self.buffer.ultimo_ts:
+            actual = self.buffer.ultima()
+            fila[:5] = (actual[0], max(actual[1], h), min(actual[2], l), c, actual[4] + v - v_revisado)
+            nueva = False
+        elif self.buffer.n and tramo < self.buffer.ultimo_ts:
+            return
+        else:
+            fila[:5] = (o, h, l, c, v)
+            nueva = True
+
+        indicadores = self.calculadora.actualizar(tramo, c)
+        fila[5:] = [indicadores[campo] for campo in CAMPOS_INDICADORES]
+        if nueva:
+            self.buffer.agregar(tramo, fila)
+        else:
+            self.buffer.ultima()[:] = fila
+
+    def velas(self, n=20):
+        """Últimas `n` velas completas (todos los indicadores calculados) como VelasTicker."""
+        ts, datos = self.buffer.ultimas(n + 1)
+        completas = ~np.isnan(datos).any(axis=1)
+        ts, datos = ts[completas][-n:], datos[completas][-n:]
+        indice = pd.to_datetime(ts, unit='s', utc=True).tz_convert(ZONA_HORARIA)
+        return VelasTicker.desde_arrays(indice, self.buffer.columnas, datos)
+
+
+class MonitorIntradia:
+    """Series intradía de todo el universo, para todos los intervalos de INTERVALOS_INTRADIA."""
+
+    def __init__(self, capacidad=2000):
+        self.capacidad = capacidad
+        self.series = {}
+
+    def _series_de(self, symbol):
+        series = self.series.get(symbol)
+        if series is None:
+            series = self.series[symbol] = {
+                intervalo: SerieIntradia(segundos, self.capacidad)
+                for intervalo, segundos in INTERVALOS_INTRADIA.items()
+            }
+        return series
+
+    def ultimo_ts(self, symbol):
+        series = self.series.get(symbol)
+        return series[INTERVALO_BASE].buffer.ultimo_ts if series else None
+
+    def agregar(self, symbol, ts, o, h, l, c, v):
+        """Agrega (o revisa) una barra de 1 minuto. Trabajo constante: una actualización por intervalo."""
+        series = self._series_de(symbol)
+        base = series[INTERVALO_BASE].buffer
+        ultimo = base.ultimo_ts
+        if ultimo is not None and ts < ultimo:
+            return
+        v_revisado = base.ultima()[4] if ts == ultimo else 0.0
+        for serie in series.values():
+            serie.agregar(ts, o, h, l, c, v, v_revisado)
+
+    def alimentar_descarga(self, df_descarga):
+        """Procesa un DataFrame de yf.download, sólo desde la última barra conocida de cada ticker."""
+        largo = a_formato_largo(df_descarga).fillna({'Volume': 0.0})
+        if largo.empty:
+            return 0
+        ultimos = largo['symbol'].map(lambda s: self.ultimo_ts(s) or -1)
+        largo = largo[largo['ts'] >= ultimos].sort_values(['symbol', 'ts'])
+        for fila in largo.itertuples(index=False):
+            self.agregar(fila.symbol, int(fila.ts), fila.Open, fila.High, fila.Low, fila.Close, fila.Volume)
+        return len(largo)
+
+    def snapshot(self, intervalo, tickers_plano, umbral_alerta, n_velas=20, con_velas=True):
+        """(metricas, velas) del intervalo, comparando la última vela con la anterior (ver `bolsa.snapshot`)."""
+        filas = {col: [] for col in (
+            'nombre', 'precio', 'var', 'alerta', 'positivo', 'volume', 'avg_volume_20', 'rsi', 'macd',
+            'signal', 'macd_hist', 'macd_hist_prev', 'sma', 'upper', 'lower', 'sparkline',
+        )}
+        simbolos, velas = [], {}
+        for nombre, symbol in tickers_plano.items():
+            series = self.series.get(symbol)
+            if not series:
+                continue
+            data_velas = series[intervalo].velas(n_velas)
+            if len(data_velas) < 2:
+                continue
+
+            hoy, ayer = dict(zip(data_velas.columnas, data_velas.valores[-1])), data_velas.valores[-2]
+            close_ayer = ayer[data_velas.columnas.index('close')]
+            var_pct = ((hoy['close'] - close_ayer) / close_ayer) * 100 if close_ayer != 0 else 0
+            simbolos.append(symbol)
+            for col, valor in (
+                ('nombre', nombre), ('precio', hoy['close']), ('var', var_pct),
+                ('alerta', abs(var_pct) >= umbral_alerta), ('positivo', var_pct > 0), ('volume', hoy['volume']),
+                ('avg_volume_20', data_velas.columna('volume').mean()), ('rsi', hoy['RSI']),
+                ('macd', hoy['MACD']), ('signal', hoy['Signal_Line']), ('macd_hist', hoy['MACD_Hist']),
+                ('macd_hist_prev', ayer[data_velas.columnas.index('MACD_Hist')]),
+                ('sma', hoy['SMA']), ('upper', hoy['Upper']), ('lower', hoy['Lower']),
+                ('sparkline', puntos_sparkline(data_velas.columna('close')) if con_velas else ""),
+            ):
+                filas[col].append(valor)
+            if con_velas:
+                velas[symbol] = data_velas
+        return tabla_metricas(filas, simbolos), velas
+
+
+def actualizar_intradia(monitor, codigos, descargador=None):
+    """Descarga barras de 1 minuto: el día completo para tickers nuevos, el resto desde su última barra.
+
+    Devuelve los estados por ticker de `descargar_por_bloques`.
+    """
+    if descargador is None:
+        descargador = descargar_por_bloques
+
+    estados = {}
+    nuevos = [c for c in codigos if monitor.ultimo_ts(c) is None]
+    conocidos = [c for c in codigos if c not in nuevos]
+    if nuevos:
+        resultado = descargador(nuevos, period="1d", interval=INTERVALO_BASE)
+        monitor.alimentar_descarga(resultado.datos)
+        estados.update(resultado.estados)
+    # Como en `almacen.actualizar_historial`: una llamada por grupo de tickers con la misma
+    # última barra (por tramo), para que uno atrasado no haga redescargar a todo el universo
+    grupos = {}
+    for symbol in conocidos:
+        ultimo = monitor.ultimo_ts(symbol)
+        grupos.setdefault(ultimo - ultimo % TRAMO_INICIO_SEGUNDOS, []).append(symbol)
+    for inicio, symbols in grupos.items():
+        resultado = descargador(symbols, start=datetime.fromtimestamp(inicio, tz=timezone.utc), interval=INTERVALO_BASE)
+        monitor.alimentar_descarga(resultado.datos)
+        estados.update(resultado.estados)
+    return estados
+
+
+def construir_snapshot_intradia(monitor, codigos, tickers_plano, umbral_alerta, descargador=None,
+                                intervalos=INTERVALOS_INTRADIA, con_velas=True):
+    """Actualiza el monitor y devuelve un SnapshotMercado con {intervalo: metricas} y {intervalo: velas}."""
+    with METRICAS.medir("intradia_actualizacion"):
+        estados = actualizar_intradia(monitor, codigos, descargador=descargador)
+    with METRICAS.medir("intradia_tarjetas"):
+        por_intervalo = {
+            intervalo: monitor.snapshot(intervalo, tickers_plano, umbral_alerta, con_velas=con_velas)
+            for intervalo in intervalos
+        }
+    metricas = {intervalo: m for intervalo, (m, _) in por_intervalo.items()}
+    velas = {intervalo: v for intervalo, (_, v) in por_intervalo.items()}
+    return SnapshotMercado(metricas, velas, estados)
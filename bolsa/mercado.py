@@ -0,0 +1,82 @@
+"""Armado del snapshot de mercado: descarga incremental + indicadores + métricas por ticker."""
+from bolsa.almacen import actualizar_historial
+from bolsa.descarga import ESTADO_ERROR, ESTADO_OK, EstadoTicker
+from bolsa.indicadores import (
+    calcular_indicadores_universo, mascara_barras_completas, resumen_ultimas_barras, ultimas_velas,
+)
+from bolsa.metricas import METRICAS
+from bolsa.snapshot import RENOMBRE_RESUMEN, SnapshotMercado, VelasTicker, tabla_metricas, tabla_vacia
+from bolsa.sparkline import puntos_sparkline
+
+ESTADO_HISTORIA_INSUFICIENTE = "historia_insuficiente"
+
+# Días corridos de historia que se leen del almacén para los indicadores
+DIAS_VENTANA = 60
+
+
+def construir_snapshot(almacen, tickers_plano, umbral_alerta, descargador=None, con_velas=True, analitica=None):
+    """Descarga datos de mercado y aplica análisis técnico usando YFinance.
+
+    Devuelve un SnapshotMercado (ver `bolsa.snapshot`): `metricas` tiene una fila por
+    ticker con las métricas de la última barra, `velas` las últimas 20 velas de cada uno y
+    `estados` indica por ticker si hubo problemas, para que un símbolo fallido no se
+    pierda en silencio. Con `con_velas=False` (demonio de alertas) no se guardan velas.
+    Con `analitica` (un `AnaliticaIncremental`) se le pasan las barras de la ventana y el
+    snapshot incluye los índices sectoriales y correlaciones actualizados.
+    """
+    codigos = list(dict.fromkeys(tickers_plano.values()))
+
+    # Descarga incremental: sólo barras posteriores a la última guardada.
+    # Leemos una ventana de 60 días para dar margen de días no hábiles.
+    with METRICAS.medir("descarga"):
+        df_hist, estados = actualizar_historial(
+            almacen, codigos, periodo_inicial=f"{DIAS_VENTANA}d", dias_ventana=DIAS_VENTANA, descargador=descargador
+        )
+
+    # Necesitamos historia suficiente para que los indicadores se estabilicen
+    if len(df_hist) < 30:
+        return SnapshotMercado(tabla_vacia(), {}, estados)
+
+    # 1. INDICADORES PARA TODO EL UNIVERSO EN UNA SOLA PASADA
+    with METRICAS.medir("indicadores"):
+        indicadores = calcular_indicadores_universo(df_hist)
+        barras_completas = mascara_barras_completas(indicadores)
+
+    # 2. MÉTRICAS DE HOY/AYER (precio, variación, alerta, RSI, MACD) DE TODOS LOS TICKERS
+    with METRICAS.medir("resumen"):
+        resumen = resumen_ultimas_barras(indicadores, umbral_alerta)
+
+    # 3. TABLA DE MÉTRICAS (EN EL ORDEN DEL UNIVERSO) + ÚLTIMAS 20 VELAS POR TICKER
+    with METRICAS.medir("armado_tarjetas"):
+        presentes = [(nombre, symbol) for nombre, symbol in tickers_plano.items() if symbol in resumen.index]
+        for symbol in codigos:
+            if symbol not in resumen.index and estados.get(symbol, EstadoTicker(ESTADO_OK, "", 0)).estado == ESTADO_OK:
+                estados[symbol] = EstadoTicker(ESTADO_HISTORIA_INSUFICIENTE, "menos de 2 barras con indicadores", 0)
+
+        velas = {}
+        if con_velas:
+            for _, symbol in presentes:
+                try:
+                    # Nos aseguramos de tener 20 días para el gráfico
+                    velas[symbol] = VelasTicker.desde_dataframe(
+                        ultimas_velas(indicadores, symbol, n=20, validas=barras_completas)
+                    )
+                except Exception as e:
+                    estados[symbol] = EstadoTicker(ESTADO_ERROR, f"procesando indicadores: {e}", 0)
+
+        simbolos = [symbol for _, symbol in presentes if not con_velas or symbol in velas]
+        fuente = resumen.loc[simbolos].rename(columns=RENOMBRE_RESUMEN)
+        columnas = {col: fuente[col].to_numpy() for col in RENOMBRE_RESUMEN.values()}
+        validos = set(simbolos)
+        columnas['nombre'] = [nombre for nombre, symbol in presentes if symbol in validos]
+        if con_velas:
+            columnas['sparkline'] = [puntos_sparkline(velas[symbol].columna('close')) for symbol in simbolos]
+        metricas = tabla_metricas(columnas, simbolos)
+
+    # 4. ÍNDICES SECTORIALES Y CORRELACIONES (SÓLO LAS BARRAS NUEVAS)
+    resultado_analitica = None
+    if analitica is not None:
+        with METRICAS.medir("analitica"):
+            resultado_analitica = analitica.actualizar(indicadores['close'], indicadores['volume'])
+
+    return SnapshotMercado(metricas, velas, estados, analitica=resultado_analitica)
@@ -0,0 +1,131 @@
+"""Instrumentación liviana del camino crítico: tiempos por etapa, contadores y exportación Prometheus.
+
+Hay un único registro por proceso (`METRICAS`), al estilo de `logging`. Con la
+medición deshabilitada, `medir` devuelve un contexto nulo compartido y `contar`
+retorna de inmediato, así que dejar la instrumentación en el código no cuesta nada.
+"""
+import contextlib
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+PREFIJO_PROMETHEUS = "monitor_bolsa"
+CUANTILES = (0.5, 0.9, 0.99)
+
+_NULO = contextlib.nullcontext()
+
+
+class _Medicion:
+    __slots__ = ("metricas", "etapa", "inicio")
+
+    def __init__(self, metricas, etapa):
+        self.metricas = metricas
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metricas.observar(self.etapa, time.perf_counter() - self.inicio)
+        return False
+
+
+class Metricas:
+    """Duraciones por etapa (ventana móvil para percentiles) y contadores acumulados."""
+
+    def __init__(self, habilitado=False, ventana=500):
+        self.habilitado = habilitado
+        self.ventana = ventana
+        self._lock = threading.Lock()
+        self._duraciones = {}
+        self._totales = {}
+        self._contadores = {}
+
+    def medir(self, etapa):
+        """Context manager que registra cuánto tarda el bloque en la etapa `etapa`."""
+        if not self.habilitado:
+            return _NULO
+        return _Medicion(self, etapa)
+
+    def observar(self, etapa, segundos):
+        with self._lock:
+            muestras = self._duraciones.get(etapa)
+            if muestras is None:
+                muestras = self._duraciones[etapa] = deque(maxlen=self.ventana)
+            muestras.append(segundos)
+            cantidad, suma = self._totales.get(etapa, (0, 0.0))
+            self._totales[etapa] = (cantidad + 1, suma + segundos)
+
+    def contar(self, nombre, n=1):
+        if not self.habilitado:
+            return
+        with self._lock:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + n
+
+    def reiniciar(self):
+        with self._lock:
+            self._duraciones.clear()
+            self._totales.clear()
+            self._contadores.clear()
+
+    def percentiles(self):
+        """{etapa: {"n", "ultimo_ms", "p50_ms", "p90_ms", "p99_ms"}} sobre la ventana móvil."""
+        with self._lock:
+            copias = {etapa: np.fromiter(muestras, dtype=float) for etapa, muestras in self._duraciones.items()}
+        resultado = {}
+        for etapa, valores in sorted(copias.items()):
+            if not len(valores):
+                continue
+            p = np.quantile(valores, CUANTILES) * 1000
+            resultado[etapa] = {
+                "n": len(valores), "ultimo_ms": valores[-1] * 1000,
+                "p50_ms": p[0], "p90_ms": p[1], "p99_ms": p[2],
+            }
+        return resultado
+
+    def contadores(self):
+        with self._lock:
+            return dict(sorted(self._contadores.items()))
+
+    def exportar_prometheus(self):
+        """Texto en formato de exposición de Prometheus (summary por etapa + counters)."""
+        with self._lock:
+            copias = {etapa: np.fromiter(muestras, dtype=float) for etapa, muestras in self._duraciones.items()}
+            totales = dict(self._totales)
+            contadores = dict(self._contadores)
+
+        lineas = []
+        nombre = f"{PREFIJO_PROMETHEUS}_etapa_segundos"
+        if copias:
+            lineas += [f"# HELP {nombre} Duración de cada etapa del refresco y del dibujo.",
+                       f"# TYPE {nombre} summary"]
+            for etapa, valores in sorted(copias.items()):
+                if len(valores):
+                    for q, v in zip(CUANTILES, np.quantile(valores, CUANTILES)):
+                        lineas.append(f'{nombre}{{etapa="{etapa}",quantile="{q}"}} {v:.6f}')
+                cantidad, suma = totales.get(etapa, (0, 0.0))
+                lineas.append(f'{nombre}_sum{{etapa="{etapa}"}} {suma:.6f}')
+                lineas.append(f'{nombre}_count{{etapa="{etapa}"}} {cantidad}')
+        for contador, valor in sorted(contadores.items()):
+            metrica = f"{PREFIJO_PROMETHEUS}_{contador}_total"
+            lineas += [f"# TYPE {metrica} counter", f"{metrica} {valor}"]
+        return "\n".join(lineas) + "\n"
+
+    def escribir_prometheus(self, ruta):
+        """Escribe el archivo de forma atómica (apto para el textfile collector de node_exporter)."""
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        # Temporal propio de cada proceso e hilo: la UI, el demonio y los sondeos diario e
+        # intradía pueden escribir el mismo archivo a la vez
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(self.exportar_prometheus())
+        os.replace(temporal, ruta)
+
+
+METRICAS = Metricas(habilitado=os.environ.get("MONITOR_BOLSA_METRICAS", "0") == "1")
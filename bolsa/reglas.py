@@ -0,0 +1,279 @@
+"""Motor de reglas de screener/alertas: expresiones compiladas una vez y evaluadas como máscaras NumPy.
+
+Una regla es una expresión como `RSI < 30 and macd_cross == 'up' and volume > 2*avg_volume_20`.
+Se analiza con `ast` (sólo se aceptan comparaciones, aritmética, and/or/not, abs/min/max y
+nombres de columnas), se traduce a una función que opera sobre columnas completas y se
+evalúa de una vez para todo el universo: no hay bucle de Python por ticker ni por tarjeta.
+"""
+import ast
+import csv
+import logging
+import operator
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from bolsa.snapshot import COLUMNAS_METRICAS, tabla_metricas, una_fila_por_symbol
+
+log = logging.getLogger(__name__)
+
+# Nombres que pueden usar las reglas: columnas de `metricas` más estos alias
+ALIAS_COLUMNAS = {'close': 'precio'}
+
+ACCIONES = ("insignia", "alerta", "ambas")
+
+Regla = namedtuple("Regla", ["nombre", "expresion", "accion", "etiqueta", "estilo", "mensaje"])
+
+
+class ReglaInvalida(ValueError):
+    """La expresión usa sintaxis, nombres o funciones que el motor no admite."""
+
+
+# --- COMPILACIÓN DE EXPRESIONES ---
+_COMPARADORES = {
+    ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+    ast.Eq: operator.eq, ast.NotEq: operator.ne,
+}
+_ARITMETICOS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+}
+_FUNCIONES = {'abs': np.abs, 'min': np.minimum, 'max': np.maximum}
+
+
+def compilar(expresion, nombres_validos=None):
+    """Traduce la expresión a una función `f(columnas, variables) -> array` (se hace una sola vez)."""
+    try:
+        arbol = ast.parse(expresion.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ReglaInvalida(f"Sintaxis inválida en {expresion!r}: {e.msg}") from e
+    return _compilar_nodo(arbol.body, expresion, nombres_validos)
+
+
+def _compilar_nodo(nodo, expresion, nombres_validos):
+    def sub(n):
+        return _compilar_nodo(n, expresion, nombres_validos)
+
+    if isinstance(nodo, ast.BoolOp):
+        partes = [sub(v) for v in nodo.values]
+        combinar = np.logical_and if isinstance(nodo.op, ast.And) else np.logical_or
+
+        def f(cols, vars_):
+            resultado = _como_bool(partes[0](cols, vars_))
+            for parte in partes[1:]:
+                resultado = combinar(resultado, _como_bool(parte(cols, vars_)))
+            return resultado
+        return f
+
+    if isinstance(nodo, ast.UnaryOp):
+        operando = sub(nodo.operand)
+        if isinstance(nodo.op, ast.Not):
+            return lambda cols, vars_: np.logical_not(_como_bool(operando(cols, vars_)))
+        if isinstance(nodo.op, ast.USub):
+            return lambda cols, vars_: -operando(cols, vars_)
+        if isinstance(nodo.op, ast.UAdd):
+            return operando
+
+    if isinstance(nodo, ast.Compare):
+        terminos = [sub(nodo.left)] + [sub(c) for c in nodo.comparators]
+        operadores = []
+        for op in nodo.ops:
+            if type(op) not in _COMPARADORES:
+                raise ReglaInvalida(f"Comparador no soportado en {expresion!r}")
+            operadores.append(_COMPARADORES[type(op)])
+
+        def f(cols, vars_):
+            valores = [t(cols, vars_) for t in terminos]
+            resultado = None
+            # Comparaciones encadenadas (a < b < c) = (a < b) and (b < c)
+            for op, izq, der in zip(operadores, valores, valores[1:]):
+                parcial = _como_bool(op(izq, der))
+                resultado = parcial if resultado is None else np.logical_and(resultado, parcial)
+            return resultado
+        return f
+
+    if isinstance(nodo, ast.BinOp):
+        if type(nodo.op) not in _ARITMETICOS:
+            raise ReglaInvalida(f"Operador no soportado en {expresion!r}")
+        op = _ARITMETICOS[type(nodo.op)]
+        izq, der = sub(nodo.left), sub(nodo.right)
+
+        def f(cols, vars_):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return op(izq(cols, vars_), der(cols, vars_))
+        return f
+
+    if isinstance(nodo, ast.Call):
+        if not isinstance(nodo.func, ast.Name) or nodo.func.id not in _FUNCIONES or nodo.keywords:
+            raise ReglaInvalida(f"Sólo se permiten las funciones {sorted(_FUNCIONES)} en {expresion!r}")
+        funcion = _FUNCIONES[nodo.func.id]
+        argumentos = [sub(a) for a in nodo.args]
+        if nodo.func.id == 'abs' and len(argumentos) != 1:
+            raise ReglaInvalida(f"abs() recibe un argumento en {expresion!r}")
+        if nodo.func.id != 'abs' and len(argumentos) != 2:
+            raise ReglaInvalida(f"{nodo.func.id}() recibe dos argumentos en {expresion!r}")
+        return lambda cols, vars_: funcion(*(a(cols, vars_) for a in argumentos))
+
+    if isinstance(nodo, ast.Name):
+        nombre = nodo.id.lower()
+        nombre = ALIAS_COLUMNAS.get(nombre, nombre)
+        if nombres_validos is not None and nombre not in nombres_validos:
+            raise ReglaInvalida(f"Columna o variable desconocida {nodo.id!r} en {expresion!r}")
+
+        def f(cols, vars_):
+            if nombre in vars_:
+                return vars_[nombre]
+            return cols[nombre]
+        return f
+
+    if isinstance(nodo, ast.Constant) and isinstance(nodo.value, (int, float, str, bool)):
+        valor = nodo.value
+        return lambda cols, vars_: valor
+
+    raise ReglaInvalida(f"Construcción no soportada ({type(nodo).__name__}) en {expresion!r}")
+
+
+def _como_bool(valor):
+    """Máscara booleana del resultado; un NaN (dato faltante) nunca cumple la condición."""
+    arr = np.asarray(valor)
+    if arr.dtype == bool:
+        return arr
+    if arr.dtype.kind == 'f':
+        return (arr != 0) & ~np.isnan(arr)
+    if arr.dtype == object:
+        return arr.astype(bool) & pd.notna(arr)
+    return arr.astype(bool)
+
+
+class _Columnas(dict):
+    """Extrae cada columna de la tabla como array NumPy la primera vez que una regla la usa."""
+
+    def __init__(self, tabla):
+        super().__init__()
+        self.tabla = tabla
+
+    def __missing__(self, nombre):
+        valor = self[nombre] = self.tabla[nombre].to_numpy()
+        return valor
+
+
+# --- MOTOR ---
+class MotorReglas:
+    """Conjunto de reglas compiladas, evaluadas juntas sobre las métricas de todo el universo."""
+
+    def __init__(self, reglas, variables=None):
+        self.variables = {k.lower(): v for k, v in (variables or {}).items()}
+        validos = set(COLUMNAS_METRICAS) | set(self.variables)
+        self.reglas = list(reglas)
+        nombres = [r.nombre for r in self.reglas]
+        if len(set(nombres)) != len(nombres):
+            raise ReglaInvalida("Hay reglas con el mismo nombre")
+        for regla in self.reglas:
+            if regla.accion not in ACCIONES:
+                raise ReglaInvalida(f"Acción {regla.accion!r} de la regla {regla.nombre!r} no es una de {ACCIONES}")
+        self._compiladas = [compilar(r.expresion, validos) for r in self.reglas]
+        self._probar()
+
+    def _probar(self):
+        """Evalúa cada regla sobre una fila de muestra para rechazar aquí los errores de tipos
+        (p. ej. `macd_cross > 3`), en lugar de descubrirlos en cada refresco."""
+        muestra = _Columnas(tabla_metricas({}, ["MUESTRA"]))
+        for regla, funcion in zip(self.reglas, self._compiladas):
+            try:
+                np.broadcast_to(_como_bool(funcion(muestra, self.variables)), (1,))
+            except Exception as e:
+                raise ReglaInvalida(f"La regla {regla.nombre!r} no se puede evaluar: {e}") from e
+
+    def evaluar(self, tabla):
+        """DataFrame booleano (symbol x regla): True donde el ticker cumple la regla.
+
+        Una regla que falla se registra en el log y queda sin coincidencias: no bloquea al resto.
+        """
+        columnas = _Columnas(tabla)
+        n = len(tabla)
+        resultado = {}
+        for regla, funcion in zip(self.reglas, self._compiladas):
+            try:
+                mascara = np.broadcast_to(_como_bool(funcion(columnas, self.variables)), (n,))
+            except Exception:
+                log.exception("La regla %r falló al evaluarse; se toma como no cumplida", regla.nombre)
+                mascara = np.zeros(n, dtype=bool)
+            resultado[regla.nombre] = mascara
+        return pd.DataFrame(resultado, index=tabla.index, columns=[r.nombre for r in self.reglas])
+
+    def insignias(self):
+        return [r for r in self.reglas if r.accion in ("insignia", "ambas")]
+
+    def alertas(self):
+        return [r for r in self.reglas if r.accion in ("alerta", "ambas")]
+
+
+def cargar_reglas(ruta):
+    """Lee reglas desde un CSV con columnas `nombre,expresion,accion,etiqueta,estilo,mensaje`.
+
+    `accion`: "insignia" (etiqueta en la tarjeta), "alerta" (aviso en la tarjeta + Telegram)
+    o "ambas". `estilo` (positivo/negativo/neutro) define el color de la insignia y
+    `mensaje` es la plantilla de Telegram, con las columnas de las métricas del snapshot.
+    """
+    with open(ruta, newline="", encoding="utf-8-sig") as f:
+        lector = csv.DictReader(f)
+        faltantes = {"nombre", "expresion", "accion"} - set(lector.fieldnames or [])
+        if faltantes:
+            raise ValueError(f"{ruta}: faltan las columnas {sorted(faltantes)}")
+        reglas = []
+        for fila in lector:
+            if not (fila.get("nombre") or "").strip():
+                continue
+            reglas.append(Regla(
+                nombre=fila["nombre"].strip(),
+                expresion=fila["expresion"].strip(),
+                accion=(fila.get("accion") or "insignia").strip(),
+                etiqueta=(fila.get("etiqueta") or fila["nombre"]).strip(),
+                estilo=(fila.get("estilo") or "neutro").strip(),
+                mensaje=(fila.get("mensaje") or "").strip(),
+            ))
+    return reglas
+
+
+def mensaje_alerta(regla, fila):
+    """Texto de la alerta: la plantilla `mensaje` de la regla formateada con la fila de las métricas."""
+    valores = {k: v for k, v in fila.items()}
+    if regla.mensaje:
+        try:
+            return regla.mensaje.format(**valores)
+        except (KeyError, ValueError, IndexError):
+            pass
+    return f"⚠️ *{regla.etiqueta}*: {valores.get('nombre', '')}"
+
+
+def evaluar_snapshot(snapshot, motor):
+    """Agrega al snapshot las coincidencias de las reglas sobre sus métricas (una vez por refresco)."""
+    if isinstance(snapshot.metricas, dict):
+        senales = {clave: motor.evaluar(una_fila_por_symbol(m)) for clave, m in snapshot.metricas.items()}
+    else:
+        senales = motor.evaluar(una_fila_por_symbol(snapshot.metricas))
+    return snapshot._replace(senales=senales)
+
+
+def coincidencias_por_symbol(senales, reglas):
+    """{symbol: [reglas que cumple]} restringido a `reglas` (p. ej. las insignias), para el dibujo."""
+    nombres = [r.nombre for r in reglas]
+    if senales is None or senales.empty or not nombres:
+        return {}
+    mascaras = senales[nombres].to_numpy()
+    filas, columnas = np.nonzero(mascaras)
+    resultado = {}
+    for fila, columna in zip(filas, columnas):
+        resultado.setdefault(senales.index[fila], []).append(reglas[columna])
+    return resultado
+
+
+def coincidencias_por_regla(senales, reglas):
+    """Pares (regla, symbols que la cumplen) para las reglas con al menos una coincidencia."""
+    if senales is None or senales.empty:
+        return
+    for regla in reglas:
+        mascara = senales[regla.nombre].to_numpy()
+        if mascara.any():
+            yield regla, senales.index[mascara]
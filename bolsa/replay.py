@@ -0,0 +1,256 @@
+"""Fuente de barras simulada para pruebas de carga sin red: reemplaza a yf.download.
+
+Reproduce barras de 1 minuto (grabadas en un CSV o generadas) sobre un reloj acelerado:
+con `velocidad=390` cada minuto real avanza una rueda completa de 390 minutos. Responde
+a las mismas llamadas que hace el tablero (`interval="1d"` con `period`/`start` para el
+almacén diario, `interval="1m"` para el intradía) con el mismo DataFrame ancho
+(campo, ticker) que yf.download, por lo que se enchufa en `descargar_por_bloques`.
+
+Antes de la primera rueda simulada hay `dias_historia` barras diarias generadas, para
+que los indicadores arranquen estabilizados. Las barras sintéticas siguen un factor de
+mercado común más un componente propio por ticker, con días de volatilidad alta al azar
+(ráfagas de alertas). Todo es determinista dada la `semilla`: dos bloques que piden el
+mismo ticker reciben las mismas barras.
+"""
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from bolsa.intradia import ZONA_HORARIA
+
+CAMPOS_YAHOO = ["Open", "High", "Low", "Close", "Volume"]
+MINUTOS_RUEDA = 390
+APERTURA = pd.Timedelta(hours=9, minutes=30)
+
+# Barras de 1 minuto de una rueda: desfase de cada minuto desde la medianoche y
+# {symbol: matriz (minutos x OHLCV)}
+RuedaGrabada = namedtuple("RuedaGrabada", ["desfases", "barras"])
+
+
+class FuenteReplay:
+    """Reemplazo de yf.download que reproduce ruedas de 1 minuto a velocidad acelerada.
+
+    `ruedas` es una lista de RuedaGrabada (ver `desde_csv`); sin ella las barras se
+    generan. Las ruedas grabadas se repiten en ciclo, encadenando precios para que no
+    haya saltos al volver a la primera. `reloj` permite manejar el tiempo en pruebas.
+    """
+
+    def __init__(self, velocidad=MINUTOS_RUEDA, ruedas=None, dias_historia=80, minuto_inicial=60,
+                 semilla=0, volatilidad=0.015, prob_dia_volatil=0.2, fecha_inicio=None, reloj=time.monotonic):
+        self.velocidad = velocidad
+        self.ruedas = ruedas
+        self.dias_historia = dias_historia
+        self.minuto_inicial = minuto_inicial
+        self.semilla = semilla
+        self.volatilidad = volatilidad
+        self.prob_dia_volatil = prob_dia_volatil
+        self.reloj = reloj
+        self._inicio = reloj()
+
+        inicio = pd.Timestamp(fecha_inicio) if fecha_inicio is not None else pd.Timestamp.now(ZONA_HORARIA)
+        if inicio.tzinfo is not None:
+            inicio = inicio.tz_convert(ZONA_HORARIA).tz_localize(None)
+        inicio = inicio.normalize()
+        self.fechas_historia = pd.bdate_range(end=inicio, periods=dias_historia + 1)[:-1]
+        self.fecha_inicio = self.fechas_historia[-1] + pd.offsets.BDay() if dias_historia else inicio
+
+        self._lock = threading.Lock()
+        self._minutos = {}    # symbol -> {rueda: matriz (minutos x OHLCV)}
+        self._diarias = {}    # symbol -> [fila OHLCV de cada rueda completa, en orden]
+        self._historia = {}   # symbol -> matriz (dias_historia x OHLCV)
+
+    @classmethod
+    def desde_csv(cls, ruta, **opciones):
+        """Fuente que reproduce las barras de 1 minuto de un CSV (Datetime, symbol, Open, High, Low, Close, Volume)."""
+        largo = pd.read_csv(ruta)
+        fechas = pd.to_datetime(largo['Datetime'], utc=True).dt.tz_convert(ZONA_HORARIA)
+        largo = largo.assign(Datetime=fechas, dia=fechas.dt.normalize())
+        ruedas = []
+        for dia, barras_dia in largo.groupby('dia', sort=True):
+            minutos = pd.DatetimeIndex(sorted(barras_dia['Datetime'].unique()))
+            barras = {
+                symbol: barras.set_index('Datetime')[CAMPOS_YAHOO].reindex(minutos).to_numpy(dtype=float)
+                for symbol, barras in barras_dia.groupby('symbol')
+            }
+            ruedas.append(RuedaGrabada((minutos - dia).to_numpy(), barras))
+        if not ruedas:
+            raise ValueError(f"{ruta} no tiene barras")
+        return cls(ruedas=ruedas, **opciones)
+
+    # --- RELOJ SIMULADO ---
+    def posicion(self):
+        """(rueda en curso, minutos transcurridos de esa rueda) según el reloj acelerado."""
+        transcurridos = self.minuto_inicial + (self.reloj() - self._inicio) * self.velocidad / 60
+        rueda, minuto = divmod(transcurridos, MINUTOS_RUEDA)
+        return int(rueda), int(minuto) + 1
+
+    def fecha_rueda(self, rueda):
+        return self.fecha_inicio + rueda * pd.offsets.BDay()
+
+    def _desfases(self, rueda):
+        if self.ruedas is None:
+            return (APERTURA + pd.to_timedelta(np.arange(MINUTOS_RUEDA), unit='min')).to_numpy()
+        return self.ruedas[rueda % len(self.ruedas)].desfases
+
+    def _visibles(self, rueda, minuto):
+        """Cantidad de barras de 1 minuto de la rueda ya publicadas a los `minuto` minutos."""
+        total = len(self._desfases(rueda))
+        return min(total, int(np.ceil(minuto * total / MINUTOS_RUEDA)))
+
+    # --- BARRAS POR TICKER ---
+    def _rng(self, *claves):
+        return np.random.default_rng([self.semilla, *claves])
+
+    def _semilla_symbol(self, symbol):
+        return zlib.crc32(symbol.encode())
+
+    def _barras_rueda(self, symbol, rueda):
+        """Matriz (minutos x OHLCV) de la rueda, encadenada con el cierre de la anterior."""
+        ruedas = self._minutos.setdefault(symbol, {})
+        if rueda not in ruedas:
+            apertura = self._cierre(symbol, rueda - 1)
+            if self.ruedas is None:
+                ruedas[rueda] = self._rueda_sintetica(symbol, rueda, apertura)
+            else:
+                ruedas[rueda] = self._rueda_grabada(symbol, rueda, apertura)
+            # Sólo se necesitan en memoria la rueda en curso y la anterior
+            for vieja in [r for r in ruedas if r < rueda - 1]:
+                del ruedas[vieja]
+        return ruedas[rueda]
+
+    def _cierre(self, symbol, rueda):
+        if rueda < 0:
+            return self._barras_historia(symbol)[-1, 3]
+        return self._diaria(symbol, rueda)[3]
+
+    def _diaria(self, symbol, rueda):
+        diarias = self._diarias.setdefault(symbol, [])
+        # Las ruedas se encadenan: hay que generar las anteriores en orden
+        while len(diarias) <= rueda:
+            diarias.append(_agregar_diaria(self._barras_rueda(symbol, len(diarias))))
+        return diarias[rueda]
+
+    def _rueda_sintetica(self, symbol, rueda, apertura):
+        volatil = self._rng(rueda).random() < self.prob_dia_volatil
+        sigma = self.volatilidad * (3 if volatil else 1) / np.sqrt(MINUTOS_RUEDA)
+        beta = 0.5 + self._rng(self._semilla_symbol(symbol)).random()
+        mercado = self._rng(rueda).normal(0, sigma, MINUTOS_RUEDA)
+        propio = self._rng(self._semilla_symbol(symbol), rueda)
+        retornos = beta * mercado + propio.normal(0, sigma, MINUTOS_RUEDA)
+        cierres = apertura * np.exp(np.cumsum(retornos))
+        aperturas = np.concatenate([[apertura], cierres[:-1]])
+        rango = np.abs(propio.normal(0, sigma / 2, (2, MINUTOS_RUEDA)))
+        altos = np.maximum(aperturas, cierres) * np.exp(rango[0])
+        bajos = np.minimum(aperturas, cierres) * np.exp(-rango[1])
+        volumen = self._volumen(symbol, propio, MINUTOS_RUEDA) * (2 if volatil else 1)
+        return np.column_stack([aperturas, altos, bajos, cierres, volumen])
+
+    def _rueda_grabada(self, symbol, rueda, apertura):
+        grabada = self.ruedas[rueda % len(self.ruedas)]
+        barras = grabada.barras.get(symbol)
+        if barras is None:
+            return np.full((len(grabada.desfases), len(CAMPOS_YAHOO)), np.nan)
+        barras = barras.copy()
+        primera = barras[~np.isnan(barras[:, 0]), 0]
+        if rueda >= len(self.ruedas) and len(primera):
+            # Al repetir el ciclo se escala la rueda para que abra donde cerró la anterior
+            barras[:, :4] *= apertura / primera[0]
+        return barras
+
+    def _barras_historia(self, symbol):
+        if symbol not in self._historia:
+            n = self.dias_historia
+            rng = self._rng(self._semilla_symbol(symbol), 2**32 - 1)
+            nivel = np.exp(rng.uniform(np.log(5), np.log(5000)))
+            cierres = nivel * np.exp(np.cumsum(rng.normal(0, self.volatilidad, n)))
+            if self.ruedas is not None:
+                # La historia termina donde abre la primera rueda grabada
+                barras = self.ruedas[0].barras.get(symbol)
+                abiertas = barras[~np.isnan(barras[:, 0]), 0] if barras is not None else []
+                if len(abiertas) and n:
+                    cierres *= abiertas[0] / cierres[-1]
+            aperturas = np.concatenate([cierres[:1], cierres[:-1]])
+            rango = np.abs(rng.normal(0, self.volatilidad / 2, (2, n)))
+            self._historia[symbol] = np.column_stack([
+                aperturas, np.maximum(aperturas, cierres) * np.exp(rango[0]),
+                np.minimum(aperturas, cierres) * np.exp(-rango[1]), cierres,
+                self._volumen(symbol, rng, n) * MINUTOS_RUEDA,
+            ])
+        return self._historia[symbol]
+
+    def _volumen(self, symbol, rng, n):
+        if symbol.endswith("=X"):
+            return np.zeros(n)  # Yahoo no informa volumen de monedas
+        return np.round(rng.lognormal(np.log(2000), 0.8, n))
+
+    # --- INTERFAZ DE yf.download ---
+    def __call__(self, codigos, period=None, start=None, interval="1d", **_opciones):
+        if isinstance(codigos, str):
+            codigos = codigos.split()
+        rueda, minuto = self.posicion()
+        with self._lock:
+            if interval == "1d":
+                fechas, por_symbol = self._diarias_hasta(codigos, rueda, minuto)
+            elif interval == "1m":
+                fechas, por_symbol = self._minutos_hasta(codigos, rueda, minuto)
+            else:
+                raise ValueError(f"La fuente replay no entrega barras de {interval!r}")
+
+        desde = _inicio_pedido(fechas, period, start)
+        visibles = np.asarray(fechas >= desde) if desde is not None else np.ones(len(fechas), dtype=bool)
+        datos = np.stack([por_symbol[s][visibles] for s in codigos], axis=2)  # (barras, campos, tickers)
+        columnas = pd.MultiIndex.from_product([CAMPOS_YAHOO, list(codigos)], names=["Price", "Ticker"])
+        indice = pd.DatetimeIndex(fechas[visibles], name="Date" if interval == "1d" else "Datetime")
+        return pd.DataFrame(datos.reshape(len(indice), -1), index=indice, columns=columnas)
+
+    def _diarias_hasta(self, codigos, rueda, minuto):
+        fechas = self.fechas_historia.append(pd.DatetimeIndex([self.fecha_rueda(r) for r in range(rueda + 1)]))
+        visibles = self._visibles(rueda, minuto)
+        por_symbol = {}
+        for symbol in codigos:
+            if rueda:
+                self._diaria(symbol, rueda - 1)
+            completas = self._diarias.get(symbol, [])[:rueda]
+            en_curso = _agregar_diaria(self._barras_rueda(symbol, rueda)[:visibles])
+            por_symbol[symbol] = np.vstack([self._barras_historia(symbol), *completas, en_curso])
+        return fechas, por_symbol
+
+    def _minutos_hasta(self, codigos, rueda, minuto):
+        ruedas = range(max(rueda - 1, 0), rueda + 1)
+        cortes = {r: len(self._desfases(r)) if r < rueda else self._visibles(rueda, minuto) for r in ruedas}
+        fechas = pd.DatetimeIndex(np.concatenate([
+            self.fecha_rueda(r).to_datetime64() + self._desfases(r)[:cortes[r]] for r in ruedas
+        ])).tz_localize(ZONA_HORARIA)
+        por_symbol = {
+            symbol: np.vstack([self._barras_rueda(symbol, r)[:cortes[r]] for r in ruedas]) for symbol in codigos
+        }
+        return fechas, por_symbol
+
+
+def _agregar_diaria(barras):
+    """Fila OHLCV diaria a partir de barras de 1 minuto (ignorando minutos sin dato)."""
+    validas = barras[~np.isnan(barras[:, 3])]
+    if not len(validas):
+        return np.full(len(CAMPOS_YAHOO), np.nan)
+    return np.array([
+        validas[0, 0], validas[:, 1].max(), validas[:, 2].min(), validas[-1, 3], np.nansum(validas[:, 4]),
+    ])
+
+
+def _inicio_pedido(fechas, period, start):
+    """Primera fecha pedida según `start` o `period` ("60d", "5d", ...) como en yf.download."""
+    if start is not None:
+        inicio = pd.Timestamp(start)
+    elif period and period.endswith("d"):
+        inicio = pd.Timestamp(fechas[-1]).normalize() - pd.Timedelta(days=int(period[:-1]) - 1)
+    else:
+        return None
+    if fechas.tz is not None:
+        inicio = inicio.tz_localize(fechas.tz) if inicio.tzinfo is None else inicio.tz_convert(fechas.tz)
+    elif inicio.tzinfo is not None:
+        inicio = inicio.tz_convert(ZONA_HORARIA).tz_localize(None)
+    return inicio
@@ -0,0 +1,256 @@
+"""Ensamblado del servicio de datos: configuración, sondeos diario/intradía, reglas y alertas.
+
+Es lo que comparten la interfaz de Streamlit (`monitor_bolsa.py`) y el demonio sin
+interfaz (`python -m bolsa.daemon`). No importa Streamlit ni Plotly; yfinance se importa
+recién en la primera descarga.
+"""
+import functools
+import os
+import threading
+import weakref
+from collections import namedtuple
+
+from bolsa.alertas import DespachadorTelegram, RegistroAlertas, despachar_senales
+from bolsa.analitica import AnaliticaIncremental
+from bolsa.almacen import AlmacenBarras
+from bolsa.descarga import descargar_por_bloques
+from bolsa.intradia import INTERVALOS_INTRADIA, MonitorIntradia, construir_snapshot_intradia
+from bolsa.mercado import construir_snapshot
+from bolsa.metricas import METRICAS
+from bolsa.reglas import MotorReglas, cargar_reglas, evaluar_snapshot
+from bolsa.snapshot import tabla_vacia
+from bolsa.sondeo import SondeoMercado
+from bolsa.universo import cargar_universo
+
+# --- CONFIGURACIÓN (VARIABLES DE ENTORNO) ---
+UMBRAL_ALERTA = 2.5
+
+# Fuente de barras: "yahoo" (yf.download) o "replay" (bolsa.replay: simulada, sin red y
+# con el reloj acelerado, para pruebas de carga). El replay usa su propia carpeta de datos.
+FUENTE = os.environ.get("MONITOR_BOLSA_FUENTE", "yahoo")
+REPLAY_VELOCIDAD = float(os.environ.get("MONITOR_BOLSA_REPLAY_VELOCIDAD", "390"))  # una rueda por minuto
+REPLAY_ARCHIVO = os.environ.get("MONITOR_BOLSA_REPLAY_ARCHIVO", "")  # CSV de barras de 1 minuto grabadas
+REPLAY_SEMILLA = int(os.environ.get("MONITOR_BOLSA_REPLAY_SEMILLA", "0"))
+CARPETA_DATOS = os.environ.get("MONITOR_BOLSA_DATOS", "datos_replay" if FUENTE == "replay" else "datos")
+
+# El universo (categoría, nombre, símbolo) se lee de un archivo CSV o YAML.
+RUTA_UNIVERSO = os.environ.get("MONITOR_BOLSA_UNIVERSO", "universo.csv")
+
+# Reglas de screener y alertas (expresiones evaluadas para todo el universo en cada refresco)
+RUTA_REGLAS = os.environ.get("MONITOR_BOLSA_REGLAS", "reglas.csv")
+
+# Guardamos el historial en disco y sólo pedimos a Yahoo las barras nuevas.
+RUTA_ALMACEN = os.environ.get("MONITOR_BOLSA_ALMACEN", os.path.join(CARPETA_DATOS, "barras.sqlite"))
+
+# Universos grandes se parten en bloques que se descargan en paralelo y se reintentan por separado.
+TAMANO_BLOQUE_DESCARGA = int(os.environ.get("MONITOR_BOLSA_TAMANO_BLOQUE", "50"))
+HILOS_DESCARGA = int(os.environ.get("MONITOR_BOLSA_HILOS_DESCARGA", "4"))
+
+# El registro en disco evita alertas duplicadas entre sesiones y procesos.
+RUTA_REGISTRO_ALERTAS = os.environ.get("MONITOR_BOLSA_ALERTAS", os.path.join(CARPETA_DATOS, "alertas.sqlite"))
+
+# Tras cada refresco se escribe un archivo en formato Prometheus (si la medición está activa).
+RUTA_METRICAS = os.environ.get("MONITOR_BOLSA_METRICAS_ARCHIVO", os.path.join(CARPETA_DATOS, "metricas.prom"))
+
+INTERVALO_REFRESCO = int(os.environ.get("MONITOR_BOLSA_INTERVALO", "60"))
+
+# API de Telegram (se puede apuntar a un servidor local en pruebas de carga)
+URL_TELEGRAM = os.environ.get("MONITOR_BOLSA_TELEGRAM_URL", "https://api.telegram.org")
+
+# Último snapshot bueno de cada sondeo, para servir datos al instante tras un reinicio.
+CARPETA_SNAPSHOTS = os.environ.get("MONITOR_BOLSA_SNAPSHOTS", CARPETA_DATOS)
+
+# Modo intradía: barras de 1 minuto en buffers circulares, remuestreadas a 5m/15m/60m.
+INTERVALO_REFRESCO_INTRADIA = int(os.environ.get("MONITOR_BOLSA_INTERVALO_INTRADIA", "30"))
+INTERVALO_ALERTAS_INTRADIA = os.environ.get("MONITOR_BOLSA_ALERTAS_INTRADIA", "5m")
+CAPACIDAD_INTRADIA = 2000  # ~5 sesiones de 1 minuto por ticker e intervalo
+
+
+# Lo que lee la interfaz: datos del snapshot (las mismas referencias, sin copia) +
+# antigüedad (segundos) y si está vencido
+DatosMercado = namedtuple(
+    "DatosMercado", ["metricas", "velas", "estados", "senales", "analitica", "error", "edad", "vencido"]
+)
+
+
+def credenciales_telegram():
+    """(token, chat_id) desde TELEGRAM_TOKEN y TELEGRAM_CHAT_ID; vacíos si no están definidos."""
+    return os.environ.get("TELEGRAM_TOKEN", ""), os.environ.get("TELEGRAM_CHAT_ID", "")
+
+
+def crear_descargador(fuente=FUENTE):
+    """Descargador por bloques sobre Yahoo o sobre la fuente simulada de `bolsa.replay`."""
+    if fuente == "yahoo":
+        descargar = None  # yf.download
+    elif fuente == "replay":
+        from bolsa.replay import FuenteReplay
+        opciones = dict(velocidad=REPLAY_VELOCIDAD, semilla=REPLAY_SEMILLA)
+        descargar = FuenteReplay.desde_csv(REPLAY_ARCHIVO, **opciones) if REPLAY_ARCHIVO else FuenteReplay(**opciones)
+    else:
+        raise ValueError(f"MONITOR_BOLSA_FUENTE debe ser 'yahoo' o 'replay', no {fuente!r}")
+    return functools.partial(
+        descargar_por_bloques, descargar=descargar, tamano_bloque=TAMANO_BLOQUE_DESCARGA, max_hilos=HILOS_DESCARGA
+    )
+
+
+def exportar_metricas(ruta=RUTA_METRICAS):
+    if METRICAS.habilitado:
+        METRICAS.escribir_prometheus(ruta)
+
+
+class ServicioMercado:
+    """Sondeos de mercado (uno por proceso) con reglas evaluadas y alertas despachadas al publicar.
+
+    Los sondeos se crean y arrancan recién cuando alguien los pide: el intradía no
+    consume nada mientras nadie elige un intervalo intradía. Con `con_velas=False` el
+    snapshot no guarda las últimas velas (sólo las necesita el dibujo de la interfaz).
+    Con `carpeta_snapshots`, cada sondeo guarda ahí su último snapshot bueno y lo sirve
+    al arrancar mientras revalida de fondo (stale-while-revalidate). Con `con_analitica`
+    el snapshot diario mantiene índices sectoriales y correlaciones (`bolsa.analitica`).
+    """
+
+    def __init__(self, categorias, motor_reglas, almacen, despachador, descargador=None,
+                 umbral_alerta=UMBRAL_ALERTA, intervalo=INTERVALO_REFRESCO,
+                 intervalo_intradia=INTERVALO_REFRESCO_INTRADIA,
+                 intervalo_alertas_intradia=INTERVALO_ALERTAS_INTRADIA, con_velas=True, con_analitica=True,
+                 ruta_metricas=RUTA_METRICAS, carpeta_snapshots=CARPETA_SNAPSHOTS):
+        self.categorias = categorias
+        self.tickers_plano = {nombre: symbol for cat in categorias.values() for nombre, symbol in cat.items()}
+        # Un símbolo puede aparecer con otro nombre en varias categorías; se descarga una vez
+        self.codigos = list(dict.fromkeys(self.tickers_plano.values()))
+        self.motor_reglas = motor_reglas
+        self.almacen = almacen
+        self.despachador = despachador
+        self.descargador = descargador or crear_descargador("yahoo")
+        self.umbral_alerta = umbral_alerta
+        self.intervalo = intervalo
+        self.intervalo_intradia = intervalo_intradia
+        self.intervalo_alertas_intradia = intervalo_alertas_intradia
+        self.con_velas = con_velas
+        # Estado incremental: sólo lo toca el hilo del sondeo diario
+        self.analitica = AnaliticaIncremental(categorias) if con_analitica else None
+        self.ruta_metricas = ruta_metricas
+        self.carpeta_snapshots = carpeta_snapshots
+        self._lock = threading.Lock()
+        self._diario = None
+        self._intradia = None
+
+    # --- SNAPSHOTS ---
+    def _con_reglas(self, snapshot):
+        with METRICAS.medir("reglas"):
+            return evaluar_snapshot(snapshot, self.motor_reglas)
+
+    def snapshot_diario(self):
+        return self._con_reglas(construir_snapshot(
+            self.almacen, self.tickers_plano, self.umbral_alerta,
+            descargador=self.descargador, con_velas=self.con_velas, analitica=self.analitica,
+        ))
+
+    def snapshot_intradia(self, monitor, intervalos=INTERVALOS_INTRADIA):
+        return self._con_reglas(construir_snapshot_intradia(
+            monitor, self.codigos, self.tickers_plano, self.umbral_alerta,
+            descargador=self.descargador, intervalos=intervalos, con_velas=self.con_velas,
+        ))
+
+    # --- ALERTAS ---
+    # Se despachan una vez por snapshot, no una vez por sesión abierta
+    def al_publicar_diario(self, snapshot):
+        despachar_senales(self.despachador, snapshot.metricas, snapshot.senales, self.motor_reglas)
+        exportar_metricas(self.ruta_metricas)
+
+    def al_publicar_intradia(self, snapshot):
+        intervalo = self.intervalo_alertas_intradia
+        despachar_senales(
+            self.despachador, snapshot.metricas[intervalo], snapshot.senales[intervalo],
+            self.motor_reglas, prefijo=f"{intervalo}_",
+        )
+        exportar_metricas(self.ruta_metricas)
+
+    # --- SONDEOS ---
+    def sondeo_diario(self):
+        with self._lock:
+            if self._diario is None:
+                self._diario = SondeoMercado(
+                    self.snapshot_diario, intervalo=self.intervalo, al_publicar=self.al_publicar_diario,
+                    ruta_persistencia=self._ruta_snapshot("diario"),
+                ).iniciar()
+            return self._diario
+
+    def sondeo_intradia(self, intervalos=INTERVALOS_INTRADIA):
+        with self._lock:
+            if self._intradia is None:
+                monitor = MonitorIntradia(capacidad=CAPACIDAD_INTRADIA)
+                self._intradia = SondeoMercado(
+                    lambda: self.snapshot_intradia(monitor, intervalos),
+                    intervalo=self.intervalo_intradia, al_publicar=self.al_publicar_intradia,
+                    ruta_persistencia=self._ruta_snapshot("intradia"),
+                ).iniciar()
+            return self._intradia
+
+    def _ruta_snapshot(self, nombre):
+        if not self.carpeta_snapshots:
+            return None
+        return os.path.join(self.carpeta_snapshots, f"snapshot_{nombre}.pickle")
+
+    def sondeo(self, intervalo):
+        return self.sondeo_diario() if intervalo == "1d" else self.sondeo_intradia()
+
+    def datos(self, intervalo="1d", esperar=30):
+        """DatosMercado del último snapshot del intervalo, nunca bloqueado por un refresco en curso.
+
+        Sólo si no hay ningún snapshot (ni en memoria ni en disco) espera el primero hasta
+        `esperar` segundos. Las métricas y velas son las del snapshot publicado, compartidas
+        por todas las sesiones: son de sólo lectura.
+        """
+        sondeo = self.sondeo(intervalo)
+        publicacion = sondeo.ultimo(esperar=esperar)
+        METRICAS.contar("snapshot_lecturas")
+        edad, vencido = sondeo.edad(publicacion), sondeo.vencido(publicacion)
+        if publicacion.datos is None:
+            return DatosMercado(tabla_vacia(), {}, {}, None, None, publicacion.error, edad, vencido)
+        metricas, velas, senales = publicacion.datos.metricas, publicacion.datos.velas, publicacion.datos.senales
+        analitica = publicacion.datos.analitica
+        if intervalo != "1d":
+            metricas = metricas.get(intervalo)
+            metricas = tabla_vacia() if metricas is None else metricas
+            velas = velas.get(intervalo, {})
+            senales = senales.get(intervalo) if senales is not None else None
+        return DatosMercado(
+            metricas, velas, publicacion.datos.estados, senales, analitica, publicacion.error, edad, vencido
+        )
+
+    def detener(self, timeout_alertas=10, timeout_sondeos=30):
+        """Detiene los sondeos (esperando el refresco en curso hasta `timeout_sondeos` segundos)
+        y da a las alertas pendientes hasta `timeout_alertas` segundos para salir."""
+        with self._lock:
+            sondeos = [s for s in (self._diario, self._intradia) if s is not None]
+        for sondeo in sondeos:
+            sondeo.detener(esperar=timeout_sondeos)
+        return self.despachador.esperar_vacia(timeout=timeout_alertas)
+
+
+# Servicios creados por `crear_servicio` en este proceso (el del tablero vive en
+# `st.cache_resource`), para poder detenerlos en orden, p. ej. al cerrar una prueba de carga
+_SERVICIOS = weakref.WeakSet()
+
+
+def detener_servicios(timeout_alertas=10, timeout_sondeos=30):
+    """Detiene todos los servicios del proceso; True si todos vaciaron su cola de alertas."""
+    return all([s.detener(timeout_alertas, timeout_sondeos) for s in list(_SERVICIOS)])
+
+
+def crear_servicio(token, chat_id, ruta_universo=RUTA_UNIVERSO, ruta_reglas=RUTA_REGLAS,
+                   ruta_almacen=RUTA_ALMACEN, ruta_registro_alertas=RUTA_REGISTRO_ALERTAS, fuente=FUENTE,
+                   url_telegram=URL_TELEGRAM, **opciones):
+    """Carga universo y reglas, abre el almacén y el registro de alertas y arma el servicio."""
+    categorias = cargar_universo(ruta_universo)
+    umbral = opciones.get("umbral_alerta", UMBRAL_ALERTA)
+    motor = MotorReglas(cargar_reglas(ruta_reglas), variables={"umbral_alerta": umbral})
+    despachador = DespachadorTelegram(
+        token, chat_id, registro=RegistroAlertas(ruta_registro_alertas), url_base=url_telegram
+    ).iniciar()
+    if opciones.get("descargador") is None:
+        opciones["descargador"] = crear_descargador(fuente)
+    svc = ServicioMercado(categorias, motor, AlmacenBarras(ruta_almacen), despachador, **opciones)
+    _SERVICIOS.add(svc)
+    return svc
@@ -0,0 +1,128 @@
+"""Snapshot de mercado inmutable y columnar, compartido sin copias por todas las sesiones.
+
+Un snapshot tiene:
+
+* `metricas`: un DataFrame (una fila por ticker, índice = símbolo) con las métricas de la
+  última barra: precio, variación, volumen, RSI, MACD, bandas, cruces, etc. Es también la
+  tabla sobre la que se evalúan las reglas (los nombres de columna son los de las reglas).
+* `velas`: {símbolo: VelasTicker} con las últimas velas de cada ticker como arrays NumPy.
+* `estados`: estado de descarga/procesamiento de cada ticker.
+* `senales`: DataFrame booleano (símbolo x regla) que agrega el motor de reglas.
+* `analitica`: índices sectoriales y correlaciones del universo (`bolsa.analitica`), sólo
+  en el snapshot diario.
+
+Todos los arrays son de sólo lectura: el sondeo publica una única referencia y las
+sesiones leen esos mismos objetos, sin copiar ni deserializar nada por sesión.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+SnapshotMercado = namedtuple(
+    "SnapshotMercado", ["metricas", "velas", "estados", "senales", "analitica"], defaults=(None, None)
+)
+
+# Columnas de `metricas` (en orden) y su tipo
+COLUMNAS_METRICAS = {
+    'nombre': object,
+    'precio': float,
+    'var': float,
+    'alerta': bool,
+    'positivo': bool,
+    'volume': float,
+    'avg_volume_20': float,
+    'rsi': float,
+    'macd': float,
+    'signal': float,
+    'macd_hist': float,
+    'macd_hist_prev': float,
+    'macd_cross': object,
+    'sma': float,
+    'upper': float,
+    'lower': float,
+    'sparkline': object,
+}
+
+# Nombres de `resumen_ultimas_barras` -> columnas de `metricas`
+RENOMBRE_RESUMEN = {
+    'Precio': 'precio', 'Var': 'var', 'Alerta': 'alerta', 'Positivo': 'positivo', 'Volumen': 'volume',
+    'Vol_Prom_20': 'avg_volume_20', 'RSI_Hoy': 'rsi', 'MACD': 'macd', 'Signal_Line': 'signal',
+    'MACD_Hist_Hoy': 'macd_hist', 'MACD_Hist_Ayer': 'macd_hist_prev', 'SMA': 'sma',
+    'Upper': 'upper', 'Lower': 'lower',
+}
+
+
+class VelasTicker(namedtuple("VelasTicker", ["fechas", "columnas", "valores"])):
+    """Últimas velas de un ticker: fechas (pd.Index, inmutable), nombres de columna y matriz
+    (n x columnas) de sólo lectura."""
+
+    __slots__ = ()
+
+    @classmethod
+    def desde_arrays(cls, fechas, columnas, valores):
+        valores = np.array(valores, dtype=float, copy=True)
+        valores.setflags(write=False)
+        return cls(pd.Index(fechas, name='Date'), tuple(columnas), valores)
+
+    @classmethod
+    def desde_dataframe(cls, df):
+        return cls.desde_arrays(df.index, df.columns, df.to_numpy(dtype=float))
+
+    def __len__(self):
+        return len(self.fechas)
+
+    def columna(self, nombre):
+        return self.valores[:, self.columnas.index(nombre)]
+
+    def ultima(self, nombre):
+        return float(self.valores[-1, self.columnas.index(nombre)])
+
+    def a_dataframe(self):
+        """DataFrame sobre los mismos arrays (sin copia), para construir la figura Plotly."""
+        return pd.DataFrame(self.valores, index=self.fechas, columns=list(self.columnas), copy=False)
+
+
+def tabla_metricas(columnas, simbolos):
+    """DataFrame de métricas sobre arrays de sólo lectura a partir de {columna: valores}.
+
+    Agrega `macd_cross` ('up' si el histograma MACD pasó de negativo a positivo en la
+    última barra, 'down' en el caso contrario, '' si no hubo cruce) y completa con NaN
+    (o "") las columnas que falten.
+    """
+    n = len(simbolos)
+    datos = {}
+    for columna, tipo in COLUMNAS_METRICAS.items():
+        if columna in columnas:
+            arr = np.array(columnas[columna], dtype=tipo)
+        elif tipo is float:
+            arr = np.full(n, np.nan)
+        elif tipo is bool:
+            arr = np.zeros(n, dtype=bool)
+        else:
+            arr = np.full(n, "", dtype=object)
+        datos[columna] = arr
+
+    hoy, ayer = datos['macd_hist'], datos['macd_hist_prev']
+    datos['macd_cross'] = np.select(
+        [(ayer < 0) & (hoy > 0), (ayer > 0) & (hoy < 0)], ['up', 'down'], ''
+    ).astype(object)
+
+    for arr in datos.values():
+        arr.setflags(write=False)
+    return pd.DataFrame(datos, index=pd.Index(list(simbolos), name='symbol'), copy=False)
+
+
+def tabla_vacia():
+    return tabla_metricas({}, [])
+
+
+def una_fila_por_symbol(metricas):
+    """`metricas` sin símbolos repetidos (queda la primera entrada), para reglas y alertas.
+
+    La tabla tiene una fila por entrada del universo, y un símbolo puede figurar en
+    varias categorías con nombres distintos; sus datos son los mismos en todas.
+    """
+    if not metricas.index.has_duplicates:
+        return metricas
+    return metricas[~metricas.index.duplicated()]
@@ -0,0 +1,150 @@
+"""Sondeo de mercado compartido: un único hilo por proceso refresca y publica el snapshot."""
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import namedtuple
+
+from bolsa.metricas import METRICAS
+
+# Lo que ven las sesiones: datos inmutables + metadatos de la última actualización.
+# `de_disco` indica que el snapshot viene de un proceso anterior y aún no se revalida.
+Publicacion = namedtuple(
+    "Publicacion", ["datos", "version", "actualizado", "error", "de_disco"], defaults=(False,)
+)
+
+log = logging.getLogger(__name__)
+
+
+class SondeoMercado:
+    """Ejecuta `funcion_snapshot` cada `intervalo` segundos en un hilo de fondo.
+
+    Cada resultado se publica reemplazando una sola referencia, por lo que los lectores
+    siempre obtienen un snapshot completo sin bloquear al hilo de refresco. Si un refresco
+    falla se conserva el último snapshot bueno y se registra el error. `al_publicar`
+    recibe cada snapshot nuevo (p. ej. para despachar alertas una sola vez por proceso).
+
+    Con `ruta_persistencia`, cada snapshot bueno se guarda en disco (pickle, reemplazo
+    atómico) y al crear el sondeo se publica el último guardado: un proceso recién
+    reiniciado sirve datos de inmediato mientras el primer refresco corre de fondo.
+    """
+
+    def __init__(self, funcion_snapshot, intervalo=60, al_publicar=None, ruta_persistencia=None):
+        self.funcion_snapshot = funcion_snapshot
+        self.intervalo = intervalo
+        self.al_publicar = al_publicar
+        self.ruta_persistencia = ruta_persistencia
+        self._publicacion = Publicacion(datos=None, version=0, actualizado=None, error=None)
+        if ruta_persistencia:
+            self._publicacion = self._cargar() or self._publicacion
+        self._cond = threading.Condition()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._bucle, name="sondeo-mercado", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self, esperar=0):
+        """Pide al hilo que termine; con `esperar`, aguarda hasta esos segundos al refresco en curso."""
+        self._detener.set()
+        self._despertar.set()
+        if esperar and self._hilo is not None and self._hilo is not threading.current_thread():
+            self._hilo.join(esperar)
+
+    def ultimo(self, esperar=0):
+        """Última publicación; si aún no hay ninguna, espera hasta `esperar` segundos."""
+        with self._cond:
+            if self._publicacion.version == 0 and esperar:
+                self._cond.wait_for(lambda: self._publicacion.version > 0, timeout=esperar)
+            return self._publicacion
+
+    def edad(self, publicacion=None):
+        """Segundos desde el último refresco bueno (None si nunca hubo uno)."""
+        publicacion = publicacion or self._publicacion
+        if publicacion.actualizado is None:
+            return None
+        return max(0.0, time.time() - publicacion.actualizado)
+
+    def vencido(self, publicacion=None):
+        """True si los datos vienen del disco sin revalidar o superan dos intervalos de antigüedad."""
+        publicacion = publicacion or self._publicacion
+        edad = self.edad(publicacion)
+        return publicacion.de_disco or (edad is not None and edad > 2 * self.intervalo)
+
+    def refrescar_ahora(self, esperar=0):
+        """Adelanta el próximo refresco y opcionalmente espera a que se publique.
+
+        Sin `esperar` devuelve de inmediato la publicación vigente: su `version` sirve para
+        reconocer después la que traiga el refresco pedido.
+        """
+        with self._cond:
+            version = self._publicacion.version
+        self._despertar.set()
+        if esperar:
+            with self._cond:
+                self._cond.wait_for(lambda: self._publicacion.version > version, timeout=esperar)
+        return self._publicacion
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            self._refrescar()
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+
+    def _refrescar(self):
+        anterior = self._publicacion
+        try:
+            with METRICAS.medir("refresco"):
+                datos, error = self.funcion_snapshot(), None
+            METRICAS.contar("refrescos")
+        except Exception as e:
+            METRICAS.contar("refrescos_fallidos")
+            datos, error = anterior.datos, e
+        with self._cond:
+            self._publicacion = Publicacion(
+                datos=datos, version=anterior.version + 1, error=error,
+                actualizado=time.time() if error is None else anterior.actualizado,
+                de_disco=anterior.de_disco and error is not None,
+            )
+            self._cond.notify_all()
+
+        if error is None and self.ruta_persistencia:
+            self._guardar(self._publicacion)
+
+        if error is None and self.al_publicar is not None:
+            try:
+                self.al_publicar(datos)
+            except Exception:
+                log.exception("Error en al_publicar")
+
+    # --- PERSISTENCIA ---
+    def _guardar(self, publicacion):
+        try:
+            with METRICAS.medir("snapshot_guardar"):
+                carpeta = os.path.dirname(self.ruta_persistencia)
+                if carpeta:
+                    os.makedirs(carpeta, exist_ok=True)
+                temporal = f"{self.ruta_persistencia}.{os.getpid()}.tmp"
+                with open(temporal, "wb") as f:
+                    pickle.dump((publicacion.datos, publicacion.actualizado), f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporal, self.ruta_persistencia)
+        except Exception:
+            log.exception("No se pudo guardar el snapshot en %s", self.ruta_persistencia)
+
+    def _cargar(self):
+        if not os.path.exists(self.ruta_persistencia):
+            return None
+        try:
+            with METRICAS.medir("snapshot_cargar"), open(self.ruta_persistencia, "rb") as f:
+                datos, actualizado = pickle.load(f)
+        except Exception:
+            # Archivo corrupto o de una versión incompatible: se ignora y se espera al primer refresco
+            log.warning("Se ignora el snapshot guardado en %s", self.ruta_persistencia, exc_info=True)
+            return None
+        METRICAS.contar("snapshots_desde_disco")
+        return Publicacion(datos=datos, version=1, actualizado=actualizado, error=None, de_disco=True)
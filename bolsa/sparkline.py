@@ -0,0 +1,38 @@
+"""Sparklines SVG en línea para la vista compacta de las tarjetas (sin Plotly).
+
+Los puntos se calculan una vez por refresco al armar el snapshot; al dibujar sólo se
+envuelven en un `<svg>` con el color del tema, unos cientos de bytes por tarjeta en
+lugar del JSON de una figura Plotly completa.
+"""
+import numpy as np
+
+ANCHO_SPARKLINE = 160
+ALTO_SPARKLINE = 36
+
+
+def puntos_sparkline(valores, ancho=ANCHO_SPARKLINE, alto=ALTO_SPARKLINE):
+    """Atributo `points` de un `<polyline>` que recorre `valores` escalados a `ancho` x `alto`.
+
+    Los NaN se omiten. Con menos de dos valores válidos devuelve "".
+    """
+    y = np.asarray(valores, dtype=float)
+    x = np.linspace(0, ancho, len(y)) if len(y) > 1 else np.zeros(len(y))
+    validos = ~np.isnan(y)
+    x, y = x[validos], y[validos]
+    if len(y) < 2:
+        return ""
+    minimo, rango = y.min(), np.ptp(y)
+    # El eje Y del SVG crece hacia abajo; 1px de margen para que el trazo no se corte
+    y = (alto - 1) - (y - minimo) / rango * (alto - 2) if rango else np.full(len(y), alto / 2)
+    return " ".join(f"{a:.1f},{b:.1f}" for a, b in zip(x, y))
+
+
+def svg_sparkline(puntos, color, ancho=ANCHO_SPARKLINE, alto=ALTO_SPARKLINE):
+    """SVG en línea listo para `st.markdown(..., unsafe_allow_html=True)`."""
+    if not puntos:
+        return ""
+    return (
+        f"<svg width='{ancho}' height='{alto}' viewBox='0 0 {ancho} {alto}' class='sparkline'>"
+        f"<polyline points='{puntos}' fill='none' stroke='{color}' stroke-width='1.5' "
+        f"stroke-linejoin='round' stroke-linecap='round'/></svg>"
+    )
@@ -0,0 +1,60 @@
+"""Carga del universo de activos (categoría, nombre, símbolo) desde un archivo CSV o YAML."""
+import csv
+import os
+
+
+def cargar_universo(ruta):
+    """Devuelve {categoria: {nombre: symbol}} preservando el orden del archivo.
+
+    CSV: columnas `categoria,nombre,symbol`. YAML (requiere PyYAML): un mapeo
+    `categoria -> {nombre: symbol}`, con la misma forma que el diccionario devuelto.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension in (".yaml", ".yml"):
+        filas = _leer_yaml(ruta)
+    elif extension == ".csv":
+        filas = _leer_csv(ruta)
+    else:
+        raise ValueError(f"Formato de universo no soportado: {ruta} (usa .csv, .yaml o .yml)")
+
+    categorias = {}
+    vistos = {}
+    for numero, (categoria, nombre, symbol) in enumerate(filas, start=1):
+        if not categoria or not nombre or not symbol:
+            raise ValueError(f"{ruta}: fila {numero} incompleta ({categoria!r}, {nombre!r}, {symbol!r})")
+        if nombre in vistos:
+            raise ValueError(f"{ruta}: el nombre {nombre!r} aparece dos veces (filas {vistos[nombre]} y {numero})")
+        vistos[nombre] = numero
+        categorias.setdefault(categoria, {})[nombre] = symbol
+
+    if not categorias:
+        raise ValueError(f"{ruta}: el universo está vacío")
+    return categorias
+
+
+def _leer_csv(ruta):
+    with open(ruta, newline="", encoding="utf-8-sig") as f:
+        lector = csv.DictReader(f)
+        faltantes = {"categoria", "nombre", "symbol"} - set(lector.fieldnames or [])
+        if faltantes:
+            raise ValueError(f"{ruta}: faltan las columnas {sorted(faltantes)}")
+        return [
+            (fila["categoria"].strip(), fila["nombre"].strip(), fila["symbol"].strip())
+            for fila in lector
+            if any((valor or "").strip() for valor in fila.values())
+        ]
+
+
+def _leer_yaml(ruta):
+    try:
+        import yaml
+    except ImportError as e:
+        raise ImportError("Para leer el universo en YAML instala PyYAML (pip install pyyaml)") from e
+
+    with open(ruta, encoding="utf-8") as f:
+        contenido = yaml.safe_load(f) or {}
+    return [
+        (str(categoria).strip(), str(nombre).strip(), str(symbol).strip())
+        for categoria, activos in contenido.items()
+        for nombre, symbol in (activos or {}).items()
+    ]
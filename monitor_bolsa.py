@@ -1,12 +1,13 @@
 import streamlit as st
 import pandas as pd
-import requests
-import time
-from datetime import datetime, timedelta
-# VOLVEMOS A YFINANCE
-import yfinance as yf
-from plotly.subplots import make_subplots 
-import plotly.graph_objects as go
+import os
+
+from bolsa import servicio
+from bolsa.descarga import resumen_estados
+from bolsa.intradia import INTERVALOS_INTRADIA
+from bolsa.metricas import METRICAS
+from bolsa.reglas import coincidencias_por_symbol
+from bolsa.sparkline import svg_sparkline
 
 # --- CONFIGURACIÓN DE LA PÁGINA WEB ---
 st.set_page_config(
@@ -32,6 +33,12 @@ PALETTES = {
 if 'theme' not in st.session_state:
     st.session_state['theme'] = "Dark"
 
+if 'intervalo' not in st.session_state:
+    st.session_state['intervalo'] = "1d"
+
+if 'vista_compacta' not in st.session_state:
+    st.session_state['vista_compacta'] = True
+
 CURRENT_THEME = PALETTES[st.session_state['theme']]
 COLOR_BACKGROUND = CURRENT_THEME["BACKGROUND"]
 COLOR_CARD_BG = CURRENT_THEME["CARD_BG"]
@@ -77,12 +84,13 @@ st.markdown(f"""
         display: inline-block; margin-right: 8px; margin-bottom: 5px;
         color: {COLOR_CARD_BG};
     }}
-    .rsi-overbought {{ background-color: {COLOR_NEGATIVE}; }}
-    .rsi-oversold {{ background-color: {COLOR_POSITIVE}; }}
-    .macd-buy {{ background-color: {COLOR_POSITIVE}; }}
-    .macd-sell {{ background-color: {COLOR_NEGATIVE}; }}
+    .senal-negativo {{ background-color: {COLOR_NEGATIVE}; }}
+    .senal-positivo {{ background-color: {COLOR_POSITIVE}; }}
+    .senal-neutro {{ background-color: {COLOR_ACCENT}; }}
 
     
+    .sparkline {{ display: block; margin: -6px 0 8px 0; }}
+
     .stTabs [data-baseweb="tab-list"] {{ gap: 15px; }}
     .stTabs [data-baseweb="tab"] {{ border-radius: 6px 6px 0 0; background: {COLOR_CARD_BG}; color: {COLOR_TEXT_NEUTRAL}; }}
     .stTabs [aria-selected="true"] {{ border-bottom: 3px solid {COLOR_ACCENT} !important; color: {COLOR_ACCENT} !important; }}
@@ -95,220 +103,84 @@ try:
     TELEGRAM_TOKEN = st.secrets["TELEGRAM_TOKEN"]
     TELEGRAM_CHAT_ID = st.secrets["TELEGRAM_CHAT_ID"]
 except:
-    TELEGRAM_TOKEN = "" 
-    TELEGRAM_CHAT_ID = ""
-
-
-# --- CONFIGURACIÓN DE ACTIVOS (VOLVEMOS A LOS TICKERS DE YFINANCE) ---
-UMBRAL_ALERTA = 2.5 
-
-TICKER_CATEGORIES = {
-    "MACROECONOMÍA 🌎": {
-        "USD/CLP": "CLP=X",
-        "Cobre": "HG=F",
-        "Petróleo WTI": "CL=F",
-    },
-    "COMMODITIES & ENERGÍA 🔋": {
-        "SQM-B (Litio)": "SQM-B.SN",
-        "Copec": "COPEC.SN",
-    },
-    "BANCA 🏦": {
-        "Banco de Chile": "CHILE.SN",
-        "Banco Bci": "BCI.SN",
-    },
-    "RETAIL & MALLS 🛍️": {
-        "Falabella": "FALABELLA.SN",
-        "Cencosud": "CENCOSUD.SN",
-        "Ripley": "RIPLEY.SN",
-        "Parque Arauco": "PARAUCO.SN",
-    },
-    "OTROS SECTORES 🚀": {
-        "LATAM": "LTM.SN",
-        "Sonda (Tech)": "SONDA.SN",
-        "Socovesa": "SOCOVESA.SN"
-    }
-}
-
-TICKERS_PLANO = {nombre: symbol for cat in TICKER_CATEGORIES.values() for nombre, symbol in cat.items()}
-
-
-# --- FUNCIONES DE ANÁLISIS TÉCNICO (Sin cambios) ---
-def calcular_bollinger_bands(df, window=20, num_std=2):
-    df['SMA'] = df['close'].rolling(window=window).mean()
-    df['STD'] = df['close'].rolling(window=window).std()
-    df['Upper'] = df['SMA'] + (df['STD'] * num_std)
-    df['Lower'] = df['SMA'] - (df['STD'] * num_std)
-    return df
-
-def calcular_rsi(df, window=14):
-    delta = df['close'].diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    avg_gain = gain.ewm(com=window - 1, min_periods=window).mean()
-    avg_loss = loss.ewm(com=window - 1, min_periods=window).mean()
-    rs = avg_gain / avg_loss
-    df['RSI'] = 100 - (100 / (1 + rs))
-    return df
-
-def calcular_macd(df, fast_period=12, slow_period=26, signal_period=9):
-    df['EMA_Fast'] = df['close'].ewm(span=fast_period, adjust=False).mean()
-    df['EMA_Slow'] = df['close'].ewm(span=slow_period, adjust=False).mean()
-    df['MACD'] = df['EMA_Fast'] - df['EMA_Slow']
-    df['Signal_Line'] = df['MACD'].ewm(span=signal_period, adjust=False).mean()
-    df['MACD_Hist'] = df['MACD'] - df['Signal_Line']
-    return df
-
-def enviar_telegram(mensaje):
-    if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID: return
-    
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    payload = {"chat_id": TELEGRAM_CHAT_ID, "text": mensaje, "parse_mode": "Markdown"}
-    try:
-        requests.post(url, json=payload, timeout=2)
-    except:
-        pass
-
-
-@st.cache_data(ttl=60)
-def obtener_datos():
-    """Descarga datos de mercado y aplica análisis técnico usando YFinance."""
-    data_display = []
-    codigos = list(TICKERS_PLANO.values())
-    
-    try:
-        # Descarga masiva para 50 días 
-        # Usamos period="60d" para dar margen de días no hábiles.
-        df_hist = yf.download(codigos, period="60d", interval="1d", progress=False).copy(deep=True)
-        
-        for nombre, symbol in TICKERS_PLANO.items():
-            try:
-                # 1. PREPARACIÓN DEL DATAFRAME
-                # Manejo de dataframe individual cuando hay múltiples tickers
-                if len(codigos) > 1:
-                    # Intenta acceder al MultiIndex, si falla (ej. si solo es un ticker), usa el dataframe completo
-                    try:
-                        df_hist_individual = df_hist.loc[:, (slice(None), symbol)].copy()
-                        df_hist_individual.columns = df_hist_individual.columns.droplevel(1)
-                    except KeyError:
-                         df_hist_individual = df_hist.copy()
-                         
-                else:
-                    df_hist_individual = df_hist.copy()
-
-                df_hist_individual = df_hist_individual.rename(columns={'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close', 'Volume': 'volume', 'Adj Close': 'adjusted close'})
-                df_hist_individual.index.name = 'Date'
-                
-                # 2. APLICAR CÁLCULOS DE ANÁLISIS TÉCNICO
-                if len(df_hist_individual) < 30:
-                    continue 
-
-                df_hist_individual = calcular_bollinger_bands(df_hist_individual)
-                df_hist_individual = calcular_rsi(df_hist_individual) 
-                df_hist_individual = calcular_macd(df_hist_individual) 
-                
-                # Nos aseguramos de tener 20 días para el gráfico
-                data_velas = df_hist_individual.dropna().tail(20).copy()
-
-                if len(data_velas) < 2: # Necesitamos al menos 2 días para calcular la variación
-                    continue
-
-                # 3. EXTRACCIÓN DE DATOS DIARIOS
-                df_hoy = data_velas.iloc[-1].copy()
-                df_ayer = data_velas.iloc[-2].copy() # El día anterior más reciente
-
-                precio = df_hoy['close']
-                volumen = df_hoy['volume']
-                
-                # CÁLCULO DE VARIACIÓN (close de HOY vs close de AYER)
-                close_ayer = df_ayer['close']
-                var_pct = ((precio - close_ayer) / close_ayer) * 100 if close_ayer != 0 else 0
-                es_alerta = abs(var_pct) >= UMBRAL_ALERTA
-                
-                # 4. EXTRACCIÓN DE INDICADORES CLAVE PARA LA TARJETA
-                rsi_hoy = df_hoy['RSI'] if 'RSI' in df_hoy else None
-                macd_hist_hoy = df_hoy['MACD_Hist'] if 'MACD_Hist' in df_hoy else None
-                macd_hist_ayer = df_ayer['MACD_Hist'] if 'MACD_Hist' in df_ayer else 0
-                
-                
-                # 5. CREACIÓN DE FIGURA PLOTLY (4 SUBPLOTS)
-                fig = make_subplots(
-                    rows=4, cols=1, shared_xaxes=True, vertical_spacing=0.02,
-                    row_heights=[0.45, 0.15, 0.20, 0.20] 
-                )
-                
-                # --- Subplot 1: GRÁFICO DE VELAS y BB ---
-                fig.add_trace(go.Candlestick(
-                    x=data_velas.index, open=data_velas['open'], high=data_velas['high'],
-                    low=data_velas['low'], close=data_velas['close'],
-                    increasing_line_color=COLOR_POSITIVE, decreasing_line_color=COLOR_NEGATIVE,
-                    name='Velas'
-                ), row=1, col=1)
-
-                # Bandas de Bollinger (SMA, Upper, Lower)
-                fig.add_trace(go.Scatter(x=data_velas.index, y=data_velas['Upper'], line=dict(color='rgba(255, 165, 0, 0.8)', width=1), name='Banda Superior'), row=1, col=1)
-                fig.add_trace(go.Scatter(x=data_velas.index, y=data_velas['SMA'], line=dict(color=COLOR_ACCENT, width=1.5), name='SMA 20'), row=1, col=1)
-                fig.add_trace(go.Scatter(x=data_velas.index, y=data_velas['Lower'], line=dict(color='rgba(255, 165, 0, 0.8)', width=1), name='Banda Inferior'), row=1, col=1)
-                
-                # --- Subplot 2: RSI ---
-                fig.add_trace(go.Scatter(x=data_velas.index, y=data_velas['RSI'], line=dict(color=COLOR_POSITIVE, width=1.5), name='RSI'), row=2, col=1)
-                fig.add_hline(y=70, line_dash="dash", line_color="red", row=2, col=1, opacity=0.5)
-                fig.add_hline(y=30, line_dash="dash", line_color="green", row=2, col=1, opacity=0.5)
-
-                # --- Subplot 3: MACD ---
-                fig.add_trace(go.Bar(
-                    x=data_velas.index, y=data_velas['MACD_Hist'], 
-                    marker_color=data_velas['MACD_Hist'].apply(lambda x: COLOR_POSITIVE if x > 0 else COLOR_NEGATIVE), 
-                    name='MACD Hist'
-                ), row=3, col=1)
-                fig.add_trace(go.Scatter(x=data_velas.index, y=data_velas['MACD'], line=dict(color=COLOR_ACCENT, width=1.5), name='MACD'), row=3, col=1)
-                fig.add_trace(go.Scatter(x=data_velas.index, y=data_velas['Signal_Line'], line=dict(color='orange', width=1), name='Señal'), row=3, col=1)
-                
-                # --- Subplot 4: Volumen (Barra) ---
-                fig.add_trace(go.Bar(
-                    x=data_velas.index, 
-                    y=data_velas['volume'],
-                    marker_color='rgba(150, 150, 150, 0.6)', 
-                    name='Volumen'
-                ), row=4, col=1)
-
-
-                # --- Configuración de la Figura ---
-                fig.update_layout(
-                    height=600, margin=dict(l=10, r=10, t=20, b=20),
-                    paper_bgcolor=COLOR_CARD_BG, plot_bgcolor=COLOR_CARD_BG,
-                    showlegend=False, xaxis_rangeslider_visible=False,
-                    font=dict(color=COLOR_TEXT_NEUTRAL)
-                )
-
-                # Configuración de Ejes
-                fig.update_yaxes(title_text="Precio / BB", row=1, col=1, showgrid=False)
-                fig.update_yaxes(title_text="RSI", range=[0, 100], row=2, col=1, showgrid=True, gridcolor=COLOR_BORDER)
-                fig.update_yaxes(title_text="MACD", row=3, col=1, showgrid=True, gridcolor=COLOR_BORDER)
-                fig.update_yaxes(title_text="Vol", row=4, col=1, showgrid=False)
-                fig.update_xaxes(row=4, col=1, showgrid=False)
-                
-                # --- Guardar datos ---
-                data_display.append({
-                    "Nombre": nombre, 
-                    "Symbol": symbol,
-                    "Precio": precio, 
-                    "Var": var_pct, 
-                    "Alerta": es_alerta,
-                    "Figura_Plotly": fig,
-                    "Volumen": volumen,
-                    "Positivo": var_pct > 0,
-                    "RSI_Hoy": rsi_hoy,
-                    "MACD_Hist_Hoy": macd_hist_hoy,
-                    "MACD_Hist_Ayer": macd_hist_ayer
-                })
-            except Exception as e:
-                #st.error(f"Error procesando {nombre} con YFinance: {e}") # Descomentar para debug
-                continue
-    except Exception as e:
-        st.error(f"Error general al conectar a Yahoo Finance: {e}. Revisa tu conexión o los tickers.")
-        return []
-    
-    return data_display
+    TELEGRAM_TOKEN, TELEGRAM_CHAT_ID = servicio.credenciales_telegram()
+
+
+# --- SERVICIO DE DATOS COMPARTIDO ---
+# Universo, reglas, almacén, alertas y sondeos viven en bolsa.servicio (sin Streamlit),
+# el mismo núcleo que corre `python -m bolsa.daemon`. Un único servicio por proceso:
+# un hilo refresca el snapshot y las sesiones sólo lo leen.
+@st.cache_resource
+def obtener_servicio():
+    return servicio.crear_servicio(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
+
+
+SERVICIO = obtener_servicio()
+TICKER_CATEGORIES = SERVICIO.categorias
+TICKERS_PLANO = SERVICIO.tickers_plano
+MOTOR_REGLAS = SERVICIO.motor_reglas
+# Las tarjetas se asignan por nombre (único en el universo): un símbolo puede repetirse en otra categoría
+NOMBRES_POR_CATEGORIA = {cat: pd.Index(list(tickers.keys())) for cat, tickers in TICKER_CATEGORIES.items()}
+
+
+# --- CACHÉ DE FIGURAS (COMPARTIDA ENTRE SESIONES) ---
+# Las figuras se construyen sólo al dibujar cada tarjeta, nunca dentro de obtener_datos.
+@st.cache_resource
+def obtener_cache_figuras():
+    from bolsa.graficos import CacheFiguras  # Plotly sólo se importa cuando hay tarjetas que dibujar
+    return CacheFiguras(max_entradas=256)
+
+
+# --- VISTA COMPACTA Y PRESUPUESTO DE PAYLOAD ---
+# En la vista compacta cada tarjeta envía un sparkline SVG de unos cientos de bytes; la
+# figura Plotly completa (decenas de KB de JSON) sólo se construye y envía al expandirla.
+PRESUPUESTO_TARJETA_BYTES = int(os.environ.get("MONITOR_BOLSA_PRESUPUESTO_TARJETA", "4096"))
+
+
+def registrar_payload(bytes_tarjeta, bytes_figura=None):
+    """Cuenta los bytes enviados por tarjeta (incluida la figura, si se envió) contra el presupuesto.
+
+    `bytes_figura` es el tamaño que la caché de figuras midió al construirla: no se vuelve a
+    serializar la figura en cada dibujo.
+    """
+    if not METRICAS.habilitado:
+        return
+    if bytes_figura is not None:
+        METRICAS.contar("payload_figuras")
+        METRICAS.contar("payload_figuras_bytes", bytes_figura)
+        bytes_tarjeta += bytes_figura
+    METRICAS.contar("payload_tarjetas")
+    METRICAS.contar("payload_tarjetas_bytes", bytes_tarjeta)
+    if bytes_tarjeta > PRESUPUESTO_TARJETA_BYTES:
+        METRICAS.contar("payload_tarjetas_sobre_presupuesto")
+
+
+def obtener_datos(intervalo="1d"):
+    """Métricas, velas, estados, señales (DataFrame symbol x regla) y analítica del último snapshot publicado.
+
+    Son los mismos objetos (de sólo lectura) que leen todas las sesiones. Siempre se sirve
+    el último snapshot bueno (aunque sea de antes de un reinicio) y se indica su
+    antigüedad; el refresco ocurre de fondo. Sólo sin ningún snapshot se espera el primero.
+    """
+    datos = SERVICIO.datos(intervalo, esperar=30)
+    if datos.error is not None and datos.metricas.empty:
+        st.error(f"Error general al conectar a Yahoo Finance: {datos.error}. Revisa tu conexión o los tickers.")
+    if datos.edad is not None:
+        hace = formatear_edad(datos.edad)
+        if datos.vencido:
+            detalle = f" (el último intento falló: {datos.error})" if datos.error is not None else ""
+            st.warning(f"⏳ Mostrando datos de hace {hace}; actualizando en segundo plano...{detalle}")
+        else:
+            st.caption(f"🕒 Actualizado hace {hace}")
+    return datos.metricas, datos.velas, datos.estados, datos.senales, datos.analitica
+
+
+def formatear_edad(segundos):
+    if segundos < 90:
+        return f"{segundos:.0f} s"
+    if segundos < 5400:
+        return f"{segundos / 60:.0f} min"
+    return f"{segundos / 3600:.1f} h"
 
 
 # --- INTERFAZ DE USUARIO (DASHBOARD) ---
@@ -329,126 +201,245 @@ with st.sidebar:
     else:
         st.button("🌙 Cambiar a Tema Oscuro", on_click=switch_theme)
 
+    st.selectbox(
+        "⏱️ Intervalo de las velas", ["1d"] + list(INTERVALOS_INTRADIA), key="intervalo",
+        help="1d: velas diarias. 1m/5m/15m/60m: monitoreo intradía durante la sesión.",
+    )
+
+    st.toggle(
+        "🗂️ Vista compacta", key="vista_compacta",
+        help="Cada tarjeta muestra un sparkline; el gráfico completo se carga al expandirla.",
+    )
+
     st.divider()
 
+    # --- PANEL DE RENDIMIENTO ---
+    with st.expander("📊 Rendimiento"):
+        # La medición es del proceso y se decide al arrancar (MONITOR_BOLSA_METRICAS=1);
+        # el toggle sólo controla si esta sesión muestra el panel
+        if not METRICAS.habilitado:
+            st.caption("Medición desactivada: arranca con `MONITOR_BOLSA_METRICAS=1` para habilitarla.")
+        elif st.toggle("Ver tiempos", key="ver_metricas",
+                       help="Tiempos de cada etapa del refresco y del dibujo, medidos para todo el proceso."):
+            percentiles = METRICAS.percentiles()
+            if percentiles:
+                st.caption("Tiempos por etapa (ms, últimas mediciones)")
+                st.dataframe(
+                    pd.DataFrame.from_dict(percentiles, orient="index")[["n", "p50_ms", "p90_ms", "p99_ms", "ultimo_ms"]].round(1),
+                    use_container_width=True,
+                )
+            contadores = METRICAS.contadores()
+            if contadores.get("payload_tarjetas"):
+                promedio = contadores["payload_tarjetas_bytes"] / contadores["payload_tarjetas"]
+                st.caption(
+                    f"Payload por tarjeta: {promedio:,.0f} B en promedio "
+                    f"(presupuesto {PRESUPUESTO_TARJETA_BYTES:,} B, "
+                    f"{contadores.get('payload_tarjetas_sobre_presupuesto', 0)} excedidas)"
+                )
+            if contadores:
+                st.caption("Contadores")
+                st.dataframe(pd.Series(contadores, name="total"), use_container_width=True)
+            st.caption(f"Prometheus: `{servicio.RUTA_METRICAS}` (se reescribe en cada refresco)")
+            if st.button("Reiniciar métricas"):
+                METRICAS.reiniciar()
+
 st.title("📈 Monitor Bolsa de Santiago Pro")
-st.caption("Gráfico de Velas con BB, RSI y MACD | Fuente: Yahoo Finance (Delay de 15 min)")
+if servicio.FUENTE == "replay":
+    st.caption(f"Gráfico de Velas con BB, RSI y MACD | Fuente: replay simulado (x{servicio.REPLAY_VELOCIDAD:g})")
+else:
+    st.caption("Gráfico de Velas con BB, RSI y MACD | Fuente: Yahoo Finance (Delay de 15 min)")
 
 col_info, col_refresh = st.columns([5,1])
 with col_refresh:
     with st.container():
         st.write("") 
+        # Sólo revalida el sondeo del intervalo elegido; mientras tanto todas las sesiones
+        # siguen viendo el último snapshot bueno (no se borra ninguna caché global). No se
+        # espera al refresco: el panel consulta seguido hasta que se publique la versión nueva
         if st.button("🔄 Refrescar Datos", help="Forzar la actualización inmediata de la información"):
-            st.cache_data.clear() 
-            st.rerun()
+            publicacion = SERVICIO.sondeo(st.session_state['intervalo']).refrescar_ahora()
+            st.session_state['refresco_pedido'] = (st.session_state['intervalo'], publicacion.version)
 
 st.divider()
 
-datos_completos = obtener_datos()
+# --- RECARGA AUTOMÁTICA ---
+# Sólo el panel de datos se vuelve a ejecutar periódicamente y lee el snapshot compartido;
+# ya no bloqueamos un hilo por sesión con time.sleep ni re-ejecutamos el script completo.
+def panel_mercado(intervalo, vista_compacta=True):
+    metricas, velas, estados, senales, analitica = obtener_datos(intervalo)
+    color_sparkline = {True: COLOR_POSITIVE, False: COLOR_NEGATIVE}
+
+    # Reglas cumplidas por cada ticker (ya evaluadas para todo el universo en el refresco)
+    insignias = coincidencias_por_symbol(senales, MOTOR_REGLAS.insignias())
+    avisos = coincidencias_por_symbol(senales, MOTOR_REGLAS.alertas())
+
+    # Tickers con problemas: se informan sin ocultar el resto del tablero
+    problemas = resumen_estados(estados)
+    if problemas:
+        nombres = {symbol: nombre for nombre, symbol in TICKERS_PLANO.items()}
+        with st.expander(f"⚠️ {len(problemas)} de {len(TICKERS_PLANO)} activos con problemas de datos"):
+            st.dataframe(
+                pd.DataFrame(
+                    [(nombres.get(symbol, symbol), symbol, e.estado, e.detalle) for symbol, e in problemas.items()],
+                    columns=["Nombre", "Símbolo", "Estado", "Detalle"],
+                ),
+                hide_index=True,
+            )
+
+    if metricas.empty:
+        st.info("⏳ Conectando con el mercado (YFinance)... Si el error persiste, los tickers podrían estar caídos o tu conexión fallando.")
+    else:
+        # 1. Reorganización y Variación por Sector para Pestañas
+        # (índice ponderado por monto transado en el diario; promedio simple en intradía)
+        datos_por_categoria = {}
+        tabs_labels = []
 
-if not datos_completos:
-    st.info("⏳ Conectando con el mercado (YFinance)... Si el error persiste, los tickers podrían estar caídos o tu conexión fallando.")
-else:
-    # 1. Reorganización y Cálculo de Promedios para Pestañas
-    datos_por_categoria = {}
-    tabs_labels = []
-
-    for cat_name, tickers in TICKER_CATEGORIES.items():
-        datos_de_esta_cat = [
-            item for item in datos_completos if item['Nombre'] in tickers.keys()
-        ]
+        for cat_name, nombres in NOMBRES_POR_CATEGORIA.items():
+            presentes = metricas['nombre'].isin(nombres).to_numpy()
         
-        if datos_de_esta_cat:
-            variaciones = [item['Var'] for item in datos_de_esta_cat]
-            promedio_var = sum(variaciones) / len(variaciones)
+            if presentes.any():
+                promedio_var = None
+                if analitica is not None and cat_name in analitica.var_sectores.index:
+                    promedio_var = analitica.var_sectores[cat_name]
+                if promedio_var is None or pd.isna(promedio_var):
+                    promedio_var = metricas['var'][presentes].mean()
             
-            icono = " 🟢" if promedio_var > 0 else " 🔴"
+                icono = " 🟢" if promedio_var > 0 else " 🔴"
             
-            label_final = f"{cat_name}{icono} ({promedio_var:.2f}%)"
-            tabs_labels.append(label_final)
-            datos_por_categoria[label_final] = datos_de_esta_cat
-
-    # 2. Implementar las pestañas
-    if tabs_labels:
-        tabs = st.tabs(tabs_labels)
+                label_final = f"{cat_name}{icono} ({promedio_var:.2f}%)"
+                tabs_labels.append(label_final)
+                datos_por_categoria[label_final] = presentes
+
+        # 2. Implementar las pestañas
+        if tabs_labels:
+            tabs = st.tabs(tabs_labels + ([ETIQUETA_ANALITICA] if analitica is not None else []))
+            if analitica is not None:
+                with tabs[-1]:
+                    panel_analitica(analitica)
         
-        for i, label_final in enumerate(tabs_labels):
-            categoria = label_final.split(" ")[0]
+            for i, label_final in enumerate(tabs_labels):
+                categoria = label_final.split(" ")[0]
             
-            with tabs[i]:
-                datos_tab = datos_por_categoria[label_final]
+                with tabs[i]:
+                    # Se itera directamente sobre las filas de la tabla compartida
+                    datos_tab = metricas[datos_por_categoria[label_final]]
                 
-                columnas_por_fila = 3
-                cols = st.columns(columnas_por_fila)
+                    columnas_por_fila = 3
+                    cols = st.columns(columnas_por_fila)
                 
-                for index, item in enumerate(datos_tab):
-                    col_actual = cols[index % columnas_por_fila]
+                    for index, fila in enumerate(datos_tab.itertuples()):
+                        col_actual = cols[index % columnas_por_fila]
                     
-                    with col_actual:
-                        with st.container(border=True):
-                            
-                            # --- RESALTADO VISUAL DEL NOMBRE ---
-                            nombre_clase = "positive-name" if item['Positivo'] else "negative-name"
-                            st.markdown(
-                                f"<div class='{nombre_clase}'>{item['Nombre']}</div>", 
-                                unsafe_allow_html=True
-                            )
+                        with col_actual:
+                            with st.container(border=True):
                             
-                            # MOSTRAR EL VOLUMEN
-                            volumen = item.get('Volumen', 0)
-                            if volumen > 0:
-                                volumen_formateado = f"{volumen:,.0f}".replace(",", "_").replace(".", ",").replace("_", ".")
-                                st.markdown(
-                                    f"<div class='volume-subtitle'>Vol: {volumen_formateado}</div>", 
-                                    unsafe_allow_html=True
-                                )
-                                
-                            # --- INDICADORES DE ANÁLISIS TÉCNICO EN TEXTO ---
-                            indi_html = ""
+                                enviados = []  # textos de la tarjeta, para medir su payload
+
+                                # --- RESALTADO VISUAL DEL NOMBRE ---
+                                nombre_clase = "positive-name" if fila.positivo else "negative-name"
+                                enviados.append(f"<div class='{nombre_clase}'>{fila.nombre}</div>")
+                                st.markdown(enviados[-1], unsafe_allow_html=True)
                             
-                            # RSI (Sobrecampra > 70, Sobreventa < 30)
-                            if item['RSI_Hoy'] is not None:
-                                if item['RSI_Hoy'] > 70:
-                                    indi_html += f"<span class='indicator-box rsi-overbought'>RSI: Sobrecompra</span>"
-                                elif item['RSI_Hoy'] < 30:
-                                    indi_html += f"<span class='indicator-box rsi-oversold'>RSI: Sobreventa</span>"
-
-                            # MACD (Cruce de la Señal)
-                            # Cruce Alcista (MACD Histograma pasa de Negativo a Positivo)
-                            if item['MACD_Hist_Ayer'] < 0 and item['MACD_Hist_Hoy'] > 0:
-                                indi_html += f"<span class='indicator-box macd-buy'>MACD: Cruce Alcista</span>"
-                            # Cruce Bajista (MACD Histograma pasa de Positivo a Negativo)
-                            elif item['MACD_Hist_Ayer'] > 0 and item['MACD_Hist_Hoy'] < 0:
-                                indi_html += f"<span class='indicator-box macd-sell'>MACD: Cruce Bajista</span>"
+                                # MOSTRAR EL VOLUMEN
+                                volumen = fila.volume
+                                if volumen > 0:
+                                    volumen_formateado = f"{volumen:,.0f}".replace(",", "_").replace(".", ",").replace("_", ".")
+                                    enviados.append(f"<div class='volume-subtitle'>Vol: {volumen_formateado}</div>")
+                                    st.markdown(enviados[-1], unsafe_allow_html=True)
                                 
-                            if indi_html:
-                                st.markdown(indi_html, unsafe_allow_html=True)
+                                # --- INSIGNIAS DE LAS REGLAS (RSI, CRUCES MACD, SCREENERS PROPIOS) ---
+                                indi_html = "".join(
+                                    f"<span class='indicator-box senal-{regla.estilo}'>{regla.etiqueta}</span>"
+                                    for regla in insignias.get(fila.Index, [])
+                                )
+
+                                if indi_html:
+                                    enviados.append(indi_html)
+                                    st.markdown(indi_html, unsafe_allow_html=True)
                                 
                             
-                            # Métrica de precio y variación
-                            st.metric(
-                                label="Precio Actual",
-                                value=f"$ {item['Precio']:,.2f}",
-                                delta=f"{item['Var']:.2f}%",
-                                delta_color="normal" 
-                            )
-                            
-                            # Gráfico de Velas de Plotly
-                            if 'Figura_Plotly' in item:
-                                st.plotly_chart(
-                                    item['Figura_Plotly'], 
-                                    use_container_width=True, 
-                                    config={'displayModeBar': False} 
+                                # Métrica de precio y variación
+                                precio, variacion = f"$ {fila.precio:,.2f}", f"{fila.var:.2f}%"
+                                enviados += [precio, variacion]
+                                st.metric(
+                                    label="Precio Actual",
+                                    value=precio,
+                                    delta=variacion,
+                                    delta_color="normal" 
                                 )
 
-                            # Alerta de volatilidad
-                            if item['Alerta']:
-                                st.warning("🔥 ALTA VOLATILIDAD")
-                                clave_sesion = f"msg_{item['Nombre']}_{datetime.now().hour}"
-                                if clave_sesion not in st.session_state:
-                                     enviar_telegram(f"⚠️ *ALERTA*: {item['Nombre']} se mueve un {item['Var']:.2f}%")
-                                     st.session_state[clave_sesion] = True
-                                
-    # --- RECARGA AUTOMÁTICA ---
-    time.sleep(60) 
-    st.rerun()
+                                # Vista compacta: sparkline SVG precalculado en el snapshot
+                                if vista_compacta and fila.sparkline:
+                                    enviados.append(svg_sparkline(fila.sparkline, color_sparkline[fila.positivo]))
+                                    st.markdown(enviados[-1], unsafe_allow_html=True)
+
+                                # Gráfico de Velas de Plotly: siempre en la vista completa, y en la
+                                # compacta sólo si se expande la tarjeta (se construye o recupera de la caché aquí)
+                                bytes_figura = None
+                                velas_ticker = velas.get(fila.Index)
+                                if velas_ticker is not None and (
+                                    not vista_compacta
+                                    or st.toggle("📈 Gráfico completo", key=f"grafico_{fila.nombre}")
+                                ):
+                                    figura, bytes_figura = obtener_cache_figuras().obtener(
+                                        fila.Index, velas_ticker, st.session_state['theme'], CURRENT_THEME
+                                    )
+                                    with METRICAS.medir("plotly_chart"):
+                                        st.plotly_chart(
+                                            figura, 
+                                            use_container_width=True, 
+                                            key=f"figura_{fila.nombre}",
+                                            config={'displayModeBar': False} 
+                                        )
+
+                                # Reglas de alerta (p. ej. alta volatilidad)
+                                for regla in avisos.get(fila.Index, []):
+                                    enviados.append(regla.etiqueta)
+                                    st.warning(regla.etiqueta)
+
+                                registrar_payload(sum(len(t.encode()) for t in enviados), bytes_figura)
+
+
+ETIQUETA_ANALITICA = "🔗 Correlaciones"
+
+
+def panel_analitica(analitica):
+    st.markdown("**Índices sectoriales** (base 100, ponderados por monto transado)")
+    st.line_chart(analitica.indices)
+
+    # El mapa de calor crece con el cuadrado del universo: sólo se envía si se pide
+    if st.toggle("🌡️ Mapa de calor de correlaciones", key="grafico_correlacion"):
+        from bolsa.graficos import figura_correlacion
+        nombres = {symbol: nombre for nombre, symbol in TICKERS_PLANO.items()}
+        etiquetas = [nombres.get(symbol, symbol) for symbol in analitica.correlacion.index]
+        st.caption("Correlación de retornos diarios (logarítmicos) en la ventana móvil")
+        with METRICAS.medir("plotly_chart"):
+            st.plotly_chart(
+                figura_correlacion(analitica.correlacion, etiquetas, CURRENT_THEME),
+                use_container_width=True,
+                config={'displayModeBar': False}
+            )
+
+
+# Cada cuántos segundos consulta el panel mientras espera un refresco pedido con el botón
+CONSULTA_REFRESCO_PEDIDO = 2
+
+
+def panel_mercado_medido(intervalo, vista_compacta):
+    pedido = st.session_state.get('refresco_pedido')
+    if pedido is not None and (pedido[0] != intervalo or SERVICIO.sondeo(intervalo).ultimo().version > pedido[1]):
+        # Llegó el refresco pedido (o se cambió de intervalo): se vuelve a la cadencia normal
+        del st.session_state['refresco_pedido']
+        st.rerun()
+    with METRICAS.medir("render_panel"):
+        panel_mercado(intervalo, vista_compacta)
+
+
+intervalo_actual = st.session_state['intervalo']
+if st.session_state.get('refresco_pedido') is not None:
+    cadencia_panel = CONSULTA_REFRESCO_PEDIDO
+elif intervalo_actual == "1d":
+    cadencia_panel = SERVICIO.intervalo
+else:
+    cadencia_panel = SERVICIO.intervalo_intradia
+st.fragment(panel_mercado_medido, run_every=cadencia_panel)(intervalo_actual, st.session_state['vista_compacta'])
@@ -0,0 +1,143 @@
+"""Despachador de Telegram contra un servidor local que imita la API de Telegram."""
+import json
+import multiprocessing
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from bolsa.alertas import DespachadorTelegram, RegistroAlertas
+
+
+class ServidorTelegram:
+    """Responde `sendMessage` con los (status, cuerpo) de `respuestas` en orden, y luego 200.
+
+    `rechazar` es una subcadena: los mensajes que la contengan reciben 400, como un
+    Markdown que Telegram no puede interpretar.
+    """
+
+    def __init__(self, respuestas=(), rechazar=None):
+        self.respuestas = list(respuestas)
+        self.rechazar = rechazar
+        self.pedidos = []
+        self.aceptados = []
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_POST(self):
+                texto = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["text"]
+                servidor.pedidos.append(texto)
+                if servidor.respuestas:
+                    status, cuerpo = servidor.respuestas.pop(0)
+                elif servidor.rechazar is not None and servidor.rechazar in texto:
+                    status, cuerpo = 400, {"ok": False, "description": "Bad Request: can't parse entities"}
+                else:
+                    status, cuerpo = 200, {"ok": True, "result": {}}
+                if status == 200:
+                    servidor.aceptados.append(texto)
+                datos = json.dumps(cuerpo).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def log_message(self, *args):
+                pass
+
+        self.http = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+        self.url = f"http://127.0.0.1:{self.http.server_address[1]}"
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+
+    def detener(self):
+        self.http.shutdown()
+        self.http.server_close()
+
+
+@pytest.fixture
+def servidor():
+    creados = []
+
+    def crear(**kwargs):
+        creados.append(ServidorTelegram(**kwargs))
+        return creados[-1]
+
+    yield crear
+    for s in creados:
+        s.detener()
+
+
+def _despachador(url, registro=None, **kwargs):
+    opciones = dict(ventana_agrupacion=0.3, intervalo_minimo=0.0, max_reintentos=3, espera_base=0.01)
+    opciones.update(kwargs)
+    return DespachadorTelegram("token", "chat", registro=registro, url_base=url, **opciones).iniciar()
+
+
+def test_agrupa_las_alertas_de_la_ventana_en_un_mensaje(servidor):
+    stub = servidor()
+    despachador = _despachador(stub.url)
+    for i in range(3):
+        assert despachador.encolar(f"alerta {i}")
+    assert despachador.esperar_vacia(timeout=10)
+
+    assert stub.pedidos == ["alerta 0\nalerta 1\nalerta 2"]
+    assert despachador.enviados == 3
+
+
+def test_reintenta_ante_429_y_5xx(servidor):
+    stub = servidor(respuestas=[
+        (429, {"ok": False, "parameters": {"retry_after": 0.01}}),
+        (502, {"ok": False}),
+    ])
+    despachador = _despachador(stub.url)
+    despachador.encolar("alerta")
+    assert despachador.esperar_vacia(timeout=10)
+
+    assert stub.pedidos == ["alerta"] * 3
+    assert stub.aceptados == ["alerta"]
+    assert despachador.enviados == 1
+
+
+def test_fallo_transitorio_libera_la_clave(servidor, tmp_path):
+    stub = servidor(respuestas=[(503, {"ok": False})] * 2)
+    registro = RegistroAlertas(str(tmp_path / "alertas.db"))
+    despachador = _despachador(stub.url, registro=registro, max_reintentos=1)
+    despachador.encolar("alerta", clave="regla_X_hora")
+    assert despachador.esperar_vacia(timeout=10)
+
+    assert despachador.fallidos == 1
+    # Agotados los reintentos, la alerta puede volver a reclamarse en el próximo refresco
+    assert registro.reclamar("regla_X_hora")
+
+
+def test_rechazo_4xx_no_arrastra_al_grupo_ni_se_reintenta(servidor, tmp_path):
+    stub = servidor(rechazar="mal_formado")
+    registro = RegistroAlertas(str(tmp_path / "alertas.db"))
+    despachador = _despachador(stub.url, registro=registro)
+    despachador.encolar("*Alerta* buena", clave="buena")
+    despachador.encolar("*Alerta* mal_formado", clave="mala")
+    assert despachador.esperar_vacia(timeout=10)
+
+    assert stub.aceptados == ["*Alerta* buena"]
+    assert despachador.enviados == 1 and despachador.fallidos == 1
+    # La rechazada queda reclamada: no se vuelve a enviar en cada refresco
+    assert not registro.reclamar("mala")
+    assert not despachador.encolar("*Alerta* mal_formado", clave="mala")
+
+
+def _reclamar(ruta, clave, resultados):
+    resultados.put(RegistroAlertas(ruta).reclamar(clave))
+
+
+def test_deduplicacion_entre_procesos(tmp_path):
+    ruta = str(tmp_path / "alertas.db")
+    RegistroAlertas(ruta)
+    contexto = multiprocessing.get_context("spawn")
+    resultados = contexto.Queue()
+    procesos = [contexto.Process(target=_reclamar, args=(ruta, "regla_X_hora", resultados)) for _ in range(4)]
+    for p in procesos:
+        p.start()
+    for p in procesos:
+        p.join(timeout=30)
+
+    assert sorted(resultados.get(timeout=5) for _ in procesos) == [False, False, False, True]
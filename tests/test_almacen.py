@@ -0,0 +1,156 @@
+"""Almacén SQLite de barras diarias y su actualización incremental."""
+import numpy as np
+import pandas as pd
+
+from bolsa.almacen import AlmacenBarras, actualizar_historial
+from bolsa.descarga import ESTADO_ERROR, ESTADO_OK, EstadoTicker, ResultadoDescarga
+
+
+def _descarga(codigos, fechas, semilla=0):
+    """Frame ancho con el formato de yf.download para `codigos` en `fechas`."""
+    rng = np.random.default_rng(semilla)
+    fechas = pd.DatetimeIndex(fechas, name="Date")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (len(fechas), len(codigos))), axis=0))
+    campos = {
+        "Close": close, "High": close * 1.01, "Low": close * 0.99, "Open": close,
+        "Volume": rng.uniform(1e5, 1e6, close.shape),
+    }
+    df = pd.concat({c: pd.DataFrame(v, index=fechas, columns=codigos) for c, v in campos.items()}, axis=1)
+    df.columns.names = ["Price", "Ticker"]
+    return df
+
+
+class MercadoSimulado:
+    """Descargador con la firma de `descargar_por_bloques` sobre un calendario propio.
+
+    `hasta` es la cantidad de barras publicadas hasta ahora; `fallan` son tickers cuya
+    descarga falla. Como la fuente replay, sus fechas no tienen relación con el reloj del sistema.
+    """
+
+    def __init__(self, codigos, fechas, fallan=()):
+        self.df = _descarga(codigos, fechas)
+        self.hasta = len(fechas)
+        self.fallan = set(fallan)
+        self.llamadas = []
+
+    def __call__(self, codigos, start=None, period=None, **parametros):
+        self.llamadas.append((sorted(codigos), start, period))
+        df = self.df.iloc[:self.hasta]
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        pedidos = [c for c in codigos if c not in self.fallan]
+        df = df.loc[:, df.columns.get_level_values("Ticker").isin(pedidos)]
+        estados = {c: EstadoTicker(ESTADO_ERROR if c in self.fallan else ESTADO_OK, "", 1) for c in codigos}
+        return ResultadoDescarga(df, estados)
+
+
+def _comparar(leido, esperado):
+    pd.testing.assert_frame_equal(
+        leido.sort_index(axis=1), esperado.sort_index(axis=1),
+        check_names=False, check_freq=False, check_index_type=False,
+    )
+
+
+def test_guardar_y_leer_conserva_el_formato_de_yf_download(tmp_path):
+    fechas = pd.bdate_range("2026-09-01", periods=30)
+    df = _descarga(["A.SN", "CLP=X"], fechas)
+    # Un feriado local: la acción no tiene barra ese día y no se guarda una fila vacía
+    df.loc[fechas[10], (slice(None), "A.SN")] = np.nan
+    almacen = AlmacenBarras(str(tmp_path / "barras.sqlite"))
+
+    assert almacen.guardar(df) == 2 * 30 - 1
+    _comparar(almacen.leer(["A.SN", "CLP=X"]), df)
+    assert almacen.ultimas_fechas(["A.SN", "CLP=X", "NUEVO.SN"]) == {"A.SN": fechas[-1], "CLP=X": fechas[-1]}
+
+
+def test_actualizacion_incremental_pide_solo_las_barras_nuevas(tmp_path):
+    fechas = pd.bdate_range("2026-07-01", periods=60)
+    mercado = MercadoSimulado(["A.SN", "B.SN", "C.SN"], fechas)
+    almacen = AlmacenBarras(str(tmp_path / "barras.sqlite"))
+
+    mercado.hasta = 40
+    actualizar_historial(almacen, ["A.SN", "B.SN"], descargador=mercado)
+    assert mercado.llamadas == [(["A.SN", "B.SN"], None, "60d")]
+
+    mercado.llamadas.clear()
+    mercado.hasta = 45
+    ventana, estados = actualizar_historial(almacen, ["A.SN", "B.SN", "C.SN"], descargador=mercado)
+    # El ticker nuevo se descarga completo; los conocidos, juntos, desde su última barra (incluida)
+    assert mercado.llamadas == [
+        (["C.SN"], None, "60d"),
+        (["A.SN", "B.SN"], fechas[39].strftime("%Y-%m-%d"), None),
+    ]
+    assert set(estados) == {"A.SN", "B.SN", "C.SN"}
+    publicadas = mercado.df.iloc[:45]
+    _comparar(ventana, publicadas[publicadas.index >= fechas[44] - pd.Timedelta(days=60)])
+    assert len(almacen.leer(["A.SN", "B.SN", "C.SN"])) == 45
+
+
+def test_revisar_la_ultima_barra_la_reemplaza(tmp_path):
+    fechas = pd.bdate_range("2026-09-01", periods=20)
+    df = _descarga(["A.SN"], fechas)
+    almacen = AlmacenBarras(str(tmp_path / "barras.sqlite"))
+    almacen.guardar(df.iloc[:-1])
+
+    # La vela del día en curso llega varias veces: la última versión es la que queda
+    provisoria = df.iloc[-1:].copy()
+    provisoria.loc[:, "Close"] = provisoria["Close"].to_numpy() * 0.98
+    provisoria.loc[:, "Volume"] = provisoria["Volume"].to_numpy() / 3
+    almacen.guardar(provisoria)
+    almacen.guardar(df.iloc[-1:])
+
+    leido = almacen.leer(["A.SN"])
+    assert len(leido) == 20
+    _comparar(leido, df)
+
+
+def test_la_ventana_recorta_las_barras_viejas_sin_borrarlas(tmp_path):
+    fechas = pd.bdate_range("2026-01-01", periods=120)
+    df = _descarga(["A.SN", "B.SN"], fechas)
+    # B.SN dejó de cotizar hace una semana: la ventana se cuenta desde la barra más reciente de todas
+    df.loc[fechas[-5:], (slice(None), "B.SN")] = np.nan
+    almacen = AlmacenBarras(str(tmp_path / "barras.sqlite"))
+    almacen.guardar(df)
+
+    ventana = almacen.leer_ventana(["A.SN", "B.SN"], 30)
+    desde = fechas[-1] - pd.Timedelta(days=30)
+    _comparar(ventana, df[df.index >= desde])
+    _comparar(almacen.leer(["A.SN", "B.SN"], desde=desde), ventana)
+    assert len(almacen.leer(["A.SN", "B.SN"])) == 120
+    assert almacen.leer_ventana(["NUEVO.SN"], 30).empty
+
+
+def test_la_ventana_se_ancla_a_la_ultima_barra_y_no_al_reloj(tmp_path):
+    # Un calendario que va años por delante del reloj real, como el replay acelerado
+    fechas = pd.bdate_range("2031-01-01", periods=200)
+    codigos = ["A.SN", "B.SN"]
+    mercado = MercadoSimulado(codigos, fechas)
+    almacen = AlmacenBarras(str(tmp_path / "barras.sqlite"))
+
+    largos = []
+    for hasta in range(60, 201, 20):
+        mercado.hasta = hasta
+        ventana, _ = actualizar_historial(almacen, codigos, dias_ventana=60, descargador=mercado)
+        assert ventana.index[-1] == fechas[hasta - 1]
+        assert ventana.index[0] >= fechas[hasta - 1] - pd.Timedelta(days=60)
+        largos.append(len(ventana))
+
+    assert max(largos) <= 45
+    # El almacén conserva todo; sólo la ventana leída queda acotada
+    assert len(almacen.leer(codigos)) == 200
+
+
+def test_un_ticker_que_falla_conserva_su_historia_local(tmp_path):
+    fechas = pd.bdate_range("2026-09-01", periods=40)
+    mercado = MercadoSimulado(["A.SN", "B.SN"], fechas)
+    almacen = AlmacenBarras(str(tmp_path / "barras.sqlite"))
+    mercado.hasta = 35
+    actualizar_historial(almacen, ["A.SN", "B.SN"], descargador=mercado)
+
+    mercado.hasta, mercado.fallan = 40, {"B.SN"}
+    ventana, estados = actualizar_historial(almacen, ["A.SN", "B.SN"], descargador=mercado)
+
+    assert estados["B.SN"].estado == ESTADO_ERROR
+    assert ventana["Close"]["A.SN"].last_valid_index() == fechas[39]
+    assert ventana["Close"]["B.SN"].last_valid_index() == fechas[34]
+    _comparar(ventana.xs("B.SN", axis=1, level=1).dropna(), mercado.df.xs("B.SN", axis=1, level=1).iloc[:35])
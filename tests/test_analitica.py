@@ -0,0 +1,76 @@
+"""Índices sectoriales y correlaciones incrementales frente a los feriados de cada bolsa."""
+import numpy as np
+import pandas as pd
+
+from bolsa.analitica import AnaliticaIncremental
+
+CATEGORIAS = {
+    "MACRO": {"USD/CLP": "CLP=X", "Cobre": "HG=F"},
+    "BANCA": {"Banco de Chile": "CHILE.SN", "Banco Bci": "BCI.SN"},
+}
+LOCALES = ["CHILE.SN", "BCI.SN"]
+
+
+def _mercado(n=40, feriados=(), semilla=0):
+    """Cierres y volúmenes anchos; en `feriados` (posiciones) las acciones locales no tienen barra."""
+    rng = np.random.default_rng(semilla)
+    simbolos = [s for cat in CATEGORIAS.values() for s in cat.values()]
+    fechas = pd.bdate_range(end="2026-10-16", periods=n, name="Date")
+    close = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n, len(simbolos))), axis=0)),
+                         index=fechas, columns=simbolos)
+    volume = pd.DataFrame(rng.uniform(1e5, 1e6, (n, len(simbolos))), index=fechas, columns=simbolos)
+    volume[["CLP=X"]] = np.nan
+    for i in feriados:
+        close.iloc[i, close.columns.get_indexer(LOCALES)] = np.nan
+        volume.iloc[i, volume.columns.get_indexer(LOCALES)] = np.nan
+    return close, volume
+
+
+def test_feriado_local_en_la_ultima_fila_conserva_la_variacion_del_sector():
+    close, volume = _mercado(feriados=[-1])
+    resultado = AnaliticaIncremental(CATEGORIAS).actualizar(close, volume)
+
+    # La variación de BANCA es la de la última rueda local, no 0.0 por la fila del feriado
+    ultimos = (close[LOCALES].iloc[-2] / close[LOCALES].iloc[-3] - 1) * 100
+    assert ultimos.min() <= resultado.var_sectores["BANCA"] <= ultimos.max()
+    assert resultado.var_sectores["BANCA"] != 0.0
+
+
+def test_el_retorno_del_hueco_no_se_pierde_del_indice():
+    close, volume = _mercado(n=25, feriados=[10, 11, 20])
+    solo_chile = {"BANCA": {"Banco de Chile": "CHILE.SN"}}
+    resultado = AnaliticaIncremental(solo_chile).actualizar(close, volume)
+
+    indice = resultado.indices["BANCA"]
+    serie = close["CHILE.SN"].reindex(indice.index)
+    assert np.isclose(indice.iloc[-1] / indice.iloc[0], serie.iloc[-1] / serie.iloc[0])
+    # La rueda siguiente al feriado trae el movimiento de todo el hueco
+    fechas = close.index
+    esperado = close["CHILE.SN"].iloc[12] / close["CHILE.SN"].iloc[9]
+    assert np.isclose(indice[fechas[12]] / indice[fechas[11]], esperado)
+
+
+def test_correlacion_con_retornos_contra_el_ultimo_cierre_valido():
+    close, volume = _mercado(n=40, feriados=[15, 25, 26, 39])
+    resultado = AnaliticaIncremental(CATEGORIAS).actualizar(close, volume)
+
+    retornos = np.log(close.ffill()).diff().where(close.notna())
+    esperado = retornos.iloc[-30:].corr(min_periods=10).loc[resultado.correlacion.index, resultado.correlacion.columns]
+    np.testing.assert_allclose(resultado.correlacion.to_numpy(), esperado.to_numpy(), atol=1e-9)
+
+
+def test_revisar_la_ultima_barra_equivale_a_recibirla_una_vez():
+    close, volume = _mercado(n=45, feriados=[30, 31, 38])
+    revisada, directa = AnaliticaIncremental(CATEGORIAS), AnaliticaIncremental(CATEGORIAS)
+    for fin in range(35, 46):
+        # La vela en curso se revisa antes de cerrar, y a veces la de los locales llega tarde
+        provisorio = close.iloc[:fin].copy()
+        provisorio.iloc[-1] *= 1.01
+        provisorio.iloc[-1, provisorio.columns.get_indexer(LOCALES)] = np.nan
+        revisada.actualizar(provisorio, volume.iloc[:fin])
+        resultado = revisada.actualizar(close.iloc[:fin], volume.iloc[:fin])
+        esperado = directa.actualizar(close.iloc[:fin], volume.iloc[:fin])
+
+    pd.testing.assert_series_equal(resultado.var_sectores, esperado.var_sectores)
+    pd.testing.assert_frame_equal(resultado.indices, esperado.indices)
+    np.testing.assert_allclose(resultado.correlacion.to_numpy(), esperado.correlacion.to_numpy(), atol=1e-9)
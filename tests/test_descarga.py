@@ -0,0 +1,88 @@
+"""Descarga por bloques: plazos por bloque, reintentos y estados por ticker."""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from bolsa.descarga import (
+    ESTADO_ERROR, ESTADO_OK, ESTADO_SIN_DATOS, ESTADO_TIMEOUT, descargar_por_bloques,
+)
+
+
+def _frame(codigos):
+    fechas = pd.bdate_range(end="2026-10-16", periods=3, name="Date")
+    columnas = pd.MultiIndex.from_product([["Close", "Volume"], codigos], names=["Price", "Ticker"])
+    return pd.DataFrame(np.ones((len(fechas), len(columnas))), index=fechas, columns=columnas)
+
+
+class DescargaLenta:
+    """Stub de yf.download que tarda `demora` segundos por llamada; `colgados` nunca responden."""
+
+    def __init__(self, demora=0.0, colgados=(), fallan=(), vacios=()):
+        self.demora = demora
+        self.colgados, self.fallan, self.vacios = set(colgados), set(fallan), set(vacios)
+        self.soltar = threading.Event()
+        self.llamadas = []
+
+    def __call__(self, bloque, **parametros):
+        self.llamadas.append(list(bloque))
+        if self.colgados & set(bloque):
+            self.soltar.wait(10)
+        time.sleep(self.demora)
+        if self.fallan & set(bloque):
+            raise RuntimeError("HTTP 500")
+        return _frame([c for c in bloque if c not in self.vacios])
+
+
+def test_bloques_en_cola_no_consumen_el_plazo():
+    # 8 bloques, 2 hilos: 4 tandas de 0.3 s. Cada bloque cabe en el plazo de 0.5 s,
+    # aunque la ronda completa tome 1.2 s
+    codigos = [f"T{i}.SN" for i in range(8)]
+    descarga = DescargaLenta(demora=0.3)
+    resultado = descargar_por_bloques(codigos, descargar=descarga, tamano_bloque=1, max_hilos=2,
+                                      reintentos=0, timeout=0.5)
+
+    assert {e.estado for e in resultado.estados.values()} == {ESTADO_OK}
+    assert sorted(resultado.datos["Close"].columns) == codigos
+
+
+def test_bloque_colgado_vence_y_se_reintenta_partido():
+    descarga = DescargaLenta(colgados=["MALO.SN"])
+    try:
+        resultado = descargar_por_bloques(["A.SN", "MALO.SN", "B.SN", "C.SN"], descargar=descarga,
+                                          tamano_bloque=2, max_hilos=4, reintentos=1, timeout=0.3)
+    finally:
+        descarga.soltar.set()
+
+    estados = resultado.estados
+    assert estados["MALO.SN"].estado == ESTADO_TIMEOUT and estados["MALO.SN"].intentos == 2
+    # El vecino del bloque colgado se recupera al partir el bloque en el reintento
+    assert estados["A.SN"].estado == ESTADO_OK and estados["A.SN"].intentos == 2
+    assert estados["B.SN"].estado == ESTADO_OK and estados["B.SN"].intentos == 1
+
+
+def test_hilos_ocupados_no_dejan_la_ronda_colgada():
+    # Un único hilo, tomado por un bloque que nunca responde: el siguiente no llega a
+    # empezar y debe vencer igual en lugar de esperar para siempre
+    descarga = DescargaLenta(colgados=["MALO.SN"])
+    inicio = time.monotonic()
+    try:
+        resultado = descargar_por_bloques(["MALO.SN", "B.SN"], descargar=descarga, tamano_bloque=1,
+                                          max_hilos=1, reintentos=0, timeout=0.2)
+    finally:
+        descarga.soltar.set()
+
+    assert time.monotonic() - inicio < 2
+    assert {e.estado for e in resultado.estados.values()} == {ESTADO_TIMEOUT}
+
+
+def test_errores_y_tickers_sin_datos():
+    descarga = DescargaLenta(fallan=["ROTO.SN"], vacios=["VACIO.SN"])
+    resultado = descargar_por_bloques(["A.SN", "ROTO.SN", "VACIO.SN"], descargar=descarga,
+                                      tamano_bloque=1, reintentos=1)
+
+    assert resultado.estados["A.SN"].estado == ESTADO_OK
+    assert resultado.estados["ROTO.SN"].estado == ESTADO_ERROR
+    assert resultado.estados["ROTO.SN"].intentos == 2
+    assert resultado.estados["VACIO.SN"].estado == ESTADO_SIN_DATOS
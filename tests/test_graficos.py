@@ -0,0 +1,68 @@
+"""Caché de figuras: una construcción y una serialización por figura, no por dibujo."""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from bolsa import graficos
+from bolsa.graficos import CacheFiguras
+from bolsa.metricas import METRICAS
+from bolsa.snapshot import VelasTicker
+
+PALETA = {
+    "BACKGROUND": "#0d1117", "CARD_BG": "#161b22", "BORDER": "#30363d",
+    "TEXT_NEUTRAL": "#e0e0e0", "POSITIVE": "#00b894", "NEGATIVE": "#d63031",
+    "ACCENT": "#58a6ff",
+}
+COLUMNAS = ["open", "high", "low", "close", "volume", "SMA", "Upper", "Lower", "RSI", "MACD", "Signal_Line", "MACD_Hist"]
+
+
+def _velas(n=20, semilla=0):
+    rng = np.random.default_rng(semilla)
+    fechas = pd.bdate_range(end="2026-10-16", periods=n)
+    return VelasTicker.desde_arrays(fechas, COLUMNAS, rng.uniform(1, 100, (n, len(COLUMNAS))))
+
+
+def test_tamano_del_json_se_mide_una_vez_al_construir(monkeypatch):
+    serializaciones = []
+    original = go.Figure.to_json
+
+    def to_json(self, *args, **kwargs):
+        serializaciones.append(1)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(go.Figure, "to_json", to_json)
+    monkeypatch.setattr(METRICAS, "habilitado", True)
+    cache = CacheFiguras()
+    velas = _velas()
+
+    primera = cache.obtener("A.SN", velas, "Dark", PALETA)
+    for _ in range(5):
+        assert cache.obtener("A.SN", velas, "Dark", PALETA) is primera
+
+    assert len(serializaciones) == 1
+    assert primera.bytes_json == len(original(primera.figura))
+    assert (cache.aciertos, cache.fallos) == (5, 1)
+
+
+def _no_serializar(self, *args, **kwargs):
+    raise AssertionError("la figura no debe serializarse con las métricas deshabilitadas")
+
+
+def test_sin_metricas_no_se_serializa(monkeypatch):
+    monkeypatch.setattr(METRICAS, "habilitado", False)
+    monkeypatch.setattr(go.Figure, "to_json", _no_serializar)
+    entrada = CacheFiguras().obtener("A.SN", _velas(), "Dark", PALETA)
+    assert entrada.bytes_json is None and isinstance(entrada.figura, go.Figure)
+
+
+def test_descarta_las_figuras_menos_usadas(monkeypatch):
+    construidas = []
+    monkeypatch.setattr(graficos, "construir_figura", lambda df, paleta: construidas.append(1) or go.Figure())
+    cache = CacheFiguras(max_entradas=2)
+    velas = {s: _velas(semilla=i) for i, s in enumerate(["A.SN", "B.SN", "C.SN"])}
+
+    for symbol in ["A.SN", "B.SN", "A.SN", "C.SN", "A.SN", "B.SN"]:
+        cache.obtener(symbol, velas[symbol], "Dark", PALETA)
+
+    # B.SN sale al entrar C.SN (A.SN se acababa de usar) y se vuelve a construir al final
+    assert len(construidas) == 4
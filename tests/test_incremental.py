@@ -0,0 +1,50 @@
+"""Las calculadoras incrementales coinciden con las funciones `calcular_*` por lotes."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from bolsa.incremental import CalculadoraIndicadores
+from bolsa.indicadores import calcular_bollinger_bands, calcular_macd, calcular_rsi
+
+CAMPOS = ['SMA', 'STD', 'Upper', 'Lower', 'RSI', 'EMA_Fast', 'EMA_Slow', 'MACD', 'Signal_Line', 'MACD_Hist']
+
+
+def _por_lotes(cierres):
+    df = pd.DataFrame({'close': cierres})
+    return calcular_macd(calcular_rsi(calcular_bollinger_bands(df)))[CAMPOS].to_numpy()
+
+
+def _cierres(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+
+
+def test_coincide_con_lotes_barra_a_barra():
+    cierres = _cierres(3000)
+    calc = CalculadoraIndicadores()
+    incremental = np.array([[calc.actualizar(i, c)[campo] for campo in CAMPOS] for i, c in enumerate(cierres)])
+    esperado = _por_lotes(cierres)
+
+    np.testing.assert_array_equal(np.isnan(incremental), np.isnan(esperado))
+    np.testing.assert_allclose(incremental, esperado, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def test_revisar_la_ultima_barra_equivale_a_recibirla_una_vez():
+    cierres = _cierres(300, semilla=1)
+    rng = np.random.default_rng(2)
+    calc = CalculadoraIndicadores()
+    for i, c in enumerate(cierres):
+        # La vela en curso se revisa varias veces antes de su cierre definitivo
+        for provisorio in c * (1 + rng.normal(0, 0.01, 3)):
+            calc.actualizar(i, provisorio)
+        resultado = calc.actualizar(i, c)
+
+    esperado = _por_lotes(cierres)[-1]
+    np.testing.assert_allclose([resultado[campo] for campo in CAMPOS], esperado, rtol=1e-9, atol=1e-9)
+
+
+def test_rechaza_barras_fuera_de_orden():
+    calc = CalculadoraIndicadores()
+    calc.actualizar(2, 100.0)
+    with pytest.raises(ValueError):
+        calc.actualizar(1, 101.0)
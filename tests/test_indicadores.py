@@ -0,0 +1,85 @@
+"""El motor vectorizado da, ticker a ticker, lo mismo que las funciones `calcular_*` del bucle original."""
+import numpy as np
+import pandas as pd
+
+from bolsa.indicadores import (
+    RENOMBRE_CAMPOS, calcular_bollinger_bands, calcular_indicadores_universo, calcular_macd, calcular_rsi,
+    resumen_ultimas_barras, ultimas_velas,
+)
+
+UMBRAL = 2.5
+
+
+def _descarga(n=60, semilla=0):
+    """Frame ancho como el de yf.download, con feriados locales, un ticker corto y uno sin historia suficiente."""
+    rng = np.random.default_rng(semilla)
+    tickers = ["CLP=X", "HG=F", "CHILE.SN", "BCI.SN", "NUEVO.SN", "RECIEN.SN"]
+    fechas = pd.bdate_range(end="2026-10-16", periods=n, name="Date")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (n, len(tickers))), axis=0))
+    campos = {
+        "Close": close,
+        "High": close * (1 + rng.uniform(0, 0.01, close.shape)),
+        "Low": close * (1 - rng.uniform(0, 0.01, close.shape)),
+        "Open": close * (1 + rng.normal(0, 0.005, close.shape)),
+        "Volume": rng.uniform(1e5, 1e6, close.shape),
+    }
+    mascara = np.zeros(close.shape, dtype=bool)
+    locales = [i for i, t in enumerate(tickers) if t.endswith(".SN")]
+    for fila in rng.choice(n, size=5, replace=False):
+        mascara[fila, locales] = True   # feriados de la bolsa local
+    mascara[-1, locales] = True          # mañana: sólo los extranjeros tienen la barra de hoy
+    mascara[:n - 25, tickers.index("NUEVO.SN")] = True    # historia corta
+    mascara[:n - 10, tickers.index("RECIEN.SN")] = True   # sin dos barras completas
+    df = pd.concat(
+        {campo: pd.DataFrame(np.where(mascara, np.nan, arr), index=fechas, columns=tickers) for campo, arr in campos.items()},
+        axis=1,
+    )
+    df.columns.names = ["Price", "Ticker"]
+    return df
+
+
+def _por_ticker(df_hist, symbol):
+    """El camino del bucle original: recorte del ticker, renombre y `calcular_*`."""
+    df = df_hist.xs(symbol, axis=1, level=1).rename(columns=RENOMBRE_CAMPOS)
+    return calcular_macd(calcular_rsi(calcular_bollinger_bands(df)))
+
+
+def test_indicadores_iguales_a_las_funciones_por_ticker():
+    df_hist = _descarga()
+    indicadores = calcular_indicadores_universo(df_hist)
+    for symbol in df_hist["Close"].columns:
+        esperado = _por_ticker(df_hist, symbol)
+        obtenido = indicadores.xs(symbol, axis=1, level=1)[esperado.columns]
+        pd.testing.assert_frame_equal(obtenido, esperado, check_names=False, check_freq=False)
+
+
+def test_resumen_igual_a_dropna_iloc():
+    df_hist = _descarga(semilla=1)
+    resumen = resumen_ultimas_barras(calcular_indicadores_universo(df_hist), UMBRAL)
+
+    esperados = {}
+    for symbol in df_hist["Close"].columns:
+        velas = _por_ticker(df_hist, symbol).dropna().tail(20)
+        if len(velas) < 2:
+            continue
+        hoy, ayer = velas.iloc[-1], velas.iloc[-2]
+        var = (hoy['close'] - ayer['close']) / ayer['close'] * 100
+        esperados[symbol] = {
+            'Precio': hoy['close'], 'Var': var, 'Alerta': abs(var) >= UMBRAL, 'Volumen': hoy['volume'],
+            'RSI_Hoy': hoy['RSI'], 'MACD_Hist_Hoy': hoy['MACD_Hist'], 'MACD_Hist_Ayer': ayer['MACD_Hist'],
+            'Vol_Prom_20': velas['volume'].mean(),
+        }
+
+    assert "RECIEN.SN" not in resumen.index
+    assert list(resumen.index) == list(esperados)
+    esperado = pd.DataFrame.from_dict(esperados, orient='index')
+    pd.testing.assert_frame_equal(resumen[esperado.columns], esperado, check_dtype=False, check_names=False)
+
+
+def test_ultimas_velas_igual_a_dropna_tail():
+    df_hist = _descarga(semilla=2)
+    indicadores = calcular_indicadores_universo(df_hist)
+    for symbol in ["CHILE.SN", "NUEVO.SN", "HG=F"]:
+        esperado = _por_ticker(df_hist, symbol).dropna().tail(20)
+        obtenido = ultimas_velas(indicadores, symbol, n=20)[esperado.columns]
+        pd.testing.assert_frame_equal(obtenido, esperado, check_names=False, check_freq=False)
@@ -0,0 +1,122 @@
+"""Buffers circulares, revisión de barras y remuestreo intradía frente a pandas."""
+import numpy as np
+import pandas as pd
+
+from bolsa.descarga import ResultadoDescarga
+from bolsa.indicadores import calcular_bollinger_bands, calcular_macd, calcular_rsi
+from bolsa.intradia import (
+    CAMPOS_INDICADORES, CAMPOS_OHLCV, BufferCircular, MonitorIntradia, actualizar_intradia,
+)
+
+INICIO = int(pd.Timestamp("2026-10-16 12:30", tz="UTC").timestamp())
+
+
+def _barras_1m(n, semilla=0):
+    """DataFrame (ts, open, high, low, close, volume) de `n` barras de 1 minuto consecutivas."""
+    rng = np.random.default_rng(semilla)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    apertura = np.concatenate([[close[0]], close[:-1]])
+    return pd.DataFrame({
+        'ts': INICIO + 60 * np.arange(n),
+        'open': apertura,
+        'high': np.maximum(apertura, close) * (1 + rng.uniform(0, 0.001, n)),
+        'low': np.minimum(apertura, close) * (1 - rng.uniform(0, 0.001, n)),
+        'close': close,
+        'volume': rng.integers(100, 10_000, n).astype(float),
+    })
+
+
+def _alimentar(monitor, barras, symbol="AAA.SN"):
+    for b in barras.itertuples(index=False):
+        monitor.agregar(symbol, int(b.ts), b.open, b.high, b.low, b.close, b.volume)
+
+
+def _esperado(barras, segundos):
+    """Remuestreo con pandas + `calcular_*` sobre las velas remuestreadas."""
+    df = barras.set_index(pd.to_datetime(barras['ts'], unit='s', utc=True)).drop(columns='ts')
+    velas = df.resample(f"{segundos}s").agg(
+        {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+    ).dropna()
+    return calcular_macd(calcular_rsi(calcular_bollinger_bands(velas)))
+
+
+def _serie(monitor, intervalo, symbol="AAA.SN"):
+    buffer = monitor.series[symbol][intervalo].buffer
+    ts, datos = buffer.ultimas(buffer.n)
+    indice = pd.to_datetime(ts, unit='s', utc=True)
+    return pd.DataFrame(datos, index=indice, columns=buffer.columnas)
+
+
+def test_buffer_circular_conserva_las_ultimas_filas_en_orden():
+    buffer = BufferCircular(5, ['x'])
+    for i in range(8):
+        buffer.agregar(i, [i * 10.0])
+    ts, datos = buffer.ultimas(10)
+    assert len(buffer) == 5 and buffer.ultimo_ts == 7
+    assert list(ts) == [3, 4, 5, 6, 7]
+    assert list(datos[:, 0]) == [30.0, 40.0, 50.0, 60.0, 70.0]
+
+
+def test_remuestreo_e_indicadores_iguales_a_pandas():
+    barras = _barras_1m(300)
+    monitor = MonitorIntradia(capacidad=1000)
+    _alimentar(monitor, barras)
+
+    for intervalo, segundos in (("1m", 60), ("5m", 300), ("15m", 900), ("60m", 3600)):
+        esperado = _esperado(barras, segundos)
+        obtenido = _serie(monitor, intervalo)
+        pd.testing.assert_frame_equal(
+            obtenido[CAMPOS_OHLCV + CAMPOS_INDICADORES], esperado[CAMPOS_OHLCV + CAMPOS_INDICADORES],
+            check_names=False, check_freq=False, check_index_type=False, rtol=1e-9,
+        )
+
+
+def test_buffer_lleno_sigue_calculando_sobre_toda_la_historia():
+    barras = _barras_1m(400, semilla=1)
+    monitor = MonitorIntradia(capacidad=50)
+    _alimentar(monitor, barras)
+
+    obtenido = _serie(monitor, "1m")
+    esperado = _esperado(barras, 60).iloc[-50:]
+    assert len(obtenido) == 50
+    np.testing.assert_allclose(obtenido[CAMPOS_INDICADORES].to_numpy(), esperado[CAMPOS_INDICADORES].to_numpy())
+    velas = monitor.series["AAA.SN"]["1m"].velas(20)
+    np.testing.assert_allclose(velas.columna('close'), barras['close'].to_numpy()[-20:])
+
+
+def test_revisar_la_barra_en_curso_equivale_a_recibirla_una_vez():
+    barras = _barras_1m(120, semilla=2)
+    revisado, directo = MonitorIntradia(), MonitorIntradia()
+    _alimentar(directo, barras)
+    rng = np.random.default_rng(3)
+    for b in barras.itertuples(index=False):
+        # Yahoo entrega la barra del minuto en curso varias veces antes de cerrarla: el
+        # rango sólo se amplía y el volumen sólo crece hasta llegar a la barra final
+        for avance in (0.3, 0.7):
+            close = b.low + (b.high - b.low) * rng.uniform()
+            revisado.agregar("AAA.SN", int(b.ts), b.open, max(b.open, close), min(b.open, close), close,
+                             b.volume * avance)
+        revisado.agregar("AAA.SN", int(b.ts), b.open, b.high, b.low, b.close, b.volume)
+
+    for intervalo in ("1m", "5m", "60m"):
+        pd.testing.assert_frame_equal(_serie(revisado, intervalo), _serie(directo, intervalo), rtol=1e-9)
+
+
+def test_tickers_conocidos_se_piden_desde_su_propia_ultima_barra():
+    monitor = MonitorIntradia()
+    barras = _barras_1m(200)
+    for symbol in ("AAA.SN", "BBB.SN"):
+        _alimentar(monitor, barras, symbol)
+    _alimentar(monitor, barras.iloc[:20], "ATRASADO.SN")
+
+    llamadas = []
+
+    def descargador(codigos, start=None, **parametros):
+        llamadas.append((sorted(codigos), start))
+        return ResultadoDescarga(pd.DataFrame(), {})
+
+    actualizar_intradia(monitor, ["AAA.SN", "BBB.SN", "ATRASADO.SN"], descargador=descargador)
+    por_grupo = {tuple(codigos): inicio.timestamp() for codigos, inicio in llamadas}
+    assert set(por_grupo) == {("AAA.SN", "BBB.SN"), ("ATRASADO.SN",)}
+    assert por_grupo[("AAA.SN", "BBB.SN")] > INICIO + 60 * 180
+    assert por_grupo[("ATRASADO.SN",)] <= INICIO + 60 * 19
@@ -0,0 +1,123 @@
+"""Motor de reglas: análisis de las expresiones, nombres admitidos y evaluación sobre el universo."""
+import logging
+
+import numpy as np
+import pytest
+
+from bolsa.reglas import MotorReglas, Regla, ReglaInvalida, compilar, evaluar_snapshot
+from bolsa.snapshot import COLUMNAS_METRICAS, SnapshotMercado, tabla_metricas
+
+SIMBOLOS = ["A.SN", "B.SN", "C.SN", "D.SN"]
+
+
+def _regla(nombre, expresion, accion="insignia"):
+    return Regla(nombre, expresion, accion, nombre, "neutro", "")
+
+
+def _tabla():
+    return tabla_metricas({
+        'nombre': ["A", "B", "C", "D"],
+        'precio': [100.0, 50.0, np.nan, 10.0],
+        'var': [3.0, -0.5, np.nan, -4.0],
+        'volume': [5e6, 1e6, 2e6, np.nan],
+        'avg_volume_20': [2e6, 1e6, 1e6, 1e6],
+        'rsi': [25.0, 55.0, np.nan, 75.0],
+        'macd_hist': [0.2, -0.1, np.nan, -0.3],
+        'macd_hist_prev': [-0.1, -0.2, np.nan, 0.1],
+    }, SIMBOLOS)
+
+
+def _coinciden(motor, tabla, nombre):
+    senales = motor.evaluar(tabla)
+    return list(senales.index[senales[nombre].to_numpy()])
+
+
+@pytest.mark.parametrize("expresion", [
+    "rsi <",                          # sintaxis
+    "rsi.real > 3",                   # atributos
+    "__import__('os').system('ls')",  # funciones fuera de la lista
+    "[rsi][0] > 3",                   # listas y subíndices
+    "rsi if var else macd",           # condicionales
+    "lambda: rsi",
+    "abs(rsi, var)",                  # aridad
+    "max(rsi)",
+    "rsi in (1, 2)",                  # comparador no soportado
+    "rsi // 2 > 1",                   # operador no soportado
+])
+def test_rechaza_construcciones_fuera_de_la_gramatica(expresion):
+    with pytest.raises(ReglaInvalida):
+        compilar(expresion, set(COLUMNAS_METRICAS))
+
+
+def test_solo_admite_columnas_alias_y_variables_conocidas():
+    with pytest.raises(ReglaInvalida, match="desconocida"):
+        MotorReglas([_regla("x", "precio_objetivo > 3")])
+    with pytest.raises(ReglaInvalida, match="desconocida"):
+        MotorReglas([_regla("x", "abs(var) >= umbral")])
+
+    motor = MotorReglas([_regla("x", "CLOSE > 60 and abs(var) >= umbral")], variables={"Umbral": 2.5})
+    assert _coinciden(motor, _tabla(), "x") == ["A.SN"]
+
+
+def test_rechaza_nombres_repetidos_y_acciones_desconocidas():
+    with pytest.raises(ReglaInvalida):
+        MotorReglas([_regla("x", "rsi > 70"), _regla("x", "rsi < 30")])
+    with pytest.raises(ReglaInvalida):
+        MotorReglas([_regla("x", "rsi > 70", accion="correo")])
+
+
+@pytest.mark.parametrize("expresion", ["macd_cross > 3", "nombre + 1 > 0", "rsi > 'alto'"])
+def test_errores_de_tipos_se_rechazan_al_construir(expresion):
+    with pytest.raises(ReglaInvalida, match="no se puede evaluar"):
+        MotorReglas([_regla("x", expresion)])
+
+
+def test_evalua_todas_las_reglas_de_una_vez():
+    motor = MotorReglas([
+        _regla("sobreventa", "rsi < 30"),
+        _regla("sobrecompra", "rsi > 70"),
+        _regla("cruce", "macd_cross == 'up'"),
+        _regla("volumen", "volume > 2*avg_volume_20 and not var < 0"),
+        _regla("encadenada", "40 < rsi <= 80"),
+        _regla("rango", "min(rsi, 100 - rsi) < 30 or max(var, -var) > 3.5"),
+    ])
+    tabla = _tabla()
+    senales = motor.evaluar(tabla)
+
+    assert list(senales.columns) == [r.nombre for r in motor.reglas]
+    assert senales.dtypes.eq(bool).all()
+    assert _coinciden(motor, tabla, "sobreventa") == ["A.SN"]
+    assert _coinciden(motor, tabla, "sobrecompra") == ["D.SN"]
+    assert _coinciden(motor, tabla, "cruce") == ["A.SN"]
+    assert _coinciden(motor, tabla, "volumen") == ["A.SN"]
+    assert _coinciden(motor, tabla, "encadenada") == ["B.SN", "D.SN"]
+    assert _coinciden(motor, tabla, "rango") == ["A.SN", "D.SN"]
+
+
+def test_datos_faltantes_no_cumplen_la_regla():
+    # C.SN no tiene datos: una expresión aritmética sobre NaN no puede contar como cumplida
+    motor = MotorReglas([_regla("rsi", "rsi"), _regla("rsi_mas_var", "rsi + var"), _regla("var", "var")])
+    tabla = _tabla()
+    assert _coinciden(motor, tabla, "rsi") == ["A.SN", "B.SN", "D.SN"]
+    assert _coinciden(motor, tabla, "rsi_mas_var") == ["A.SN", "B.SN", "D.SN"]
+    assert "C.SN" not in _coinciden(motor, tabla, "var")
+
+
+def test_una_regla_que_falla_no_bloquea_a_las_demas(caplog):
+    motor = MotorReglas([_regla("volumen", "volume > avg_volume_20"), _regla("sobreventa", "rsi < 30")])
+    # Una tabla sin la columna que usa la primera regla
+    tabla = _tabla().drop(columns="avg_volume_20")
+    with caplog.at_level(logging.ERROR, logger="bolsa.reglas"):
+        senales = motor.evaluar(tabla)
+
+    assert not senales["volumen"].any()
+    assert list(senales.index[senales["sobreventa"].to_numpy()]) == ["A.SN"]
+    assert "volumen" in caplog.text
+
+
+def test_evaluar_snapshot_una_vez_por_simbolo():
+    motor = MotorReglas([_regla("sobreventa", "rsi < 30")])
+    metricas = tabla_metricas({'rsi': [20.0, 50.0, 20.0]}, ["A.SN", "B.SN", "A.SN"])
+    senales = evaluar_snapshot(SnapshotMercado(metricas, {}, {}), motor).senales
+    assert list(senales.index) == ["A.SN", "B.SN"]
+    assert list(senales["sobreventa"]) == [True, False]